@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+银行卡选择对话框读取
+一次evaluate读取整个银行卡表格（姓名、掩码卡号、卡类型、联行号、单选按钮），在Python中匹配后只点击一次
+按工号保存已见过的银行卡（BankCardRegistry），之后可以直接选择对应的单选按钮
+"""
+
+import os
+import json
+import logging
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 银行卡选择对话框
+BANK_CARD_DIALOG_SELECTOR = "#paybankdiv"
+
+# 在页面中读取银行卡表格：第1列为单选按钮，第2~5列为姓名、卡号、卡类型、联行号
+_READ_BANK_CARD_TABLE_JS = """
+(dialogSelector) => {
+    const dialog = document.querySelector(dialogSelector);
+    if (!dialog) {
+        return null;
+    }
+    const rows = Array.from(dialog.querySelectorAll('table tbody tr'));
+    const cards = [];
+    rows.forEach((row, rowIndex) => {
+        const radio = row.querySelector("input[type='radio']");
+        if (!radio) {
+            return;
+        }
+        const cells = Array.from(row.querySelectorAll('td')).map(td => (td.textContent || '').trim());
+        cards.push({
+            row_index: rowIndex,
+            name: cells[1] || '',
+            card_number: cells[2] || '',
+            card_type: cells[3] || '',
+            bank_code: cells[4] || '',
+            radio_id: radio.id || '',
+            radio_value: radio.value || '',
+            checked: radio.checked
+        });
+    });
+    return cards;
+}
+"""
+
+
+@dataclass
+class BankCardOption:
+    """银行卡选择对话框中的一行"""
+    row_index: int
+    name: str
+    card_number: str
+    card_type: str
+    bank_code: str
+    radio_id: str = ""
+    radio_value: str = ""
+    checked: bool = False
+
+    @property
+    def radio_selector(self) -> str:
+        """该行单选按钮的选择器（有ID时使用ID）"""
+        if self.radio_id:
+            return f"[id='{self.radio_id}']"
+        if self.radio_value:
+            return f"{BANK_CARD_DIALOG_SELECTOR} input[type='radio'][value='{self.radio_value}']"
+        return (f"{BANK_CARD_DIALOG_SELECTOR} table tbody tr >> nth={self.row_index} "
+                f">> input[type='radio']")
+
+
+async def read_bank_card_table(target, dialog_selector: str = BANK_CARD_DIALOG_SELECTOR) -> Optional[List[BankCardOption]]:
+    """
+    一次evaluate读取银行卡选择对话框中的所有银行卡
+
+    Args:
+        target: Page或Frame
+        dialog_selector: 对话框选择器
+
+    Returns:
+        银行卡列表；未找到对话框时返回None
+    """
+    rows = await target.evaluate(_READ_BANK_CARD_TABLE_JS, dialog_selector)
+    if rows is None:
+        return None
+    cards = [BankCardOption(**row) for row in rows]
+    for card in cards:
+        logger.info(f"银行卡选项 {card.row_index}: 姓名={card.name}, 卡号={card.card_number}, "
+                    f"类型={card.card_type}, 联行号={card.bank_code}")
+    return cards
+
+
+def find_bank_card(cards: List[BankCardOption], target_card_number: str,
+                   match_func: Callable[[str, str], bool]) -> Optional[BankCardOption]:
+    """
+    在已读取的银行卡列表中查找目标卡号
+
+    Args:
+        cards: 银行卡列表
+        target_card_number: 目标卡号（完整卡号或卡号后几位）
+        match_func: 卡号匹配函数 (目标卡号, 显示卡号) -> 是否匹配
+
+    Returns:
+        匹配的银行卡，未找到时返回None
+    """
+    for card in cards:
+        if match_func(target_card_number, card.card_number):
+            return card
+    return None
+
+
+async def click_bank_card(target, card: BankCardOption) -> None:
+    """
+    点击银行卡对应的单选按钮
+
+    Args:
+        target: Page或Frame
+        card: 要选择的银行卡
+    """
+    await target.locator(card.radio_selector).first.click()
+
+
+# 读取单选按钮所在行的卡号（第3列）
+_READ_RADIO_ROW_CARD_NUMBER_JS = """
+(radio) => {
+    const row = radio.closest('tr');
+    if (!row) {
+        return null;
+    }
+    const cells = Array.from(row.querySelectorAll('td')).map(td => (td.textContent || '').trim());
+    return cells[2] || '';
+}
+"""
+
+
+async def read_radio_card_number(radio_locator) -> Optional[str]:
+    """
+    读取单选按钮所在行当前显示的卡号
+
+    单选按钮ID按行号生成（如rdoacnt_0），银行卡列表变化后同一ID可能对应另一张卡，点击前需要核对
+
+    Args:
+        radio_locator: 单选按钮的Locator
+
+    Returns:
+        该行显示的卡号（可能为掩码格式），单选按钮不在表格行中时返回None
+    """
+    return await radio_locator.evaluate(_READ_RADIO_ROW_CARD_NUMBER_JS)
+
+
+def split_masked_card_number(card_number: str) -> Tuple[str, str]:
+    """
+    拆分掩码卡号的前缀和后缀（如 6227******1142 -> ('6227', '1142')）
+
+    完整卡号没有掩码时，前缀为整个卡号，后缀为空
+    """
+    clean = card_number.replace(' ', '').replace('-', '').strip()
+    if '*' not in clean:
+        return clean, ""
+    prefix = clean.split('*')[0]
+    suffix = clean.split('*')[-1]
+    return prefix, suffix
+
+
+def card_tail_matches(card_number: str, card_tail: str) -> bool:
+    """
+    判断对话框中显示的卡号是否与卡号尾号（或完整卡号）对应
+
+    Args:
+        card_number: 对话框中显示的卡号（可能为掩码格式）
+        card_tail: 卡号尾号（不包含*前缀），也可以是完整卡号
+    """
+    tail = card_tail.replace(' ', '').replace('-', '').strip()
+    if not tail:
+        return False
+    prefix, suffix = split_masked_card_number(card_number)
+    if not suffix:
+        return prefix.endswith(tail)
+    if len(tail) <= len(suffix):
+        return suffix.endswith(tail)
+    # 尾号比掩码后缀长时视为完整卡号，前缀和后缀都要对应
+    return tail.startswith(prefix) and tail.endswith(suffix)
+
+
+class BankCardRegistry:
+    """按工号保存银行卡选择对话框中见过的银行卡，按掩码前后缀和尾号建立索引"""
+
+    def __init__(self, registry_file: str = None):
+        """
+        Args:
+            registry_file: 持久化JSON文件路径
+        """
+        self.registry_file = registry_file or config.BANK_CARD_REGISTRY_FILE
+        self.cards: Dict[str, List[dict]] = {}
+        # 工号 -> {(前缀, 后缀): 银行卡}
+        self.masked_index: Dict[str, Dict[Tuple[str, str], dict]] = {}
+        # 工号 -> {尾号: [银行卡]}，尾号为掩码后缀的各个结尾部分
+        self.tail_index: Dict[str, Dict[str, List[dict]]] = {}
+        self.load()
+
+    def load(self) -> None:
+        """从JSON文件加载"""
+        if not os.path.exists(self.registry_file):
+            return
+        try:
+            with open(self.registry_file, 'r', encoding='utf-8') as f:
+                self.cards = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取银行卡记录失败: {e}")
+            self.cards = {}
+        for work_id in self.cards:
+            self._build_index(work_id)
+        logger.info(f"加载银行卡记录: {len(self.cards)} 个工号")
+
+    def save(self) -> None:
+        """保存到JSON文件"""
+        try:
+            with open(self.registry_file, 'w', encoding='utf-8') as f:
+                json.dump(self.cards, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            logger.warning(f"保存银行卡记录失败: {e}")
+
+    def _build_index(self, work_id: str) -> None:
+        masked_index = {}
+        tail_index: Dict[str, List[dict]] = {}
+        for card in self.cards.get(work_id, []):
+            prefix, suffix = split_masked_card_number(card['card_number'])
+            masked_index[(prefix, suffix)] = card
+            digits = suffix or prefix
+            for n in range(1, len(digits) + 1):
+                tail_index.setdefault(digits[-n:], []).append(card)
+        self.masked_index[work_id] = masked_index
+        self.tail_index[work_id] = tail_index
+
+    def record(self, work_id: str, cards: List[BankCardOption]) -> None:
+        """
+        记录某个工号在对话框中显示的全部银行卡（以最新一次为准）
+
+        Args:
+            work_id: 工号
+            cards: 对话框中读取到的银行卡列表
+        """
+        if not work_id or not cards:
+            return
+        entries = []
+        for card in cards:
+            entry = asdict(card)
+            entry.pop('checked', None)
+            entries.append(entry)
+        known = [{k: v for k, v in c.items() if k != 'seen_at'} for c in self.cards.get(work_id, [])]
+        if known == entries:
+            return
+
+        seen_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        for entry in entries:
+            entry['seen_at'] = seen_at
+        self.cards[work_id] = entries
+        self._build_index(work_id)
+        self.save()
+        logger.info(f"更新工号 {work_id} 的银行卡记录: {len(entries)} 张")
+
+    def knows(self, work_id: str) -> bool:
+        """是否记录过该工号的银行卡"""
+        return work_id in self.cards
+
+    def find_by_masked(self, work_id: str, card_number: str) -> Optional[BankCardOption]:
+        """按掩码卡号（前缀+后缀）查找"""
+        card = self.masked_index.get(work_id, {}).get(split_masked_card_number(card_number))
+        return self._to_option(card)
+
+    def find_by_tail(self, work_id: str, card_tail: str) -> Optional[BankCardOption]:
+        """
+        按卡号尾号查找，有多张银行卡对应同一尾号时返回None
+
+        Args:
+            work_id: 工号
+            card_tail: 卡号尾号（不包含*前缀），也可以是完整卡号
+        """
+        tail = card_tail.replace(' ', '').replace('-', '').strip()
+        candidates = self.tail_index.get(work_id, {}).get(tail)
+        if candidates is None:
+            candidates = [c for c in self.cards.get(work_id, []) if card_tail_matches(c['card_number'], tail)]
+        if len(candidates) != 1:
+            return None
+        return self._to_option(candidates[0])
+
+    def has_tail(self, work_id: str, card_tail: str) -> Optional[bool]:
+        """
+        预检查卡号尾号是否属于该工号
+
+        Returns:
+            True/False；没有该工号的记录时返回None
+        """
+        if not self.knows(work_id):
+            return None
+        tail = card_tail.replace(' ', '').replace('-', '').strip()
+        if tail in self.tail_index.get(work_id, {}):
+            return True
+        return any(card_tail_matches(c['card_number'], tail) for c in self.cards[work_id])
+
+    @staticmethod
+    def _to_option(card: Optional[dict]) -> Optional[BankCardOption]:
+        if card is None:
+            return None
+        return BankCardOption(**{k: v for k, v in card.items() if k != 'seen_at'})
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端吞吐量基准测试
+在本地模拟财务系统（mock_portal.py）上，用1、10、100、1000条记录的合成报销信息运行
+LoginAutomation.run_automation 和 uestc_financial_demo 的 fill_expense_form 流程，统计：
+每分钟处理记录数、单条记录耗时的p50/p95、每条记录的Playwright往返次数、峰值内存（RSS，含浏览器进程）和启动时间。
+结果写入JSON文件并与基线比较，任一指标的退化超过容差时以非零状态退出
+
+用法: python benchmark_automation.py [--sizes 1,10,100] [--baseline benchmark_baseline.json] [--update-baseline]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import platform
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from playwright.async_api import async_playwright
+
+import config
+from logging_setup import setup_logging
+from mock_portal import MockPortalServer
+from network_monitor import percentile
+from workload_generator import WorkloadGenerator, WorkloadShape, LOGIN_UID, LOGIN_PASSWORD
+
+try:
+    import resource  # Windows上没有
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# 各指标的优化方向：higher表示越大越好，lower表示越小越好
+METRIC_DIRECTIONS = {
+    "records_per_minute": "higher",
+    "latency_p50": "lower",
+    "latency_p95": "lower",
+    "roundtrips_per_record": "lower",
+    "peak_rss_mb": "lower",
+    "startup_seconds": "lower",
+}
+
+DEMO_SHEET_NAME = "Sheet_Baoxiao"  # uestc_financial_demo固定读取的sheet
+DEMO_SUBJECT_MAPPING_FILE = "科目-输入框id对应.xlsx"  # uestc_financial_demo固定读取的科目映射表
+
+
+def process_tree_rss(pid: int = None) -> Optional[int]:
+    """
+    进程及其所有子进程（浏览器、Playwright驱动）的RSS之和（字节），不支持/proc时返回None
+    """
+    pid = os.getpid() if pid is None else pid
+    if not os.path.isdir("/proc"):
+        return None
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding='utf-8') as f:
+                # 进程名可能含空格，从最后一个右括号之后解析
+                fields = f.read().rsplit(")", 1)[1].split()
+            children.setdefault(int(fields[1]), []).append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status", encoding='utf-8') as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+    return total
+
+
+class PeakRssSampler:
+    """后台线程定期采样进程树的RSS，记录峰值"""
+
+    def __init__(self, interval: float = None):
+        self.interval = config.BENCHMARK_RSS_SAMPLE_INTERVAL if interval is None else interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "PeakRssSampler":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample_loop(self) -> None:
+        while not self._stop.is_set():
+            rss = process_tree_rss()
+            if rss is None:
+                return
+            self.peak = max(self.peak, rss)
+            self._stop.wait(self.interval)
+
+    def stop(self) -> Optional[float]:
+        """停止采样，返回峰值（MB）；不支持/proc时使用getrusage的本进程峰值"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self.peak:
+            return round(self.peak / 1024 / 1024, 1)
+        if resource is not None:
+            # Linux上ru_maxrss单位为KB，macOS上为字节
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+            return round(max_rss / scale, 1)
+        return None
+
+
+def build_workload(work_dir: str, size: int, seed: int) -> Tuple[str, str]:
+    """
+    用合成报销信息生成器生成size条记录的报销信息和标题-ID映射，
+    并追加演示流程读取的Sheet_Baoxiao（每条记录的项目编号、第一个科目和第一个收款人）
+
+    Returns:
+        (报销信息文件路径, 标题-ID映射文件路径)
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    excel_file = os.path.join(work_dir, f"报销信息_{size}.xlsx")
+    mapping_file = os.path.join(work_dir, "标题-ID.xlsx")
+    generator = WorkloadGenerator(WorkloadShape(records=size), seed=seed)
+    rows = generator.write(excel_file, mapping_file, config.SHEET_NAME, overwrite=True)
+
+    demo_rows = {}
+    for row in rows:
+        entry = demo_rows.setdefault(row[config.SEQUENCE_COL], {
+            "项目编号": row.get("报销项目号"), "附件张数": row.get("附件张数"), "支付方式": row.get("支付方式"),
+            "工号": "", "个人": "", "卡号": "", "个人金额": 0.0,
+        })
+        if "科目" in row:
+            entry["预约科目"] = row["科目"][1:]
+            entry["金额"] = row["金额"]
+        if "转卡信息工号" in row and not entry["工号"]:
+            entry["工号"] = row["转卡信息工号"]
+            entry["个人金额"] = row["个人金额"]
+    with pd.ExcelWriter(excel_file, engine='openpyxl', mode='a') as writer:
+        pd.DataFrame(list(demo_rows.values())).to_excel(writer, sheet_name=DEMO_SHEET_NAME, index=False)
+    return excel_file, mapping_file
+
+
+def mock_system_config(server: MockPortalServer) -> Dict:
+    """
+    模拟系统的FINANCIAL_SYSTEM_CONFIG（地址、登录凭据和选择器），传给UESTCFinancialAutomation，
+    不依赖config.py中是否配置了真实系统
+    """
+    base = server.url.rsplit("/", 1)[0]
+    return {
+        "base_url": server.url,
+        "login_url": server.url,
+        "expense_form_url": f"{base}/main2.jsp?sso=y&prj=WF_YB6",
+        "username": LOGIN_UID,
+        "password": LOGIN_PASSWORD,
+        "selectors": {
+            "username_input": "#uid",
+            "password_input": "#pwd",
+            "login_button": "#zhLogin",
+            "captcha_input": "#captcha",
+            "captcha_image": "#captchaImg",
+            "online_appointment": "div.syslink[title='网上预约报账']",
+            "sub_system_frame": "#mainFrame",
+        },
+    }
+
+
+MOCK_PROJECT_CONFIG = {"system_name": "本地模拟财务系统", "system_modules": []}
+
+
+def write_demo_subject_mapping(work_dir: str, server: MockPortalServer) -> None:
+    """生成演示流程读取的科目-输入框ID对应表（模拟系统的科目表）"""
+    rows = [{"科目名称（b_name）": name, "输入框ID（value输入框）": f"input_t_value_{row_id}"}
+            for name, row_id in server.subjects]
+    pd.DataFrame(rows).to_excel(os.path.join(work_dir, DEMO_SUBJECT_MAPPING_FILE), index=False)
+
+
+def summarize(records: int, completed: int, durations: List[float], loop_seconds: float,
+              roundtrips_per_record: float, startup_seconds: Optional[float], peak_rss_mb: Optional[float]) -> Dict:
+    """一个场景的指标（loop_seconds为处理全部记录的实际耗时，含记录之间的等待，用于计算吞吐量）"""
+    return {
+        "records": records,
+        "completed": completed,
+        "startup_seconds": round(startup_seconds, 3) if startup_seconds is not None else None,
+        "total_seconds": round(loop_seconds, 3),
+        "records_per_minute": round(len(durations) / loop_seconds * 60, 2) if loop_seconds else 0.0,
+        "latency_p50": round(percentile(durations, 0.50), 3),
+        "latency_p95": round(percentile(durations, 0.95), 3),
+        "roundtrips_per_record": round(roundtrips_per_record, 1),
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+
+async def bench_login_automation(server: MockPortalServer, size: int, work_dir: str, seed: int,
+                                 profile: bool = False) -> Dict:
+    """用合成报销信息运行LoginAutomation.run_automation（profile为True时同时做性能剖析）"""
+    from login_automation import LoginAutomation
+
+    excel_file, mapping_file = build_workload(work_dir, size, seed)
+    automation = LoginAutomation(excel_file=excel_file, mapping_file=mapping_file,
+                                 sheet_name=config.SHEET_NAME, captcha=server.captcha,
+                                 headless=True, wait_for_close=False, profile=profile,
+                                 trace_memory=True)
+    submissions_before = len(server.submissions)
+    sampler = PeakRssSampler().start()
+    try:
+        await automation.run_automation(server.url)
+    finally:
+        peak_rss_mb = sampler.stop()
+    durations = [seconds for _, seconds in automation.record_durations]
+    metrics = summarize(
+        records=size,
+        completed=len(server.submissions) - submissions_before,
+        durations=durations,
+        loop_seconds=automation.records_wall_time or 0.0,
+        roundtrips_per_record=automation.roundtrip_counter.snapshot()["per_record_mean"],
+        startup_seconds=automation.startup_time,
+        peak_rss_mb=peak_rss_mb,
+    )
+    # 内存超过阈值时回收浏览器上下文的次数（不参与基线比较）
+    metrics["context_recycles"] = len(automation.memory_monitor.recycles)
+    return metrics
+
+
+async def bench_demo_flow(server: MockPortalServer, size: int, work_dir: str, seed: int) -> Dict:
+    """
+    运行uestc_financial_demo的fill_expense_form流程
+
+    fill_expense_form只填写报销信息的第一行，每次迭代重新打开报销单并填写一次，
+    迭代次数为min(规模, config.BENCHMARK_DEMO_MAX_RECORDS)
+    """
+    from uestc_financial_demo import UESTCFinancialAutomation
+
+    system_config = mock_system_config(server)
+    selectors = system_config["selectors"]
+    automation = UESTCFinancialAutomation(system_config=system_config, project_config=MOCK_PROJECT_CONFIG)
+
+    build_workload(work_dir, size, seed)
+    write_demo_subject_mapping(work_dir, server)
+    # 演示流程从当前目录读取固定文件名的Excel
+    os.replace(os.path.join(work_dir, f"报销信息_{size}.xlsx"), os.path.join(work_dir, config.EXCEL_FILE))
+    iterations = min(size, config.BENCHMARK_DEMO_MAX_RECORDS)
+    durations: List[float] = []
+    completed = 0
+    previous_dir = os.getcwd()
+    sampler = PeakRssSampler().start()
+    try:
+        os.chdir(work_dir)
+        async with async_playwright() as p:
+            startup_start = time.perf_counter()
+            automation.browser = await p.chromium.launch(headless=True)
+            automation.page = await automation.browser.new_page()
+            if config.ROUNDTRIP_COUNTER_ENABLED:
+                automation.page = automation.roundtrip_counter.wrap(automation.page)
+            await automation.page.goto(server.url, timeout=10000)
+            startup_seconds = time.perf_counter() - startup_start
+
+            await automation.page.fill(selectors["username_input"], system_config["username"])
+            await automation.page.fill(selectors["password_input"], system_config["password"])
+            await automation.page.fill(selectors["captcha_input"], server.captcha)
+            await automation.page.click(selectors["login_button"])
+            await automation.page.click(selectors["online_appointment"])
+            await automation.page.wait_for_function(
+                "() => [...document.querySelectorAll('iframe')].some(f => f.src.includes('WF_YB6'))")
+            frame = next(f for f in automation.page.frames if "WF_YB6" in f.url)
+
+            loop_start = time.perf_counter()
+            for iteration in range(iterations):
+                record_start = time.perf_counter()
+                with automation.roundtrip_counter.record(iteration + 1):
+                    await frame.click("button[btnname='申请报销单']")
+                    await frame.click("button[btnname='已阅读并同意']")
+                    if await automation.fill_expense_form():
+                        completed += 1
+                durations.append(time.perf_counter() - record_start)
+                await frame.goto(frame.url)
+            loop_seconds = time.perf_counter() - loop_start
+            await automation.browser.close()
+    finally:
+        os.chdir(previous_dir)
+        peak_rss_mb = sampler.stop()
+    result = summarize(
+        records=iterations,
+        completed=completed,
+        durations=durations,
+        loop_seconds=loop_seconds,
+        roundtrips_per_record=automation.roundtrip_counter.snapshot()["per_record_mean"],
+        startup_seconds=startup_seconds,
+        peak_rss_mb=peak_rss_mb,
+    )
+    automation.roundtrip_counter.log_report()
+    return result
+
+
+def compare_with_baseline(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    与基线比较，返回超出容差的退化说明（同时检查每个场景是否处理完全部记录）
+
+    Args:
+        results: 本次结果（run_benchmarks的返回值）
+        baseline: 基线结果（格式相同）
+        tolerance: 允许的退化比例，如0.15表示比基线差15%以内不算退化
+    """
+    regressions = []
+    baseline_scenarios = baseline.get("scenarios", {})
+    for name, metrics in results["scenarios"].items():
+        if "skipped" in metrics:
+            continue
+        if metrics["completed"] < metrics["records"]:
+            regressions.append(f"{name}: 只完成了 {metrics['completed']}/{metrics['records']} 条记录")
+        reference = baseline_scenarios.get(name)
+        if not reference or "skipped" in reference:
+            continue
+        for metric, direction in METRIC_DIRECTIONS.items():
+            current, previous = metrics.get(metric), reference.get(metric)
+            if current is None or not previous:
+                continue
+            change = (current - previous) / previous
+            worse = -change if direction == "higher" else change
+            if worse > tolerance:
+                regressions.append(f"{name}: {metric} {previous} -> {current} ({change:+.1%}，容差 {tolerance:.0%})")
+    return regressions
+
+
+async def run_benchmarks(sizes: List[int], work_dir: str, seed: int = None, include_demo: bool = True,
+                         latency_ms: float = None, jitter_ms: float = None, profile: bool = False) -> Dict:
+    """启动模拟系统，依次运行各规模的场景"""
+    seed = config.BENCHMARK_SEED if seed is None else seed
+    scenarios = {}
+    with MockPortalServer(port=0, latency_ms=latency_ms, jitter_ms=jitter_ms, seed=seed) as server:
+        for size in sizes:
+            logger.info(f"=== 基准测试: LoginAutomation, {size} 条记录 ===")
+            scenarios[f"login_automation/{size}"] = await bench_login_automation(server, size, work_dir, seed, profile)
+            if include_demo:
+                logger.info(f"=== 基准测试: fill_expense_form, {size} 条记录 ===")
+                scenarios[f"demo_fill_expense_form/{size}"] = await bench_demo_flow(server, size, work_dir, seed)
+        return {
+            "created": datetime.now().isoformat(timespec='seconds'),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "seed": seed,
+            "mock_latency_ms": server.latency_ms,
+            "mock_jitter_ms": server.jitter_ms,
+            "request_counts": dict(server.request_counts),
+            "scenarios": scenarios,
+        }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="在本地模拟财务系统上运行端到端吞吐量基准测试")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in config.BENCHMARK_SIZES),
+                        help="合成报销信息的记录数，逗号分隔")
+    parser.add_argument("--output", default=config.BENCHMARK_RESULTS_FILE, help="结果文件")
+    parser.add_argument("--baseline", default=config.BENCHMARK_BASELINE_FILE, help="基线结果文件")
+    parser.add_argument("--tolerance", type=float, default=config.BENCHMARK_TOLERANCE, help="允许的退化比例")
+    parser.add_argument("--update-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--skip-demo", action="store_true", help="不运行演示流程（fill_expense_form）")
+    parser.add_argument("--latency", type=float, default=None, help="模拟系统的服务器延迟（毫秒）")
+    parser.add_argument("--jitter", type=float, default=None, help="延迟的随机波动范围（毫秒）")
+    parser.add_argument("--seed", type=int, default=config.BENCHMARK_SEED, help="合成报销信息和服务器延迟的随机种子")
+    parser.add_argument("--work-dir", default=config.BENCHMARK_WORK_DIR, help="合成Excel文件的存放目录")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"对LoginAutomation场景做性能剖析，火焰图和Chrome trace写入 {config.PROFILE_OUTPUT_DIR}/")
+    args = parser.parse_args()
+
+    # 与正式运行相同的日志配置（后台线程写入），基准测试结果包含日志开销
+    setup_logging()
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    work_dir = os.path.abspath(args.work_dir)
+    results = asyncio.run(run_benchmarks(sizes, work_dir, seed=args.seed, include_demo=not args.skip_demo,
+                                         latency_ms=args.latency, jitter_ms=args.jitter,
+                                         profile=args.profile))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    logger.info(f"基准测试结果已写入: {args.output}")
+    for name, metrics in results["scenarios"].items():
+        if "skipped" in metrics:
+            logger.info(f"  {name}: 跳过 ({metrics['skipped']})")
+            continue
+        logger.info(f"  {name}: {metrics['completed']}/{metrics['records']} 条, "
+                    f"{metrics['records_per_minute']} 条/分钟, p50={metrics['latency_p50']}秒 "
+                    f"p95={metrics['latency_p95']}秒, 往返 {metrics['roundtrips_per_record']} 次/条, "
+                    f"峰值内存 {metrics['peak_rss_mb']}MB, 启动 {metrics['startup_seconds']}秒")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        logger.info(f"已更新基线: {args.baseline}")
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    else:
+        logger.warning(f"基线文件不存在: {args.baseline}，只检查记录是否全部完成")
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    if regressions:
+        logger.error("基准测试发现退化:")
+        for regression in regressions:
+            logger.error(f"  {regression}")
+        return 1
+    logger.info("基准测试通过")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -22,6 +22,90 @@ RECORD_PROCESS_WAIT = 0.5  # 记录处理等待时间
 SUBJECT_AMOUNT_WAIT = 5  # 科目金额填写前的页面加载等待时间
 BANK_CARD_SELECTION_WAIT = 1  # 银行卡选择等待时间（缩减）
 BANK_CARD_DIALOG_WAIT = 2  # 银行卡选择弹窗等待时间（缩减）
+BANK_CARD_REGISTRY_FILE = "bank_card_registry.json"  # 按工号保存的已见过的银行卡（用于直接选择和预检查卡号尾号）
+DIALOG_DETECT_TIMEOUT = 5000  # 等待银行卡选择弹窗出现的整体超时时间（毫秒），所有frame和选择器同时等待
+GENERIC_DIALOG_CHECK_TIMEOUT = 200  # 通用对话框选择器的检查时间（毫秒）
+CAPTCHA_DETECT_TIMEOUT = 1000  # 等待验证码输入框出现的整体超时时间（毫秒）
+
+# 工号查询请求配置（填写工号后等待服务器返回，而不是固定等待）
+# 工号查询请求URL的正则表达式，需根据实际抓包结果配置（如 r"getuser\.do"）；为空时填写工号后固定等待
+EMPLOYEE_LOOKUP_URL_PATTERN = ""
+EMPLOYEE_LOOKUP_TIMEOUT = 2000  # 工号填写完成后等待查询响应的超时时间（毫秒，未等到时的开销不超过固定等待）
+EMPLOYEE_LOOKUP_FALLBACK_WAIT = 2  # 未配置工号查询请求时，填写工号后的固定等待时间（秒）
+TRAVELER_LOOKUP_CONCURRENCY = 1  # 同时查询的出差人工号数量（大于1时要求查询请求中包含工号，以便区分响应）
+
+# 日期填写配置
+DATE_FAST_PATH = True  # 先通过datepicker API（或去掉readonly直接赋值）设置日期，核对失败时再点击日历控件
+
+# 字段类型探测配置
+FIELD_TYPE_CACHE_FILE = "field_type_cache.json"  # 从页面探测到的字段类型缓存（网页改版后删除该文件重新探测）
+
+# 查找策略记忆配置
+STRATEGY_MEMORY_FILE = "strategy_memory.json"  # 按 (页面角色, 目标) 记录成功的查找策略
+DEAD_TARGET_FAILURES = 3  # 连续多少次所有策略都失败后把目标标记为不可用（只在本次运行中有效）
+DEAD_TARGET_TTL = 600  # 不可用目标在该时间内（秒）直接返回失败，不再逐个尝试
+NEGATIVE_CACHE_TTL = 60  # 元素不存在记录的最长有效时间（秒），页面变化时会提前清除
+
+# 步骤追踪配置
+STEP_TRACE_ENABLED = True  # 是否把每个操作的计时span写入追踪文件
+STEP_TRACE_FILE = "step_trace.jsonl"  # 步骤追踪文件（JSONL，每行一个span，追加写入）
+STEP_TRACE_SUMMARY_TOP = 10  # 运行结束时输出的最慢步骤数量
+
+# 性能剖析（--profile运行模式，profiler.py）
+PROFILE_SAMPLE_INTERVAL = 0.005  # 调用栈采样间隔（秒）
+PROFILE_OUTPUT_DIR = "profile"  # 火焰图折叠栈文件和Chrome trace文件的输出目录
+PROFILE_SUMMARY_TOP = 10  # 运行结束时输出的Python热点函数数量
+
+# Playwright往返次数统计
+ROUNDTRIP_COUNTER_ENABLED = True  # 是否统计每条记录、每个操作和每个调用方法的Playwright调用次数
+
+# 网络请求监控（按接口统计服务器时间，请求记录写入步骤追踪文件）
+NETWORK_MONITOR_ENABLED = True
+# 接口名称 -> URL正则表达式（按顺序匹配，未匹配的请求按URL中的文件名统计，需根据实际抓包结果调整）
+NETWORK_ENDPOINT_PATTERNS = {
+    "login": r"(?i)(login|authserver|cas/)",
+    "employee_lookup": r"(?i)(getuser|sno=)",
+    "subject_grid": r"(?i)(jqgrid|getkm|kmdm|subject)",
+    "print": r"(?i)(print|ybprint)",
+    "navigation": r"(?i)(home|main2)\.jsp",
+}
+
+# 内存监控和浏览器上下文回收（memory_monitor.py）
+# 每条记录处理完后采样Python内存（tracemalloc）和浏览器内存（CDP Performance.getMetrics），
+# 超过阈值时用storage_state（登录状态）新建浏览器上下文和页面，回到原页面地址后关闭旧的上下文
+MEMORY_MONITOR_ENABLED = True
+MEMORY_TRACEMALLOC_ENABLED = False  # 是否用tracemalloc追踪Python内存（增加每次分配的开销，基准测试和--profile时自动开启）
+MEMORY_TRACEMALLOC_FRAMES = 1  # tracemalloc记录的调用栈深度（越深开销越大）
+MEMORY_SNAPSHOT_EVERY = 50  # 每隔多少条记录做一次tracemalloc快照并输出增长最多的代码位置（0为不做快照）
+MEMORY_SNAPSHOT_TOP = 5  # 每次快照输出的代码位置数量
+MEMORY_RECYCLE_ENABLED = True  # 超过下面任一阈值时回收浏览器上下文
+MEMORY_RECYCLE_JS_HEAP_MB = 256  # 页面JS堆已用大小（MB）
+MEMORY_RECYCLE_DOM_NODES = 50000  # 页面DOM节点数（包括所有frame）
+MEMORY_RECYCLE_FRAMES = 40  # 页面frame数量
+MEMORY_RECYCLE_PYTHON_MB = 512  # Python已分配内存（tracemalloc，MB）
+MEMORY_RECYCLE_EVERY_RECORDS = 0  # 不论内存多少，每隔多少条记录回收一次（0为不按记录数回收）
+
+# 本地模拟财务系统（mock_portal.py，离线运行和基准测试用）
+MOCK_PORTAL_HOST = "127.0.0.1"
+MOCK_PORTAL_PORT = 8765  # 为0时自动选择空闲端口
+MOCK_PORTAL_LATENCY_MS = 150  # 每个页面和接口请求的服务器延迟（毫秒）
+MOCK_PORTAL_JITTER_MS = 50  # 延迟的随机波动范围（毫秒）
+MOCK_PORTAL_CAPTCHA = "8888"  # 模拟系统的固定验证码
+
+# 端到端吞吐量基准测试（benchmark_automation.py）
+BENCHMARK_SIZES = [1, 10, 100, 1000]  # 合成报销信息的记录数
+BENCHMARK_SEED = 0  # 合成报销信息（workload_generator.py）和模拟系统延迟的随机种子
+BENCHMARK_WORK_DIR = "benchmark_data"  # 合成Excel文件的存放目录
+BENCHMARK_RESULTS_FILE = "benchmark_results.json"  # 本次结果
+BENCHMARK_BASELINE_FILE = "benchmark_baseline.json"  # 用于比较的基线结果
+BENCHMARK_TOLERANCE = 0.15  # 相对基线允许的退化比例（超过则基准测试失败）
+BENCHMARK_DEMO_MAX_RECORDS = 10  # 演示流程（fill_expense_form）每个规模最多填写的表单数
+BENCHMARK_RSS_SAMPLE_INTERVAL = 0.2  # 峰值内存采样间隔（秒）
+
+# 纯Python热点路径的微基准测试（microbenchmarks.py）
+MICROBENCH_CELLS = [10_000, 100_000, 1_000_000]  # 每项测试处理的单元格数量
+MICROBENCH_REPEAT = 3  # 每项测试的计时次数（取最快一次）
+MICROBENCH_RESULTS_FILE = "microbench_results.json"
 
 # 下拉框字段配置（需要根据实际情况调整）
 DROPDOWN_FIELDS = {
@@ -195,6 +279,17 @@ CHAILV_SHEET_NAME = "ChaiLv_sheet"  # 差旅信息sheet名称
 LOG_LEVEL = "INFO"
 LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
 LOG_FILE = "reimbursement_automation.log"
+LOG_MAX_BYTES = 10 * 1024 * 1024  # 日志文件超过该大小时轮转，旧文件压缩为 .gz
+LOG_BACKUP_COUNT = 5  # 保留的旧日志文件数量
+LOG_URL_MAX_LENGTH = 120  # 日志中URL的最大长度（main2.jsp等地址带有很长的sso/context参数）
+# 各子模块的日志级别（logger名称即模块名），如需排查某个模块可单独改为DEBUG
+LOG_SUBSYSTEM_LEVELS = {
+    "login_automation": "INFO",
+    "selector_race": "INFO",
+    "negative_cache": "INFO",
+    "step_trace": "INFO",
+    "asyncio": "WARNING",
+}
 
 # 子序列相关列名
 SUBSEQUENCE_START_COL = "子序列开始"
@@ -242,4 +337,18 @@ PRINT_DIALOG_COORDINATES = {
 PRINT_OUTPUT_DIR = "pdf_output"  # PDF输出目录
 PRINT_DIALOG_WAIT_TIME = 3       # 等待打印对话框出现的时间
 SAVE_DIALOG_WAIT_TIME = 2        # 等待保存对话框出现的时间
-PRINT_FILE_PATH = r"C:\Users\FH\PycharmProjects\CursorCode8-5\pdf_output"  # 打印文件保存路径 
\ No newline at end of file
+PRINT_FILE_PATH = r"C:\Users\FH\PycharmProjects\CursorCode8-5\pdf_output"  # 打印文件保存路径
+
+# 科目本地匹配配置（在调用LLM之前先做本地匹配）
+SUBJECT_MATCH_MIN_SCORE = 0.5   # 第一候选的最低相似度
+SUBJECT_MATCH_MARGIN = 0.15     # 第一候选与第二候选的最小相似度差，低于该值时交给LLM判断
+LLM_PROMPT_TOP_K = 8            # 发送给LLM的候选科目数量
+LLM_BATCH_SIZE = 20             # 批量科目分类时每次LLM调用包含的预约科目数量
+
+# 本地LLM（Ollama）配置
+OLLAMA_BASE_URL = "http://localhost:11434"  # Ollama服务地址
+OLLAMA_MODEL = "llama2"         # 模型名称
+OLLAMA_TIMEOUT = 30             # 请求超时时间（秒）
+LLM_STREAM_EARLY_STOP = True    # 流式调用，响应中出现科目名称后立即结束生成
+OLLAMA_KEEP_ALIVE = "30m"       # 模型在内存中的保持时间
+OLLAMA_WARMUP_TIMEOUT = 180     # 模型预热（加载）超时时间（秒）
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日期直接设置
+通过jQuery UI的datepicker('setDate')设置日期；页面没有datepicker时去掉readonly直接赋值并派发事件
+每个frame一次evaluate，可以同时设置多个日期，设置后在页面中读取回来核对
+"""
+
+import logging
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# 在页面中设置日期，返回 {元素ID: {status, method, value}}
+_SET_DATES_JS = """
+(dates) => {
+    const results = {};
+    const $ = window.jQuery;
+    const setter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+    for (const [id, text] of Object.entries(dates)) {
+        const el = document.getElementById(id);
+        if (!el) {
+            continue;
+        }
+        const [year, month, day] = text.split('-').map(Number);
+        let method = 'value';
+        let verified = false;
+        if ($ && $.fn && $.fn.datepicker && $(el).hasClass('hasDatepicker')) {
+            // 通过datepicker设置，输入框显示格式由页面的dateFormat决定
+            method = 'datepicker';
+            $(el).datepicker('setDate', new Date(year, month - 1, day));
+            $(el).trigger('change');
+            const current = $(el).datepicker('getDate');
+            verified = !!current && current.getFullYear() === year
+                && current.getMonth() === month - 1 && current.getDate() === day;
+        } else {
+            const readOnly = el.readOnly;
+            el.readOnly = false;
+            setter.call(el, text);
+            el.dispatchEvent(new Event('input', { bubbles: true }));
+            el.dispatchEvent(new Event('change', { bubbles: true }));
+            el.dispatchEvent(new Event('blur', { bubbles: true }));
+            el.readOnly = readOnly;
+            verified = el.value === text;
+        }
+        results[id] = { status: verified ? 'ok' : 'mismatch', method: method, value: el.value };
+    }
+    return results;
+}
+"""
+
+
+def is_valid_date_text(value: str) -> bool:
+    """检查日期是否为 yyyy-mm-dd 格式"""
+    parts = value.split('-')
+    return len(parts) == 3 and all(part.isdigit() for part in parts)
+
+
+async def set_dates_directly(page, dates: Dict[str, str]) -> Dict[str, str]:
+    """
+    在页面的所有frame中直接设置日期（不打开日历控件）
+
+    Args:
+        page: Playwright页面
+        dates: {日期输入框ID: 'yyyy-mm-dd'}
+
+    Returns:
+        {元素ID: 'ok' / 'mismatch' / 'missing' / 'invalid'}，只有'ok'表示已核对成功
+    """
+    statuses: Dict[str, str] = {}
+    remaining = {}
+    for element_id, value in dates.items():
+        if is_valid_date_text(value):
+            remaining[element_id] = value
+        else:
+            statuses[element_id] = "invalid"
+
+    for frame in page.frames:
+        if not remaining:
+            break
+        try:
+            frame_results = await frame.evaluate(_SET_DATES_JS, remaining)
+        except Exception as e:
+            logger.debug("在iframe中设置日期失败: %s", e)
+            continue
+        for element_id, result in (frame_results or {}).items():
+            statuses[element_id] = result["status"]
+            remaining.pop(element_id, None)
+            logger.info(f"直接设置日期 {element_id} = {dates[element_id]} "
+                        f"({result['method']}, 当前值: {result['value']}, {result['status']})")
+
+    for element_id in remaining:
+        statuses[element_id] = "missing"
+    return statuses
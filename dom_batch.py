@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+页面内批量填写
+把多个输入框/下拉框的填写合并成每个frame一次evaluate，减少与浏览器之间的往返
+只适用于填写后不会触发服务器请求的字段（工号等字段仍需单独填写）
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# 在页面中批量填写：输入框通过原生setter赋值，下拉框按value或选项文字匹配，随后派发input/change事件
+_APPLY_FIELD_BATCH_JS = """
+(ops) => {
+    const results = {};
+    // 与dropdown_options.normalize_option_text一致：全角转半角、统一括号、去掉空白
+    const normalize = (text) => (text || '').normalize('NFKC')
+        .replace(/[\[【〔{]/g, '(').replace(/[\]】〕}]/g, ')').replace(/\s+/g, '').toLowerCase();
+    const inputSetter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set;
+    const textareaSetter = Object.getOwnPropertyDescriptor(HTMLTextAreaElement.prototype, 'value').set;
+    for (const op of ops) {
+        const el = document.getElementById(op.id) || document.querySelector(`[name="${op.id}"]`);
+        if (!el) {
+            continue;
+        }
+        if (el.tagName === 'SELECT') {
+            const options = Array.from(el.options);
+            const option = options.find(o => o.value === op.value)
+                || options.find(o => (o.text || '').trim() === op.value)
+                || options.find(o => normalize(o.text) === normalize(op.value));
+            if (!option) {
+                results[op.id] = 'no_option';
+                continue;
+            }
+            el.value = option.value;
+        } else if (el.tagName === 'TEXTAREA') {
+            textareaSetter.call(el, op.value);
+        } else {
+            inputSetter.call(el, op.value);
+        }
+        el.dispatchEvent(new Event('input', { bubbles: true }));
+        el.dispatchEvent(new Event('change', { bubbles: true }));
+        results[op.id] = 'ok';
+    }
+    return results;
+}
+"""
+
+
+@dataclass
+class FieldOp:
+    """批量填写中的一个字段"""
+    element_id: str
+    value: str
+    kind: str = "input"   # input / select，仅用于批量失败后的单独填写
+    title: str = ""       # 对应的列标题（用于日志）
+
+
+async def apply_field_batch(page, ops: List[FieldOp]) -> Dict[str, str]:
+    """
+    在页面的所有frame中批量填写字段，每个frame一次evaluate
+
+    同一ID出现多次时按顺序填写，最后一次的值生效（与逐个填写的结果一致）
+
+    Args:
+        page: Playwright页面
+        ops: 要填写的字段
+
+    Returns:
+        {元素ID: 'ok' / 'no_option' / 'missing'}
+    """
+    results: Dict[str, str] = {}
+    remaining = [{"id": op.element_id, "value": op.value} for op in ops]
+    for frame in page.frames:
+        if not remaining:
+            break
+        try:
+            frame_results = await frame.evaluate(_APPLY_FIELD_BATCH_JS, remaining)
+        except Exception as e:
+            logger.debug("在iframe中批量填写失败: %s", e)
+            continue
+        if frame_results:
+            results.update(frame_results)
+            remaining = [op for op in remaining if op["id"] not in frame_results]
+
+    for op in remaining:
+        results[op["id"]] = "missing"
+
+    ok_count = sum(1 for status in results.values() if status == "ok")
+    logger.info(f"批量填写 {len(ops)} 个字段: 成功 {ok_count} 个, 未完成 {len(results) - ok_count} 个")
+    return results
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下拉框选项缓存与归一化匹配
+每个下拉框的选项（value, 文字）只读取一次并按页面缓存，建立归一化索引（全角/半角、括号样式、空白），
+Excel中的文字可以直接解析成精确的选项值
+"""
+
+import re
+import unicodedata
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 归一化时统一成圆括号的括号
+_BRACKET_TABLE = str.maketrans({"[": "(", "]": ")", "【": "(", "】": ")", "〔": "(", "〕": ")", "{": "(", "}": ")"})
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# 读取下拉框的全部选项，不是下拉框时返回null
+_READ_SELECT_OPTIONS_JS = """
+(id) => {
+    const el = document.getElementById(id) || document.querySelector(`select[name="${id}"]`);
+    if (!el || el.tagName !== 'SELECT') {
+        return null;
+    }
+    return Array.from(el.options).map(o => [o.value, (o.text || '').trim()]);
+}
+"""
+
+
+def normalize_option_text(text) -> str:
+    """
+    归一化下拉框文字（全角转半角、统一括号、去掉所有空白）
+
+    如 '广　西（南宁）' 和 '广西(南宁)' 归一化后相同
+    """
+    if text is None:
+        return ""
+    text = unicodedata.normalize("NFKC", str(text)).translate(_BRACKET_TABLE)
+    return _WHITESPACE_PATTERN.sub("", text).lower()
+
+
+def build_normalized_mapping(mapping: Dict[str, str]) -> Dict[str, str]:
+    """为下拉框映射表（Excel文字 -> 选项值）建立归一化索引"""
+    normalized = {}
+    for text, option_value in mapping.items():
+        normalized.setdefault(normalize_option_text(text), option_value)
+    return normalized
+
+
+class SelectOptionIndex:
+    """一个下拉框的选项快照"""
+
+    def __init__(self, options: List[Tuple[str, str]]):
+        """
+        Args:
+            options: [(选项值, 选项文字)]
+        """
+        self.options = options
+        self.values = {value for value, _ in options}
+        self.by_label: Dict[str, str] = {}
+        self.by_normalized: Dict[str, str] = {}
+        for value, label in options:
+            self.by_label.setdefault(label, value)
+            self.by_normalized.setdefault(normalize_option_text(label), value)
+        for value, _ in options:
+            self.by_normalized.setdefault(normalize_option_text(value), value)
+
+    @property
+    def labels(self) -> List[str]:
+        return [label for _, label in self.options]
+
+    def resolve(self, text: str) -> Optional[str]:
+        """
+        把Excel中的文字解析成精确的选项值
+
+        Args:
+            text: 选项值或选项文字
+
+        Returns:
+            选项值，没有对应选项时返回None
+        """
+        if text in self.values:
+            return text
+        if text in self.by_label:
+            return self.by_label[text]
+        return self.by_normalized.get(normalize_option_text(text))
+
+
+class SelectOptionCache:
+    """按页面（frame地址）缓存的下拉框选项快照"""
+
+    def __init__(self):
+        self._snapshots: Dict[Tuple[str, str], SelectOptionIndex] = {}
+
+    def clear(self) -> None:
+        self._snapshots.clear()
+
+    async def get(self, frame, element_id: str, refresh: bool = False) -> Optional[SelectOptionIndex]:
+        """
+        获取下拉框的选项快照（每个页面只读取一次）
+
+        Args:
+            frame: 下拉框所在的frame
+            element_id: 下拉框ID（或name）
+            refresh: 是否重新读取（选项可能由其他字段联动加载）
+
+        Returns:
+            选项快照，该frame中没有这个下拉框时返回None
+        """
+        key = (frame.url, element_id)
+        if not refresh and key in self._snapshots:
+            return self._snapshots[key]
+        options = await frame.evaluate(_READ_SELECT_OPTIONS_JS, element_id)
+        if options is None:
+            return None
+        index = SelectOptionIndex([tuple(option) for option in options])
+        self._snapshots[key] = index
+        logger.debug("读取下拉框 %s 的选项: %s 个", element_id, len(index.options))
+        return index
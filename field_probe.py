@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字段类型探测
+第一次遇到某个元素ID时，在每个frame中一次evaluate读取所有待探测ID的tagName、type、readonly以及
+datepicker/jqGrid标记，判断字段类型（下拉框/日期/输入框等），结果按元素ID缓存并保存到文件
+"""
+
+import os
+import json
+import logging
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 在页面中读取元素特征，只返回当前frame中存在的元素
+_PROBE_FIELDS_JS = """
+(ids) => {
+    const results = {};
+    for (const id of ids) {
+        const el = document.getElementById(id);
+        if (!el) {
+            continue;
+        }
+        const className = typeof el.className === 'string' ? el.className : '';
+        const onclick = el.getAttribute('onclick') || '';
+        const onfocus = el.getAttribute('onfocus') || '';
+        results[id] = {
+            tag: el.tagName.toLowerCase(),
+            input_type: (el.getAttribute('type') || '').toLowerCase(),
+            readonly: !!el.readOnly,
+            datepicker: /hasDatepicker|Wdate/.test(className) || /WdatePicker|datepicker/i.test(onclick + onfocus),
+            in_jqgrid: !!el.closest('.ui-jqgrid')
+        };
+    }
+    return results;
+}
+"""
+
+
+@dataclass
+class FieldInfo:
+    """页面元素特征"""
+    tag: str
+    input_type: str = ""
+    readonly: bool = False
+    datepicker: bool = False
+    in_jqgrid: bool = False
+
+    @property
+    def kind(self) -> str:
+        """字段类型: select / date / radio / checkbox / button / textarea / input"""
+        if self.tag == "select":
+            return "select"
+        if self.datepicker or self.input_type == "date":
+            return "date"
+        if self.tag == "textarea":
+            return "textarea"
+        if self.tag == "button" or self.input_type in ("button", "submit"):
+            return "button"
+        if self.input_type in ("radio", "checkbox"):
+            return self.input_type
+        return "input"
+
+
+def is_probeable_id(element_id) -> bool:
+    """标题-ID映射中的值是否为元素ID（排除JavaScript函数调用等）"""
+    if not isinstance(element_id, str) or not element_id:
+        return False
+    return not any(ch in element_id for ch in "()'\" ;=")
+
+
+class FieldTypeCache:
+    """按元素ID缓存的字段类型，保存到JSON文件"""
+
+    def __init__(self, cache_file: str = None):
+        """
+        Args:
+            cache_file: 缓存文件路径
+        """
+        self.cache_file = cache_file or config.FIELD_TYPE_CACHE_FILE
+        self.fields: Dict[str, FieldInfo] = {}
+        # 当前页面上探测过但不存在的ID（页面框架变化时清空）
+        self._misses: set = set()
+        self._frame_key = None
+        self.load()
+
+    def load(self) -> None:
+        """从JSON文件加载"""
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.fields = {element_id: FieldInfo(**info) for element_id, info in data.items()}
+            logger.info(f"加载字段类型缓存: {len(self.fields)} 个元素")
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"读取字段类型缓存失败: {e}")
+            self.fields = {}
+
+    def save(self) -> None:
+        """保存到JSON文件"""
+        try:
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump({element_id: asdict(info) for element_id, info in self.fields.items()},
+                          f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            logger.warning(f"保存字段类型缓存失败: {e}")
+
+    def kind(self, element_id: str) -> Optional[str]:
+        """返回已缓存的字段类型，未探测到时返回None"""
+        info = self.fields.get(element_id)
+        return info.kind if info else None
+
+    async def probe(self, page, element_ids: Iterable[str]) -> int:
+        """
+        探测尚未缓存的元素，每个frame一次evaluate
+
+        Args:
+            page: Playwright页面
+            element_ids: 要探测的元素ID（通常为标题-ID映射中的全部ID）
+
+        Returns:
+            新探测到的元素数量
+        """
+        frames = page.frames
+        frame_key = tuple(frame.url for frame in frames)
+        if frame_key != self._frame_key:
+            self._frame_key = frame_key
+            self._misses = set()
+
+        pending: List[str] = [
+            element_id for element_id in dict.fromkeys(element_ids)
+            if is_probeable_id(element_id) and element_id not in self.fields and element_id not in self._misses
+        ]
+        if not pending:
+            return 0
+
+        found = {}
+        for frame in frames:
+            remaining = [element_id for element_id in pending if element_id not in found]
+            if not remaining:
+                break
+            try:
+                found.update(await frame.evaluate(_PROBE_FIELDS_JS, remaining))
+            except Exception as e:
+                logger.debug("在iframe中探测字段类型失败: %s", e)
+                continue
+
+        for element_id, info in found.items():
+            self.fields[element_id] = FieldInfo(**info)
+        self._misses.update(element_id for element_id in pending if element_id not in found)
+        if found:
+            self.save()
+            logger.info(f"探测字段类型: 新增 {len(found)} 个元素, 当前页面不存在 {len(pending) - len(found)} 个")
+        return len(found)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志配置
+调用方线程只把日志记录放入队列（QueueHandler），由后台QueueListener线程截断过长的URL、格式化并写入
+控制台和按大小轮转的日志文件，轮转出的旧文件用gzip压缩；各子模块可以单独设置日志级别
+"""
+
+import os
+import re
+import gzip
+import time
+import queue
+import atexit
+import shutil
+import logging
+import logging.handlers
+from typing import Dict, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_URL_PATTERN = re.compile(r"https?://\S+")
+
+# 当前生效的队列监听器（setup_logging重复调用时复用）
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["TimedQueueHandler"] = None
+
+
+class UrlTruncatingFilter(logging.Filter):
+    """截断日志中过长的URL（如带sso/context参数的main2.jsp地址），保留开头并注明原长度"""
+
+    def __init__(self, max_length: int = None):
+        super().__init__()
+        self.max_length = config.LOG_URL_MAX_LENGTH if max_length is None else max_length
+
+    def _truncate(self, match) -> str:
+        url = match.group(0)
+        if len(url) <= self.max_length:
+            return url
+        return f"{url[:self.max_length]}...(共{len(url)}字符)"
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # 同一条记录会依次经过文件和控制台两个handler，已截断过的不再处理（否则原长度会按截断后的文本计算）
+        if getattr(record, "urls_truncated", False):
+            return True
+        message = record.getMessage()
+        if "://" in message:
+            record.msg = _URL_PATTERN.sub(self._truncate, message)
+            record.args = None
+        record.urls_truncated = True
+        return True
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """按大小轮转的日志文件，旧文件压缩为 .gz"""
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.namer = lambda name: f"{name}.gz"
+        self.rotator = self._compress
+
+    @staticmethod
+    def _compress(source: str, dest: str) -> None:
+        with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+
+class TimedQueueHandler(logging.handlers.QueueHandler):
+    """记录调用方线程在日志上花费的时间，用于衡量日志开销"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.records = 0
+        self.caller_time = 0.0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        start = time.perf_counter()
+        super().emit(record)
+        self.caller_time += time.perf_counter() - start
+        self.records += 1
+
+
+def apply_subsystem_levels(levels: Dict[str, str] = None) -> None:
+    """
+    为各子模块设置日志级别
+
+    Args:
+        levels: {logger名称: 级别名称}，默认使用config.LOG_SUBSYSTEM_LEVELS
+    """
+    levels = config.LOG_SUBSYSTEM_LEVELS if levels is None else levels
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(getattr(logging, level))
+
+
+def setup_logging(log_file: Optional[str] = None, level: str = None, console: bool = True) -> logging.handlers.QueueListener:
+    """
+    配置根日志：调用方只入队，后台线程写控制台和轮转压缩的日志文件（重复调用时返回已有的监听器）
+
+    Args:
+        log_file: 日志文件路径，默认使用config.LOG_FILE，为空字符串时不写文件
+        level: 根日志级别名称，默认使用config.LOG_LEVEL
+        console: 是否输出到控制台
+
+    Returns:
+        QueueListener（程序退出时自动停止）
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _listener
+
+    log_file = config.LOG_FILE if log_file is None else log_file
+    formatter = logging.Formatter(config.LOG_FORMAT)
+    url_filter = UrlTruncatingFilter()
+
+    handlers = []
+    if log_file:
+        handlers.append(CompressingRotatingFileHandler(log_file, config.LOG_MAX_BYTES, config.LOG_BACKUP_COUNT))
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        handler.addFilter(url_filter)
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = TimedQueueHandler(log_queue)
+    root = logging.getLogger()
+    root.handlers = [_queue_handler]
+    root.setLevel(getattr(logging, level or config.LOG_LEVEL))
+    apply_subsystem_levels()
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def log_overhead() -> None:
+    """输出调用方线程在日志上花费的总时间"""
+    if _queue_handler is None or not _queue_handler.records:
+        return
+    average = _queue_handler.caller_time / _queue_handler.records * 1e6
+    logger.info(f"日志开销: {_queue_handler.records} 条, 调用方共耗时 {_queue_handler.caller_time * 1000:.1f}毫秒 "
+                f"(平均 {average:.1f}微秒/条)")
+
+
+def shutdown_logging() -> None:
+    """写完队列中剩余的日志并停止后台线程"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    # 之后的日志（如退出过程中的日志）直接写入，不再经过队列
+    logging.getLogger().handlers = list(_listener.handlers)
+    _listener = None
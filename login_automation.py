@@ -1,27 +1,61 @@
 import asyncio
+import argparse
 import pandas as pd
 from playwright.async_api import async_playwright, TimeoutError
 import logging
 from typing import Optional, Dict, Any, List
 import os
+import re
 import time
 from config import *
 import sys
+from selector_race import race_selectors
+from dom_batch import FieldOp, apply_field_batch
+from date_fill import set_dates_directly
+from field_probe import FieldTypeCache
+from dropdown_options import SelectOptionCache, build_normalized_mapping, normalize_option_text
+from bank_cards import (BankCardRegistry, read_bank_card_table, read_radio_card_number, click_bank_card,
+                        card_tail_matches)
+from strategy_memory import StrategyMemory, frame_name, page_role
+from negative_cache import AbsenceCache
+from step_trace import StepTracer, annotate, set_trace_context, traced_sleep
+from logging_setup import setup_logging, log_overhead
+from roundtrip_counter import RoundTripCounter
+from network_monitor import NetworkMonitor
+from profiler import Profiler
+from memory_monitor import MemoryMonitor
 
-# 配置日志
-logging.basicConfig(
-    level=getattr(logging, LOG_LEVEL),
-    format=LOG_FORMAT,
-    handlers=[
-        logging.FileHandler(LOG_FILE, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+# 日志在main()中通过setup_logging配置（后台线程写入，轮转压缩）
 logger = logging.getLogger(__name__)
 
+# 银行卡选择弹窗的特征选择器
+BANK_CARD_DIALOG_SELECTORS = [
+    "#paybankdiv",                                   # 主要的银行卡选择弹窗ID
+    "div.ui-dialog[aria-describedby='paybankdiv']",  # 完整的对话框
+    "div.ui-dialog-title:has-text('请选择卡号')",     # 对话框标题
+    "input[name='rdoacnt']",                         # 银行卡选择radio按钮
+    "table[style*='background-color:#F2FAFD']",      # 银行卡表格
+]
+
+# 下拉框列名到DROPDOWN_FIELDS配置名的映射
+DROPDOWN_TITLE_MAPPING = {
+    "省份": "省份地区",  # Excel列名 -> 配置名
+    "人员类型": "人员类型",  # 保持原样
+    "安排状态": "安排状态",  # 保持原样
+    "交通费": "交通费"  # 保持原样
+}
+
+# 通用对话框选择器（可能匹配到其他对话框，只作为最后的检查）
+GENERIC_DIALOG_SELECTORS = [
+    "div.ui-dialog-content",
+    "div.ui-dialog",
+]
+
 class LoginAutomation:
     def __init__(self, excel_file: str = EXCEL_FILE, mapping_file: str = MAPPING_FILE, 
-                 sheet_name: str = SHEET_NAME):
+                 sheet_name: str = SHEET_NAME, captcha: Optional[str] = None,
+                 headless: Optional[bool] = None, wait_for_close: bool = True, profile: bool = False,
+                 trace_memory: Optional[bool] = None):
         """
         初始化登录自动化类
         
@@ -29,10 +63,18 @@ class LoginAutomation:
             excel_file: 报销信息Excel文件路径
             mapping_file: 标题-ID映射文件路径
             sheet_name: 要处理的sheet名称
+            captcha: 登录验证码（不为None时不再等待用户输入，用于模拟系统和基准测试）
+            headless: 是否无头模式运行浏览器，默认使用config.HEADLESS
+            wait_for_close: 处理完成后是否等待用户按回车再关闭浏览器
+            profile: 是否对整批记录做性能剖析（调用栈采样和asyncio任务时间线，见profiler.py）
+            trace_memory: 是否用tracemalloc追踪Python内存，默认使用config.MEMORY_TRACEMALLOC_ENABLED（profile时开启）
         """
         self.excel_file = excel_file
         self.mapping_file = mapping_file
         self.sheet_name = sheet_name
+        self.captcha = captcha
+        self.headless = HEADLESS if headless is None else headless
+        self.wait_for_close = wait_for_close
         self.title_id_mapping = {}
         self.reimbursement_data = None
         self.browser = None
@@ -40,6 +82,23 @@ class LoginAutomation:
         self.current_sequence = None
         self.current_project_number = None  # 保存当前记录的报销项目号
         self.current_amount = None          # 保存当前记录的金额
+        self.current_work_id = None         # 保存当前转卡信息工号
+        self.bank_card_registry = BankCardRegistry()  # 按工号记录见过的银行卡
+        self.field_types = FieldTypeCache()  # 按元素ID缓存从页面探测到的字段类型
+        self.select_options = SelectOptionCache()  # 按页面缓存的下拉框选项快照
+        self.unmatched_dropdown_values = []  # 页面下拉框中没有对应选项的值 [(元素ID, 值)]
+        self._normalized_dropdown_mappings = {}  # 配置名 -> DROPDOWN_FIELDS映射表的归一化索引
+        self.strategy_memory = StrategyMemory()  # 按 (页面角色, 目标) 记录成功的查找策略
+        self.absence_cache = AbsenceCache()  # 当前页面状态下确认不存在的元素
+        self.step_tracer = StepTracer()  # 每个操作的计时span（写入JSONL追踪文件）
+        self.roundtrip_counter = RoundTripCounter()  # Playwright往返次数统计
+        self.network_monitor = NetworkMonitor(self.step_tracer)  # 按接口统计服务器时间
+        self.profiler = Profiler(self.step_tracer, enabled=profile)  # --profile时的采样剖析和任务时间线
+        # 每条记录后的内存采样和浏览器上下文回收
+        self.memory_monitor = MemoryMonitor(self.step_tracer, trace_python=True if profile else trace_memory)
+        self.startup_time = None  # 启动浏览器到打开目标页面的耗时（秒）
+        self.record_durations = []  # 每条记录（序号）的处理耗时 [(序号, 秒)]
+        self.records_wall_time = None  # 从开始处理第一条记录到最后一条记录处理完的总耗时（秒，含记录间等待和上下文回收）
         
     async def load_data(self):
         """加载Excel数据和标题-ID映射"""
@@ -110,26 +169,23 @@ class LoginAutomation:
         Returns:
             是否成功找到元素
         """
-        try:
-            # 优先在iframe中查找
-            frames = self.page.frames
-            for frame in frames:
-                try:
-                    element = frame.locator(f"#{element_id}").first
-                    if await element.count() > 0:
-                        logger.info(f"在iframe中找到元素: {element_id}")
-                        return True
-                except Exception as e:
-                    logger.debug(f"在iframe中查找元素失败: {e}")
-                    continue
-            
-            # 如果iframe中找不到，尝试在主页面查找
-            await self.page.wait_for_selector(f"#{element_id}", timeout=timeout * 1000)
+        # 优先在iframe中查找（页面没有变化时，已确认不存在的元素不再访问浏览器）
+        frames = self.page.frames
+        for frame in frames:
+            try:
+                if await self.absence_cache.count(frame, f"#{element_id}") > 0:
+                    logger.info(f"在iframe中找到元素: {element_id}")
+                    return True
+            except Exception as e:
+                logger.debug("在iframe中查找元素失败: %s", e)
+                continue
+        
+        # 如果iframe中找不到，尝试在主页面等待（上次等待超时后页面没有变化时直接返回）
+        if await self.absence_cache.wait_for_selector(self.page, f"#{element_id}", timeout * 1000):
             logger.info(f"在主页面中找到元素: {element_id}")
             return True
-        except TimeoutError:
-            logger.warning(f"等待元素超时: {element_id}")
-            return False
+        logger.warning(f"等待元素超时: {element_id}")
+        return False
     
     async def fill_input(self, element_id: str, value: str, retries: int = MAX_RETRIES, title: str = None):
         """
@@ -153,47 +209,51 @@ class LoginAutomation:
                 for frame in frames:
                     try:
                         # 在iframe中查找输入框
-                        input_element = frame.locator(f"#{element_id}").first
-                        if await input_element.count() > 0:
-                            await input_element.fill(value)
+                        if await self.absence_cache.count(frame, f"#{element_id}") > 0:
+                            await frame.locator(f"#{element_id}").first.fill(value)
                             logger.info(f"在iframe中成功填写输入框 {element_id}: {value}")
+                            annotate(frame=frame_name(frame), strategy="id", attempts=attempt + 1)
                             return
                     except Exception as e:
-                        logger.debug(f"在iframe中查找输入框失败: {e}")
+                        logger.debug("在iframe中查找输入框失败: %s", e)
                         continue
                 
                 # 如果iframe中找不到，尝试在主页面查找
                 if element_id and await self.wait_for_element(element_id):
                     await self.page.fill(f"#{element_id}", value)
                     logger.info(f"在主页面成功填写输入框 {element_id}: {value}")
+                    annotate(frame="main", strategy="id", attempts=attempt + 1)
                     return
                 
                 # 如果还是找不到，尝试通过name属性查找（优先在iframe中）
                 for frame in frames:
                     try:
-                        input_element = frame.locator(f"input[name='{element_id}']").first
-                        if await input_element.count() > 0:
-                            await input_element.fill(value)
+                        if await self.absence_cache.count(frame, f"input[name='{element_id}']") > 0:
+                            await frame.locator(f"input[name='{element_id}']").first.fill(value)
                             logger.info(f"在iframe中通过name属性成功填写输入框 {element_id}: {value}")
+                            annotate(frame=frame_name(frame), strategy="name", attempts=attempt + 1)
                             return
                     except Exception as e:
-                        logger.debug(f"在iframe中通过name属性查找失败: {e}")
+                        logger.debug("在iframe中通过name属性查找失败: %s", e)
                         continue
                 
                 # 最后尝试在主页面通过name属性查找
                 try:
-                    await self.page.fill(f"input[name='{element_id}']", value)
-                    logger.info(f"在主页面通过name属性成功填写输入框 {element_id}: {value}")
-                    return
+                    if await self.absence_cache.wait_for_selector(self.page, f"input[name='{element_id}']", 3000):
+                        await self.page.fill(f"input[name='{element_id}']", value)
+                        logger.info(f"在主页面通过name属性成功填写输入框 {element_id}: {value}")
+                        annotate(frame="main", strategy="name", attempts=attempt + 1)
+                        return
                 except Exception as e:
-                    logger.debug(f"在主页面通过name属性查找失败: {e}")
+                    logger.debug("在主页面通过name属性查找失败: %s", e)
                     
             except Exception as e:
                 logger.warning(f"填写输入框失败 (尝试 {attempt + 1}/{retries}): {element_id} - {e}")
                 if attempt < retries - 1:
-                    await asyncio.sleep(RETRY_DELAY)
+                    await traced_sleep(RETRY_DELAY)
         
         logger.error(f"填写输入框最终失败: {element_id}")
+        annotate(outcome="failed", attempts=retries)
     
     async def fill_date_input(self, element_id: str, value: str, retries: int = MAX_RETRIES):
         """
@@ -223,7 +283,7 @@ class LoginAutomation:
                     logger.info(f"✓ 在主页面成功填写日期输入框 {element_id}: {value}")
                     return
                 except Exception as e:
-                    logger.debug(f"等待元素出现失败: {e}")
+                    logger.debug("等待元素出现失败: %s", e)
                 
                 # 方法2: 通过JavaScript直接设置值（适用于readonly的日期输入框）
                 try:
@@ -252,9 +312,9 @@ class LoginAutomation:
                         logger.info(f"✓ 通过JavaScript成功填写日期输入框 {element_id}: {value}")
                         return
                     else:
-                        logger.debug(f"JavaScript未找到元素: {element_id}")
+                        logger.debug("JavaScript未找到元素: %s", element_id)
                 except Exception as e:
-                    logger.debug(f"JavaScript填写失败: {e}")
+                    logger.debug("JavaScript填写失败: %s", e)
                 
                 # 方法3: 通过属性选择器查找
                 try:
@@ -266,7 +326,7 @@ class LoginAutomation:
                     logger.info(f"✓ 通过dateinput属性成功填写日期输入框 {element_id}: {value}")
                     return
                 except Exception as e:
-                    logger.debug(f"通过dateinput属性查找失败: {e}")
+                    logger.debug("通过dateinput属性查找失败: %s", e)
                 
                 # 方法4: 通过class查找
                 try:
@@ -278,7 +338,7 @@ class LoginAutomation:
                     logger.info(f"✓ 通过dateInput类成功填写日期输入框 {element_id}: {value}")
                     return
                 except Exception as e:
-                    logger.debug(f"通过dateInput类查找失败: {e}")
+                    logger.debug("通过dateInput类查找失败: %s", e)
                 
                 # 方法5: 通过部分ID匹配查找
                 try:
@@ -290,7 +350,7 @@ class LoginAutomation:
                     logger.info(f"✓ 通过部分ID匹配成功填写日期输入框 {element_id}: {value}")
                     return
                 except Exception as e:
-                    logger.debug(f"通过部分ID匹配查找失败: {e}")
+                    logger.debug("通过部分ID匹配查找失败: %s", e)
                 
                 # 方法6: 如果主页面找不到，再尝试在iframe中查找
                 frames = self.page.frames
@@ -298,7 +358,7 @@ class LoginAutomation:
                 
                 for i, frame in enumerate(frames):
                     try:
-                        logger.debug(f"在iframe {i} 中查找: {frame.url or 'unnamed frame'}")
+                        logger.debug("在iframe %s 中查找: %s", i, frame.url or 'unnamed frame')
                         
                         # 在iframe中查找日期输入框
                         input_element = frame.locator(f"#{element_id}").first
@@ -309,27 +369,28 @@ class LoginAutomation:
                             logger.info(f"✓ 在iframe {i} 中成功填写日期输入框 {element_id}: {value}")
                             return
                         else:
-                            logger.debug(f"在iframe {i} 中未找到元素 {element_id}")
+                            logger.debug("在iframe %s 中未找到元素 %s", i, element_id)
                             
                     except Exception as e:
-                        logger.debug(f"在iframe {i} 中查找失败: {e}")
+                        logger.debug("在iframe %s 中查找失败: %s", i, e)
                         continue
                 
                 # 如果所有方法都失败，等待一下再重试
                 if attempt < retries - 1:
                     logger.warning(f"填写日期输入框失败 (尝试 {attempt + 1}/{retries}): {element_id}")
                     logger.info(f"等待 {RETRY_DELAY} 秒后重试...")
-                    await asyncio.sleep(RETRY_DELAY)
+                    await traced_sleep(RETRY_DELAY)
                     
                     # 额外等待页面加载
-                    await asyncio.sleep(2)
+                    await traced_sleep(2)
                     
             except Exception as e:
                 logger.warning(f"填写日期输入框异常 (尝试 {attempt + 1}/{retries}): {element_id} - {e}")
                 if attempt < retries - 1:
-                    await asyncio.sleep(RETRY_DELAY)
+                    await traced_sleep(RETRY_DELAY)
         
         logger.error(f"填写日期输入框最终失败: {element_id}")
+        annotate(outcome="failed", attempts=retries)
         logger.info("建议检查：")
         logger.info("1. 元素ID是否正确")
         logger.info("2. 页面是否完全加载")
@@ -357,6 +418,7 @@ class LoginAutomation:
             logger.info(f"解析日期: 年={year}, 月={month}, 日={day}")
         except Exception as e:
             logger.error(f"日期格式错误: {value}, 期望格式: yyyy-mm-dd")
+            annotate(outcome="failed")
             return
         
         for attempt in range(retries):
@@ -368,7 +430,7 @@ class LoginAutomation:
                     await self.page.click(f"#{element_id}")
                     logger.info(f"✓ 成功点击日期输入框: {element_id}")
                 except Exception as e:
-                    logger.debug(f"点击日期输入框失败: {e}")
+                    logger.debug("点击日期输入框失败: %s", e)
                     # 尝试在iframe中点击
                     frames = self.page.frames
                     for i, frame in enumerate(frames):
@@ -379,7 +441,7 @@ class LoginAutomation:
                                 logger.info(f"✓ 在iframe {i} 中成功点击日期输入框: {element_id}")
                                 break
                         except Exception as e:
-                            logger.debug(f"在iframe {i} 中点击失败: {e}")
+                            logger.debug("在iframe %s 中点击失败: %s", i, e)
                             continue
                     else:
                         logger.warning(f"无法点击日期输入框: {element_id}")
@@ -390,7 +452,7 @@ class LoginAutomation:
                     await self.page.wait_for_selector("#ui-datepicker-div", state="visible", timeout=5000)
                     logger.info("✓ jQuery UI日历控件已出现")
                 except Exception as e:
-                    logger.debug(f"等待jQuery UI日历控件失败: {e}")
+                    logger.debug("等待jQuery UI日历控件失败: %s", e)
                     # 尝试其他可能的日历控件选择器
                     calendar_selectors = [
                         "#ui-datepicker-div",
@@ -423,14 +485,14 @@ class LoginAutomation:
                     await self.page.click(f'option[value="{year}"]')
                     logger.info(f"✓ 选择年份: {year}")
                 except Exception as e:
-                    logger.debug(f"选择年份失败: {e}")
+                    logger.debug("选择年份失败: %s", e)
                     # 尝试其他年份选择方式
                     try:
                         # 直接点击年份文本
                         await self.page.click(f'text={year}')
                         logger.info(f"✓ 通过文本选择年份: {year}")
                     except Exception as e2:
-                        logger.debug(f"通过文本选择年份也失败: {e2}")
+                        logger.debug("通过文本选择年份也失败: %s", e2)
                         continue
                 
                 # 4. 选择月份（基于实际HTML结构）
@@ -444,7 +506,7 @@ class LoginAutomation:
                     await self.page.click(f'option[value="{month_index}"]')
                     logger.info(f"✓ 选择月份: {month} (索引: {month_index})")
                 except Exception as e:
-                    logger.debug(f"选择月份失败: {e}")
+                    logger.debug("选择月份失败: %s", e)
                     # 尝试其他月份选择方式
                     try:
                         # 直接点击月份文本
@@ -454,7 +516,7 @@ class LoginAutomation:
                         await self.page.click(f'text={month_name}')
                         logger.info(f"✓ 通过文本选择月份: {month_name}")
                     except Exception as e2:
-                        logger.debug(f"通过文本选择月份也失败: {e2}")
+                        logger.debug("通过文本选择月份也失败: %s", e2)
                         continue
                 
                 # 5. 选择日期（基于实际HTML结构）
@@ -465,7 +527,7 @@ class LoginAutomation:
                     logger.info(f"✓ 选择日期: {day}")
                     
                     # 等待日期选择完成
-                    await asyncio.sleep(1)
+                    await traced_sleep(1)
                     
                     # 验证日期是否已填写
                     try:
@@ -473,13 +535,13 @@ class LoginAutomation:
                         logger.info(f"✓ 日期填写完成，当前值: {current_value}")
                         return
                     except Exception as e:
-                        logger.debug(f"验证日期值失败: {e}")
+                        logger.debug("验证日期值失败: %s", e)
                         # 如果验证失败，但操作看起来成功了，也返回
                         logger.info("✓ 日期选择操作完成")
                         return
                         
                 except Exception as e:
-                    logger.debug(f"选择日期失败: {e}")
+                    logger.debug("选择日期失败: %s", e)
                     # 尝试其他日期选择方式
                     try:
                         # 尝试点击包含日期的元素（基于实际HTML结构）
@@ -487,7 +549,7 @@ class LoginAutomation:
                         logger.info(f"✓ 通过data-handler选择日期: {day}")
                         return
                     except Exception as e2:
-                        logger.debug(f"通过data-handler选择日期也失败: {e2}")
+                        logger.debug("通过data-handler选择日期也失败: %s", e2)
                         
                         # 最后尝试：直接点击包含日期的td元素
                         try:
@@ -495,22 +557,24 @@ class LoginAutomation:
                             logger.info(f"✓ 通过href选择日期: {day}")
                             return
                         except Exception as e3:
-                            logger.debug(f"通过href选择日期也失败: {e3}")
+                            logger.debug("通过href选择日期也失败: %s", e3)
                             continue
                 
             except Exception as e:
                 logger.warning(f"填写只读日期输入框异常 (尝试 {attempt + 1}/{retries}): {element_id} - {e}")
                 if attempt < retries - 1:
-                    await asyncio.sleep(RETRY_DELAY)
+                    await traced_sleep(RETRY_DELAY)
         
         logger.error(f"填写只读日期输入框最终失败: {element_id}")
+        annotate(outcome="failed", attempts=retries)
         logger.info("建议检查：")
         logger.info("1. 日期输入框ID是否正确")
         logger.info("2. 日历控件是否正确加载")
         logger.info("3. 日期格式是否正确 (yyyy-mm-dd)")
         logger.info("4. 是否需要先点击其他元素来显示日期输入框")
 
-    async def select_date_from_calendar(self, element_id: str, value: str, retries: int = MAX_RETRIES):
+    async def select_date_from_calendar(self, element_id: str, value: str, retries: int = MAX_RETRIES,
+                                        fast_path: bool = True):
         """
         基于jQuery UI日历控件的精确日期选择方法
         
@@ -518,7 +582,15 @@ class LoginAutomation:
             element_id: 日期输入框的ID
             value: 要填写的日期值（格式：yyyy-mm-dd）
             retries: 重试次数
+            fast_path: 是否先尝试直接设置日期（datepicker API或去掉readonly赋值）
         """
+        # 快速路径：直接设置日期，核对成功后不再打开日历控件
+        if fast_path and DATE_FAST_PATH:
+            status = (await set_dates_directly(self.page, {element_id: value})).get(element_id)
+            if status == "ok":
+                return
+            logger.info(f"直接设置日期未核对成功 ({status})，使用日历控件选择: {element_id}")
+        
         logger.info(f"开始使用jQuery UI日历控件选择日期: {element_id} = {value}")
         
         # 解析日期
@@ -530,6 +602,7 @@ class LoginAutomation:
             logger.info(f"解析日期: 年={year}, 月={month}, 日={day}")
         except Exception as e:
             logger.error(f"日期格式错误: {value}, 期望格式: yyyy-mm-dd")
+            annotate(outcome="failed")
             return
         
         for attempt in range(retries):
@@ -543,7 +616,7 @@ class LoginAutomation:
                     logger.info(f"✓ 在主页面成功点击日期输入框: {element_id}")
                     target_frame = self.page
                 except Exception as e:
-                    logger.debug(f"主页面点击日期输入框失败: {e}")
+                    logger.debug("主页面点击日期输入框失败: %s", e)
                     # 尝试在iframe中点击
                     frames = self.page.frames
                     for i, frame in enumerate(frames):
@@ -555,7 +628,7 @@ class LoginAutomation:
                                 target_frame = frame
                                 break
                         except Exception as e:
-                            logger.debug(f"在iframe {i} 中点击失败: {e}")
+                            logger.debug("在iframe %s 中点击失败: %s", i, e)
                             continue
                     else:
                         logger.warning(f"无法点击日期输入框: {element_id}")
@@ -572,7 +645,7 @@ class LoginAutomation:
                     calendar_found = True
                     calendar_frame = self.page
                 except Exception as e:
-                    logger.debug(f"主页面等待jQuery UI日历控件失败: {e}")
+                    logger.debug("主页面等待jQuery UI日历控件失败: %s", e)
                 
                 # 如果主页面没找到，在所有iframe中查找
                 if not calendar_found:
@@ -587,7 +660,7 @@ class LoginAutomation:
                             calendar_frame = frame
                             break
                         except Exception as e:
-                            logger.debug(f"iframe {i} 等待jQuery UI日历控件失败: {e}")
+                            logger.debug("iframe %s 等待jQuery UI日历控件失败: %s", i, e)
                             continue
                 
                 # 如果还是没找到，尝试其他选择器
@@ -629,7 +702,7 @@ class LoginAutomation:
                 if not calendar_found:
                     logger.warning("未找到日历控件，等待更长时间...")
                     # 等待更长时间，然后再次检查
-                    await asyncio.sleep(2)
+                    await traced_sleep(2)
                     
                     # 再次检查所有frame
                     try:
@@ -659,9 +732,9 @@ class LoginAutomation:
                     logger.info(f"✓ 选择年份: {year}")
                     
                     # 等待年份选择生效
-                    await asyncio.sleep(0.5)
+                    await traced_sleep(0.5)
                 except Exception as e:
-                    logger.debug(f"select_option选择年份失败: {e}")
+                    logger.debug("select_option选择年份失败: %s", e)
                     # 尝试其他年份选择方式
                     try:
                         # 方法2：直接点击年份下拉框，然后点击选项
@@ -669,7 +742,7 @@ class LoginAutomation:
                         logger.info("✓ 点击年份下拉框")
                         
                         # 等待下拉框展开
-                        await asyncio.sleep(0.5)
+                        await traced_sleep(0.5)
                         
                         # 选择指定年份
                         year_option = calendar_frame.locator(f'.ui-datepicker-year option[value="{year}"]').first
@@ -681,7 +754,7 @@ class LoginAutomation:
                             await calendar_frame.click(f'text={year}')
                             logger.info(f"✓ 通过文本选择年份: {year}")
                     except Exception as e2:
-                        logger.debug(f"点击选择年份也失败: {e2}")
+                        logger.debug("点击选择年份也失败: %s", e2)
                         continue
                 
                 # 4. 选择月份（基于实际HTML结构）
@@ -692,9 +765,9 @@ class LoginAutomation:
                     logger.info(f"✓ 选择月份: {month} (索引: {month_index})")
                     
                     # 等待月份选择生效
-                    await asyncio.sleep(0.5)
+                    await traced_sleep(0.5)
                 except Exception as e:
-                    logger.debug(f"select_option选择月份失败: {e}")
+                    logger.debug("select_option选择月份失败: %s", e)
                     # 尝试其他月份选择方式
                     try:
                         # 方法2：直接点击月份下拉框，然后点击选项
@@ -702,7 +775,7 @@ class LoginAutomation:
                         logger.info("✓ 点击月份下拉框")
                         
                         # 等待下拉框展开
-                        await asyncio.sleep(0.5)
+                        await traced_sleep(0.5)
                         
                         # 选择指定月份（月份索引从0开始，所以需要减1）
                         month_index = month - 1
@@ -718,13 +791,13 @@ class LoginAutomation:
                             await calendar_frame.click(f'text={month_name}')
                             logger.info(f"✓ 通过文本选择月份: {month_name}")
                     except Exception as e2:
-                        logger.debug(f"点击选择月份也失败: {e2}")
+                        logger.debug("点击选择月份也失败: %s", e2)
                         continue
                 
                 # 5. 选择日期（基于实际HTML结构）
                 try:
                     # 等待日历更新
-                    await asyncio.sleep(0.5)
+                    await traced_sleep(0.5)
                     
                     # 根据实际HTML结构，日期是通过<a>标签实现的
                     # 尝试多种日期选择方式
@@ -753,7 +826,7 @@ class LoginAutomation:
                                 date_clicked = True
                                 break
                         except Exception as e:
-                            logger.debug(f"日期选择器 {selector} 失败: {e}")
+                            logger.debug("日期选择器 %s 失败: %s", selector, e)
                             continue
                     
                     if not date_clicked:
@@ -779,11 +852,11 @@ class LoginAutomation:
                                 logger.info(f"✓ 通过JavaScript成功选择日期: {day}")
                                 date_clicked = True
                         except Exception as e:
-                            logger.debug(f"JavaScript选择日期失败: {e}")
+                            logger.debug("JavaScript选择日期失败: %s", e)
                     
                     if date_clicked:
                         # 等待日期选择完成
-                        await asyncio.sleep(1)
+                        await traced_sleep(1)
                         
                         # 验证日期是否已填写
                         try:
@@ -791,7 +864,7 @@ class LoginAutomation:
                             logger.info(f"✓ 日期填写完成，当前值: {current_value}")
                             return
                         except Exception as e:
-                            logger.debug(f"验证日期值失败: {e}")
+                            logger.debug("验证日期值失败: %s", e)
                             # 如果验证失败，但操作看起来成功了，也返回
                             logger.info("✓ 日期选择操作完成")
                             return
@@ -800,21 +873,49 @@ class LoginAutomation:
                         continue
                         
                 except Exception as e:
-                    logger.debug(f"选择日期失败: {e}")
+                    logger.debug("选择日期失败: %s", e)
                     continue
                 
             except Exception as e:
                 logger.warning(f"选择日期异常 (尝试 {attempt + 1}/{retries}): {element_id} - {e}")
                 if attempt < retries - 1:
-                    await asyncio.sleep(RETRY_DELAY)
+                    await traced_sleep(RETRY_DELAY)
         
         logger.error(f"选择日期最终失败: {element_id}")
+        annotate(outcome="failed", attempts=retries)
         logger.info("建议检查：")
         logger.info("1. 日期输入框ID是否正确")
         logger.info("2. 日历控件是否正确加载")
         logger.info("3. 日期格式是否正确 (yyyy-mm-dd)")
         logger.info("4. 是否需要先点击其他元素来显示日期输入框")
     
+    async def fill_dates(self, date_fills: list):
+        """
+        批量填写多个日期：先在页面中一次直接设置，未核对成功的再逐个使用日历控件
+        
+        Args:
+            date_fills: [(日期输入框ID, 日期值yyyy-mm-dd, 列标题)]
+        """
+        if not date_fills:
+            return
+        
+        statuses = {}
+        if DATE_FAST_PATH:
+            statuses = await set_dates_directly(self.page, {input_id: value for input_id, value, _ in date_fills})
+        
+        for input_id, value_str, title in date_fills:
+            if statuses.get(input_id) == "ok":
+                logger.info(f"日期填写完成: {title}")
+                continue
+            logger.info(f"检测到日期输入框: {input_id} = {value_str}")
+            try:
+                await self.select_date_from_calendar(input_id, value_str, fast_path=False)
+                logger.info(f"日期填写完成: {title}")
+            except Exception as e:
+                logger.warning(f"日期选择失败，尝试普通输入: {e}")
+                await self.fill_input(input_id, value_str, title=title)
+                logger.info(f"填写{title}: {value_str}")
+    
     async def click_radio_button(self, element_id: str, retries: int = MAX_RETRIES):
         """
         点击radio按钮
@@ -841,7 +942,7 @@ class LoginAutomation:
                         if await radio_element.count() > 0:
                             await radio_element.click()
                             logger.info(f"✓ 在iframe {i} 中成功点击radio按钮 (策略1): {element_id}")
-                            await asyncio.sleep(BUTTON_CLICK_WAIT)
+                            await traced_sleep(BUTTON_CLICK_WAIT)
                             return
                         
                         # 策略2: 通过name和value查找（新业务类型radio）
@@ -850,7 +951,7 @@ class LoginAutomation:
                         if await radio_element.count() > 0:
                             await radio_element.click()
                             logger.info(f"✓ 在iframe {i} 中成功点击radio按钮 (策略2): {element_id}")
-                            await asyncio.sleep(BUTTON_CLICK_WAIT)
+                            await traced_sleep(BUTTON_CLICK_WAIT)
                             return
                         
                         # 策略3: 通过文本内容查找（点击span文本）
@@ -859,7 +960,7 @@ class LoginAutomation:
                         if await text_element.count() > 0:
                             await text_element.click()
                             logger.info(f"✓ 在iframe {i} 中成功点击radio按钮 (策略3): {element_id}")
-                            await asyncio.sleep(BUTTON_CLICK_WAIT)
+                            await traced_sleep(BUTTON_CLICK_WAIT)
                             return
                         
                         # 策略4: 通过li元素查找（点击包含文本的li）
@@ -868,11 +969,11 @@ class LoginAutomation:
                         if await li_element.count() > 0:
                             await li_element.click()
                             logger.info(f"✓ 在iframe {i} 中成功点击radio按钮 (策略4): {element_id}")
-                            await asyncio.sleep(BUTTON_CLICK_WAIT)
+                            await traced_sleep(BUTTON_CLICK_WAIT)
                             return
                             
                     except Exception as e:
-                        logger.debug(f"在iframe {i} 中查找radio按钮失败: {e}")
+                        logger.debug("在iframe %s 中查找radio按钮失败: %s", i, e)
                         continue
                 
                 # 方法2: 在主页面查找radio按钮（多种策略）
@@ -885,7 +986,7 @@ class LoginAutomation:
                     if await radio_element.count() > 0:
                         await radio_element.click()
                         logger.info(f"✓ 在主页面成功点击radio按钮 (策略1): {element_id}")
-                        await asyncio.sleep(BUTTON_CLICK_WAIT)
+                        await traced_sleep(BUTTON_CLICK_WAIT)
                         return
                     
                     # 策略2: 通过name和value查找（新业务类型radio）
@@ -894,7 +995,7 @@ class LoginAutomation:
                     if await radio_element.count() > 0:
                         await radio_element.click()
                         logger.info(f"✓ 在主页面成功点击radio按钮 (策略2): {element_id}")
-                        await asyncio.sleep(BUTTON_CLICK_WAIT)
+                        await traced_sleep(BUTTON_CLICK_WAIT)
                         return
                     
                     # 策略3: 通过文本内容查找（点击span文本）
@@ -903,7 +1004,7 @@ class LoginAutomation:
                     if await text_element.count() > 0:
                         await text_element.click()
                         logger.info(f"✓ 在主页面成功点击radio按钮 (策略3): {element_id}")
-                        await asyncio.sleep(BUTTON_CLICK_WAIT)
+                        await traced_sleep(BUTTON_CLICK_WAIT)
                         return
                     
                     # 策略4: 通过li元素查找（点击包含文本的li）
@@ -912,11 +1013,11 @@ class LoginAutomation:
                     if await li_element.count() > 0:
                         await li_element.click()
                         logger.info(f"✓ 在主页面成功点击radio按钮 (策略4): {element_id}")
-                        await asyncio.sleep(BUTTON_CLICK_WAIT)
+                        await traced_sleep(BUTTON_CLICK_WAIT)
                         return
                         
                 except Exception as e:
-                    logger.debug(f"主页面查找radio按钮失败: {e}")
+                    logger.debug("主页面查找radio按钮失败: %s", e)
                 
                 logger.warning(f"未找到radio按钮: {element_id}")
                 logger.info("建议检查：")
@@ -929,109 +1030,61 @@ class LoginAutomation:
             except Exception as e:
                 logger.warning(f"点击radio按钮失败 (尝试 {attempt + 1}/{retries}): {element_id} - {e}")
                 if attempt < retries - 1:
-                    await asyncio.sleep(RETRY_DELAY)
+                    await traced_sleep(RETRY_DELAY)
                 else:
                     logger.error(f"点击radio按钮最终失败: {element_id}")
+                    annotate(outcome="failed", attempts=retries)
     
     async def click_button_by_btnname(self, btnname: str, retries: int = MAX_RETRIES):
         """
         通过btnName属性动态查找并点击按钮
-        
+
+        按 (选择器, frame) 组合逐个查找，上次成功的组合优先；所有组合都失败的按钮在一段时间内直接返回失败
+
         Args:
             btnname: 按钮的btnName属性值
             retries: 重试次数
         """
         logger.info(f"尝试通过btnName点击按钮: {btnname}")
-        
+        role = page_role(self.page)
+        target = f"btn:{btnname}"
+        if self.strategy_memory.is_dead(role, target):
+            logger.warning(f"按钮 {btnname} 在当前页面已标记为不可用，直接跳过")
+            return False
+
         # 等待页面完全加载
-        await asyncio.sleep(0.5)
-        
-        # 获取所有iframe
-        frames = self.page.frames
-        button_found = False
-        
-        # 方法1: 优先在iframe中动态查找按钮
-        for frame in frames:
-            try:
-                logger.info(f"在iframe中查找按钮: {frame.url or 'unnamed frame'}")
-                
-                # 使用btnname选择器在iframe中查找
-                selector = f"button[btnname='{btnname}']"
-                button = frame.locator(selector).first
-                
-                if await button.count() > 0:
-                    await button.click()
-                    logger.info(f"✓ 在iframe中成功点击按钮 (btnname: {btnname})")
-                    button_found = True
-                    break
-                else:
-                    logger.debug(f"在iframe {frame.url} 中未找到按钮 {btnname}")
-                    
-            except Exception as e:
-                logger.debug(f"在iframe中查找按钮时出错: {e}")
-                continue
-        
-        # 方法2: 如果iframe中没找到，尝试在主页面查找
-        if not button_found:
-            logger.info("在iframe中未找到按钮，尝试在主页面查找...")
+        await traced_sleep(0.5)
+
+        # 先用btnname选择器查找所有frame（包括主页面），再使用其他选择器
+        selectors = [
+            ("btnname", f"button[btnname='{btnname}']"),
+            ("guid", f"button[guid*='{btnname}']"),
+            ("text", f"button:has-text('{btnname}')"),
+            ("input_btnname", f"input[btnname='{btnname}']"),
+            ("any_btnname", f"[btnname='{btnname}']"),
+        ]
+        strategies = {}
+        for selector_name, selector in selectors:
+            for frame in self.page.frames:
+                strategies.setdefault(f"{selector_name}@{frame_name(frame) or 'main'}", (selector, frame))
+
+        for name in self.strategy_memory.order(role, target, list(strategies)):
+            selector, frame = strategies[name]
             try:
-                selector = f"button[btnname='{btnname}']"
-                button = self.page.locator(selector).first
-                if await button.count() > 0:
-                    await button.click()
-                    logger.info(f"✓ 在主页面成功点击按钮 (btnname: {btnname})")
-                    button_found = True
+                if await self.absence_cache.count(frame, selector) > 0:
+                    await frame.locator(selector).first.click()
+                    logger.info(f"✓ 成功点击按钮 (btnname: {btnname}, 策略: {name})")
+                    annotate(frame=frame_name(frame), strategy=f"btnname:{name}")
+                    self.strategy_memory.record_success(role, target, name)
+                    await traced_sleep(BUTTON_CLICK_WAIT)
+                    return True
             except Exception as e:
-                logger.debug(f"主页面选择器失败: {e}")
-        
-        # 方法3: 如果还是没找到，尝试其他选择器
-        if not button_found:
-            logger.info("尝试使用其他选择器查找按钮...")
-            alternative_selectors = [
-                f"button[guid*='{btnname}']",
-                f"button:has-text('{btnname}')",
-                f"input[btnname='{btnname}']",
-                f"[btnname='{btnname}']"
-            ]
-            
-            for selector in alternative_selectors:
-                try:
-                    # 在iframe中查找
-                    for frame in frames:
-                        try:
-                            button = frame.locator(selector).first
-                            if await button.count() > 0:
-                                await button.click()
-                                logger.info(f"✓ 在iframe中使用备用选择器成功点击按钮: {selector}")
-                                button_found = True
-                                break
-                        except Exception as e:
-                            continue
-                    
-                    if button_found:
-                        break
-                    
-                    # 在主页面查找
-                    try:
-                        button = self.page.locator(selector).first
-                        if await button.count() > 0:
-                            await button.click()
-                            logger.info(f"✓ 在主页面使用备用选择器成功点击按钮: {selector}")
-                            button_found = True
-                            break
-                    except Exception as e:
-                        continue
-                        
-                except Exception as e:
-                    logger.debug(f"备用选择器 {selector} 失败: {e}")
-                    continue
-        
-        if button_found:
-            await asyncio.sleep(BUTTON_CLICK_WAIT)
-            return True
-        else:
-            logger.error(f"点击按钮最终失败: {btnname}")
-            return False
+                logger.debug("策略 %s 查找按钮时出错: %s", name, e)
+
+        logger.error(f"点击按钮最终失败: {btnname}")
+        annotate(outcome="failed")
+        self.strategy_memory.record_failure(role, target)
+        return False
 
     async def click_first_row_reservation_button(self, retries: int = MAX_RETRIES):
         """
@@ -1061,13 +1114,13 @@ class LoginAutomation:
                     if await button.count() > 0:
                         await button.click()
                         logger.info("✓ 在主页面成功点击第一行的预约按钮")
-                        await asyncio.sleep(BUTTON_CLICK_WAIT)
+                        await traced_sleep(BUTTON_CLICK_WAIT)
                         return True
                     else:
                         logger.debug("主页面未找到预约按钮")
                         
                 except Exception as e:
-                    logger.debug(f"主页面查找失败: {e}")
+                    logger.debug("主页面查找失败: %s", e)
                 
                 # 方法2: 在iframe中查找表格和预约按钮
                 logger.info("在主页面未找到，尝试在iframe中查找...")
@@ -1086,13 +1139,13 @@ class LoginAutomation:
                         if await button.count() > 0:
                             await button.click()
                             logger.info(f"✓ 在iframe {i} 中成功点击第一行的预约按钮")
-                            await asyncio.sleep(BUTTON_CLICK_WAIT)
+                            await traced_sleep(BUTTON_CLICK_WAIT)
                             return True
                         else:
-                            logger.debug(f"iframe {i} 中未找到预约按钮")
+                            logger.debug("iframe %s 中未找到预约按钮", i)
                             
                     except Exception as e:
-                        logger.debug(f"在iframe {i} 中查找失败: {e}")
+                        logger.debug("在iframe %s 中查找失败: %s", i, e)
                         continue
                 
                 # 方法3: 更宽松的查找策略
@@ -1104,10 +1157,10 @@ class LoginAutomation:
                         if await button.count() > 0:
                             await button.click()
                             logger.info(f"✓ 在iframe {i} 中找到并点击预约按钮")
-                            await asyncio.sleep(BUTTON_CLICK_WAIT)
+                            await traced_sleep(BUTTON_CLICK_WAIT)
                             return True
                     except Exception as e:
-                        logger.debug(f"在iframe {i} 中宽松查找失败: {e}")
+                        logger.debug("在iframe %s 中宽松查找失败: %s", i, e)
                         continue
                 
                 # 方法4: 在主页面尝试宽松查找
@@ -1116,10 +1169,10 @@ class LoginAutomation:
                     if await button.count() > 0:
                         await button.click()
                         logger.info("✓ 在主页面找到并点击预约按钮")
-                        await asyncio.sleep(BUTTON_CLICK_WAIT)
+                        await traced_sleep(BUTTON_CLICK_WAIT)
                         return True
                 except Exception as e:
-                    logger.debug(f"主页面宽松查找失败: {e}")
+                    logger.debug("主页面宽松查找失败: %s", e)
                 
                 logger.warning(f"未找到预约按钮 (尝试 {attempt + 1}/{retries})")
                 
@@ -1127,11 +1180,11 @@ class LoginAutomation:
                 logger.warning(f"点击预约按钮失败 (尝试 {attempt + 1}/{retries}): {e}")
                 
                 if attempt < retries - 1:
-                    await asyncio.sleep(RETRY_DELAY)
+                    await traced_sleep(RETRY_DELAY)
                 else:
                     logger.error("点击预约按钮最终失败")
-                    return False
         
+        annotate(outcome="failed", attempts=retries)
         return False
     
     async def click_button(self, element_id: str, retries: int = MAX_RETRIES):
@@ -1149,21 +1202,22 @@ class LoginAutomation:
                 for frame in frames:
                     try:
                         # 在iframe中通过ID点击
-                        button_element = frame.locator(f"#{element_id}").first
-                        if await button_element.count() > 0:
-                            await button_element.click()
+                        if await self.absence_cache.count(frame, f"#{element_id}") > 0:
+                            await frame.locator(f"#{element_id}").first.click()
                             logger.info(f"在iframe中成功点击按钮: {element_id}")
-                            await asyncio.sleep(BUTTON_CLICK_WAIT)
+                            annotate(frame=frame_name(frame), strategy="id", attempts=attempt + 1)
+                            await traced_sleep(BUTTON_CLICK_WAIT)
                             return
                     except Exception as e:
-                        logger.debug(f"在iframe中查找按钮失败: {e}")
+                        logger.debug("在iframe中查找按钮失败: %s", e)
                         continue
                 
                 # 如果iframe中找不到，尝试在主页面通过ID点击
                 if element_id and await self.wait_for_element(element_id):
                     await self.page.click(f"#{element_id}")
                     logger.info(f"在主页面成功点击按钮: {element_id}")
-                    await asyncio.sleep(BUTTON_CLICK_WAIT)
+                    annotate(frame="main", strategy="id", attempts=attempt + 1)
+                    await traced_sleep(BUTTON_CLICK_WAIT)
                     return
                 else:
                     # 如果ID不存在，尝试通过btnName点击
@@ -1172,97 +1226,94 @@ class LoginAutomation:
             except Exception as e:
                 logger.warning(f"点击按钮失败 (尝试 {attempt + 1}/{retries}): {element_id} - {e}")
                 if attempt < retries - 1:
-                    await asyncio.sleep(RETRY_DELAY)
+                    await traced_sleep(RETRY_DELAY)
                 else:
                     logger.error(f"点击按钮最终失败: {element_id}")
+                    annotate(outcome="failed", attempts=retries)
     
     async def click_navigation_panel(self, element_id: str, value: str, retries: int = MAX_RETRIES):
         """
         点击系统导航面板
-        
+
+        上次成功的查找方法优先；所有方法都失败的导览框在一段时间内直接返回失败
+
         Args:
             element_id: 导航面板的ID（从标题-ID.xlsx获取）
             value: 导航面板的值（如WF_YB6）
             retries: 重试次数
         """
         logger.info(f"开始点击导览框: element_id={element_id}, value={value}")
-        
+        role = page_role(self.page)
+        target = f"nav:{value}"
+        if self.strategy_memory.is_dead(role, target):
+            logger.warning(f"导览框 {value} 在当前页面已标记为不可用，直接跳过")
+            return False
+
+        # 查找方法: 名称 -> 选择器（None表示通过JavaScript调用navToPrj）
+        strategies = {
+            "onclick": f"div[onclick*='{value}']",
+            "javascript": None,
+            "text": f"div:has-text('{value}')",
+            "title": f"div[title*='{value}']",
+            "syslink_onclick": f"div.syslink[onclick*='{value}']",
+            "first_syslink": "div.syslink",
+        }
+
         for attempt in range(retries):
             try:
-                # 方法1: 通过onclick属性查找
-                logger.info(f"尝试通过onclick属性查找: div[onclick*='{value}']")
-                onclick_selector = f"div[onclick*='{value}']"
-                
-                if await self.page.locator(onclick_selector).count() > 0:
-                    await self.page.click(onclick_selector)
-                    logger.info(f"成功点击导览框 (通过onclick): {value}")
-                    await asyncio.sleep(BUTTON_CLICK_WAIT)
-                    return True
-                
-                # 方法2: 通过JavaScript直接调用
-                logger.info(f"尝试通过JavaScript调用: navToPrj('{value}')")
-                try:
-                    await self.page.evaluate(f"navToPrj('{value}')")
-                    logger.info(f"成功点击导览框 (通过JavaScript): {value}")
-                    await asyncio.sleep(BUTTON_CLICK_WAIT)
-                    return True
-                except Exception as js_error:
-                    logger.debug(f"JavaScript调用失败: {js_error}")
-                
-                # 方法3: 通过文本内容查找
-                logger.info(f"尝试通过文本内容查找: div:has-text('{value}')")
-                text_selector = f"div:has-text('{value}')"
-                
-                if await self.page.locator(text_selector).count() > 0:
-                    await self.page.click(text_selector)
-                    logger.info(f"成功点击导览框 (通过文本): {value}")
-                    await asyncio.sleep(BUTTON_CLICK_WAIT)
-                    return True
-                
-                # 方法4: 通过title属性查找
-                logger.info(f"尝试通过title属性查找: div[title*='{value}']")
-                title_selector = f"div[title*='{value}']"
-                
-                if await self.page.locator(title_selector).count() > 0:
-                    await self.page.click(title_selector)
-                    logger.info(f"成功点击导览框 (通过title): {value}")
-                    await asyncio.sleep(BUTTON_CLICK_WAIT)
-                    return True
-                
-                # 方法5: 通过class和onclick组合查找
-                logger.info(f"尝试通过class和onclick组合查找: div.syslink[onclick*='{value}']")
-                class_selector = f"div.syslink[onclick*='{value}']"
-                
-                if await self.page.locator(class_selector).count() > 0:
-                    await self.page.click(class_selector)
-                    logger.info(f"成功点击导览框 (通过class+onclick): {value}")
-                    await asyncio.sleep(BUTTON_CLICK_WAIT)
-                    return True
-                
-                # 方法6: 通过第一个syslink元素查找
-                logger.info("尝试通过第一个syslink元素查找")
-                first_syslink = self.page.locator("div.syslink").first
-                
-                if await first_syslink.count() > 0:
-                    await first_syslink.click()
-                    logger.info(f"成功点击导览框 (通过第一个syslink): {value}")
-                    await asyncio.sleep(BUTTON_CLICK_WAIT)
-                    return True
-                
+                for name in self.strategy_memory.order(role, target, list(strategies)):
+                    if await self._try_navigation_strategy(strategies[name], value):
+                        logger.info(f"成功点击导览框 (通过{name}): {value}")
+                        annotate(strategy=f"navigation:{name}", attempts=attempt + 1)
+                        # 第一个syslink与导览框的值无关，只作为最后的兜底，不记录为优先方法
+                        if name != "first_syslink":
+                            self.strategy_memory.record_success(role, target, name)
+                        await traced_sleep(BUTTON_CLICK_WAIT)
+                        return True
+
                 logger.warning(f"所有方法都失败，尝试 {attempt + 1}/{retries}")
-                
+
             except Exception as e:
                 logger.warning(f"点击导览框失败 (尝试 {attempt + 1}/{retries}): {e}")
-            
+
             if attempt < retries - 1:
-                await asyncio.sleep(RETRY_DELAY)
-        
+                await traced_sleep(RETRY_DELAY)
+
         logger.error(f"点击导览框最终失败: {value}")
+        annotate(outcome="failed", attempts=retries)
+        self.strategy_memory.record_failure(role, target)
         return False
-    
+
+    async def _try_navigation_strategy(self, selector: Optional[str], value: str) -> bool:
+        """
+        用一种方法点击导览框
+
+        Args:
+            selector: 选择器，None表示通过JavaScript调用navToPrj
+            value: 导航面板的值
+
+        Returns:
+            是否已点击
+        """
+        if selector is None:
+            logger.info(f"尝试通过JavaScript调用: navToPrj('{value}')")
+            try:
+                await self.page.evaluate(f"navToPrj('{value}')")
+                return True
+            except Exception as js_error:
+                logger.debug("JavaScript调用失败: %s", js_error)
+                return False
+
+        logger.info(f"尝试查找导览框: {selector}")
+        locator = self.page.locator(selector).first
+        if await locator.count() > 0:
+            await locator.click()
+            return True
+        return False
+
     async def process_cell(self, title: str, value: Any):
         """
-        处理单个单元格的内容
+        处理单个单元格的内容（每个单元格记录为一个步骤span）
         
         Args:
             title: 列标题
@@ -1270,7 +1321,18 @@ class LoginAutomation:
         """
         if pd.isna(value) or value == "":
             return
-            
+        
+        with self.step_tracer.span("cell", title=title):
+            await self.dispatch_cell(title, value)
+    
+    async def dispatch_cell(self, title: str, value: Any):
+        """
+        根据列标题和单元格值分派具体操作
+        
+        Args:
+            title: 列标题
+            value: 单元格值（非空）
+        """
         value_str = self.clean_value_string(value)
         
         # 特殊处理：保存报销项目号和金额用于文件命名
@@ -1293,8 +1355,9 @@ class LoginAutomation:
                     wait_seconds_str = value_str
                 
                 wait_seconds = float(wait_seconds_str)
+                annotate(operation="wait")
                 logger.info(f"检测到等待操作，等待 {wait_seconds} 秒")
-                await asyncio.sleep(wait_seconds)
+                await traced_sleep(wait_seconds)
                 logger.info(f"等待 {wait_seconds} 秒完成")
                 return
             except ValueError:
@@ -1309,6 +1372,7 @@ class LoginAutomation:
             
             # 根据标题查找对应的radio按钮ID
             radio_element_id = self.get_object_id(radio_title)
+            annotate(operation="radio", element_id=radio_element_id)
             if radio_element_id:
                 logger.info(f"找到radio按钮ID: {radio_element_id}")
                 await self.click_radio_button(radio_element_id)
@@ -1321,17 +1385,21 @@ class LoginAutomation:
             button_value = value_str[len(BUTTON_PREFIX):]  # 去掉$前缀
             if button_value == "预约":
                 logger.info("检测到第一行预约按钮操作")
+                annotate(operation="reservation")
                 await self.click_first_row_reservation_button()
                 return
         
         # 对于其他情况，先获取element_id
         element_id = self.get_object_id(title)
         if not element_id:
+            annotate(operation="unmapped", outcome="skipped")
             return
+        annotate(element_id=element_id)
         
         # 特殊处理：网上预约报账按钮（优先处理）
         if title == "网上预约报账按钮":
             logger.info(f"特殊处理网上预约报账按钮: {element_id}")
+            annotate(operation="navigation")
             # 从element_id中提取WF_YB6参数
             if "navToPrj('WF_YB6')" in element_id:
                 await self.click_navigation_panel("", "WF_YB6")
@@ -1344,44 +1412,15 @@ class LoginAutomation:
         # 特殊处理：转卡信息工号（填写后检查银行卡选择弹窗）
         if title == "转卡信息工号" or title.startswith("转卡信息工号"):
             logger.info(f"特殊处理转卡信息工号: {value_str}")
-            await self.fill_input(element_id, value_str, title=title)
-            
-            # 填写工号后输入回车键来触发银行卡选择界面
-            logger.info("填写转卡信息工号完成，输入回车键触发银行卡选择界面...")
-            await asyncio.sleep(0.5)  # 短暂等待确保输入完成
-            
-            # 在输入框中输入回车键
-            try:
-                # 首先尝试在主页面查找输入框并输入回车
-                if element_id and await self.wait_for_element(element_id, timeout=2):
-                    await self.page.press(f"#{element_id}", "Enter")
-                    logger.info(f"在主页面输入框中输入回车键: {element_id}")
-                else:
-                    # 如果主页面找不到，尝试在iframe中查找
-                    frames = self.page.frames
-                    for frame in frames:
-                        try:
-                            input_element = frame.locator(f"#{element_id}").first
-                            if await input_element.count() > 0:
-                                await input_element.press("Enter")
-                                logger.info(f"在iframe中输入框中输入回车键: {element_id}")
-                                break
-                        except Exception as e:
-                            logger.debug(f"在iframe中查找输入框失败: {e}")
-                            continue
-                    else:
-                        # 如果还是找不到，尝试通过name属性查找
-                        try:
-                            await self.page.press(f"input[name='{element_id}']", "Enter")
-                            logger.info(f"通过name属性输入框中输入回车键: {element_id}")
-                        except Exception as e:
-                            logger.debug(f"通过name属性查找失败: {e}")
-            except Exception as e:
-                logger.warning(f"输入回车键失败: {e}")
+            annotate(operation="employee_lookup")
+            # 填写工号后输入回车键来触发银行卡选择界面，等待服务器的工号查询请求返回
+            async def fill_and_press_enter():
+                await self.fill_input(element_id, value_str, title=title)
+                logger.info("填写转卡信息工号完成，输入回车键触发银行卡选择界面...")
+                await self.press_enter_in_input(element_id)
             
-            # 等待银行卡选择弹窗出现（缩减等待时间）
-            logger.info("等待银行卡选择弹窗出现...")
-            await asyncio.sleep(BANK_CARD_DIALOG_WAIT)
+            # 银行卡选择弹窗本身由handle_bank_card_selection_for_transfer等待，这里不再固定等待
+            await self.wait_for_employee_lookup(fill_and_press_enter)
             
             # 检查是否需要选择银行卡
             # 创建当前记录的DataFrame
@@ -1398,10 +1437,12 @@ class LoginAutomation:
             # 特殊处理：如果是打印按钮，查找并点击打印确认单按钮
             if title == "打印按钮" or title == "打印操作" or title == "打印确认单按钮":
                 logger.info("检测到打印按钮操作，查找并点击打印确认单按钮")
+                annotate(operation="print")
                 await self.click_print_button()
                 return
             
             # 普通按钮点击
+            annotate(operation="button")
             await self.click_button(element_id)
             return
         
@@ -1422,8 +1463,9 @@ class LoginAutomation:
                 
                 # 等待页面加载
                 logger.info(f"特殊处理科目填写，等待页面加载完成...")
-                await asyncio.sleep(SUBJECT_AMOUNT_WAIT)
+                await traced_sleep(SUBJECT_AMOUNT_WAIT)
                 logger.info(f"页面加载等待完成，开始填写科目: {subject_name}")
+                annotate(operation="subject", element_id=input_id)
                 await self.fill_input(input_id, value_str, title=title)
                 return
             elif title == "金额":
@@ -1433,78 +1475,80 @@ class LoginAutomation:
                 return
             else:
                 logger.info(f"特殊处理{title}填写，等待页面加载完成...")
-                await asyncio.sleep(SUBJECT_AMOUNT_WAIT)
+                await traced_sleep(SUBJECT_AMOUNT_WAIT)
                 logger.info(f"页面加载等待完成，开始填写{title}: {value_str}")
+                annotate(operation="input")
                 await self.fill_input(element_id, value_str, title=title)
                 return
         
         # 处理系统导览框点击操作（以@开头）
         if value_str.startswith(NAVIGATION_PREFIX):
             nav_value = value_str[1:]  # 去掉@符号
+            annotate(operation="navigation")
             await self.click_navigation_panel(element_id, nav_value)
             return
         
         # 处理卡号尾号选择（以*开头）
         if value_str.startswith(CARD_NUMBER_PREFIX):
             card_tail = value_str[1:]  # 去掉*符号
+            annotate(operation="bank_card")
             await self.select_card_by_number(card_tail)
             return
         
         # 处理下拉框选择（支持列名映射和ID模式识别）
-        # 创建列名到配置名的映射
-        dropdown_title_mapping = {
-            "省份": "省份地区",  # Excel列名 -> 配置名
-            "人员类型": "人员类型",  # 保持原样
-            "安排状态": "安排状态",  # 保持原样
-            "交通费": "交通费"  # 保持原样
-        }
-        
         # 获取实际的配置名
-        config_title = dropdown_title_mapping.get(title, title)
+        config_title = DROPDOWN_TITLE_MAPPING.get(title, title)
+        
+        # 探测字段类型（第一次遇到时一次读取当前页面所有映射ID的类型并缓存）
+        field_kind = await self.get_field_kind(element_id)
         
-        # 检查是否为下拉框字段（通过配置名或ID模式）
+        # 检查是否为下拉框字段（优先使用探测到的字段类型，其次通过配置名或ID模式）
         is_dropdown = False
-        dropdown_config = None
+        dropdown_name = None  # DROPDOWN_FIELDS中的配置名
+        
+        # 已探测到不是下拉框时不再通过配置名或ID模式判断
+        if field_kind in (None, "select"):
+            # 方法1: 通过配置名检查
+            if config_title in DROPDOWN_FIELDS:
+                is_dropdown = True
+                dropdown_name = config_title
+        
+            # 方法2: 通过ID模式检查（如果element_id存在）
+            elif element_id:
+                # 检查是否为已知的下拉框ID模式
+                dropdown_id_patterns = [
+                    "formWF_YB6_3492_yc-chr_sf",  # 省份下拉框模式
+                    "formWF_YB6_3492_yc-chr_hsf",  # hsf下拉框模式
+                    "formWF_YB6_3492_yc-chr_jtf",  # jtf下拉框模式
+                    "formWF_YB6_3492_yc-chr_zc",   # 人员类型下拉框模式
+                    "formWF_YB6_3492_yc-chr_azzt", # 安排状态下拉框模式
+                ]
+            
+                for pattern in dropdown_id_patterns:
+                    if pattern in element_id:
+                        is_dropdown = True
+                        # 根据ID模式确定下拉框类型（使用精确匹配）
+                        if "formWF_YB6_3492_yc-chr_sf" in element_id:
+                            dropdown_name = "省份地区"
+                        elif "formWF_YB6_3492_yc-chr_hsf" in element_id:
+                            # 这里需要根据实际情况确定hsf对应的下拉框类型
+                            dropdown_name = "安排状态"
+                        elif "formWF_YB6_3492_yc-chr_jtf" in element_id:
+                            dropdown_name = "交通费"
+                        elif "formWF_YB6_3492_yc-chr_zc" in element_id:
+                            dropdown_name = "人员类型"
+                        elif "formWF_YB6_3492_yc-chr_azzt" in element_id:
+                            dropdown_name = "安排状态"
+                        break
         
-        # 方法1: 通过配置名检查
-        if config_title in DROPDOWN_FIELDS:
+        if field_kind == "select":
             is_dropdown = True
-            dropdown_config = DROPDOWN_FIELDS[config_title]
-        
-        # 方法2: 通过ID模式检查（如果element_id存在）
-        elif element_id:
-            # 检查是否为已知的下拉框ID模式
-            dropdown_id_patterns = [
-                "formWF_YB6_3492_yc-chr_sf",  # 省份下拉框模式
-                "formWF_YB6_3492_yc-chr_hsf",  # hsf下拉框模式
-                "formWF_YB6_3492_yc-chr_jtf",  # jtf下拉框模式
-                "formWF_YB6_3492_yc-chr_zc",   # 人员类型下拉框模式
-                "formWF_YB6_3492_yc-chr_azzt", # 安排状态下拉框模式
-            ]
-            
-            for pattern in dropdown_id_patterns:
-                if pattern in element_id:
-                    is_dropdown = True
-                    # 根据ID模式确定下拉框类型（使用精确匹配）
-                    if "formWF_YB6_3492_yc-chr_sf" in element_id:
-                        dropdown_config = DROPDOWN_FIELDS.get("省份地区", {})
-                    elif "formWF_YB6_3492_yc-chr_hsf" in element_id:
-                        # 这里需要根据实际情况确定hsf对应的下拉框类型
-                        dropdown_config = DROPDOWN_FIELDS.get("安排状态", {})
-                    elif "formWF_YB6_3492_yc-chr_jtf" in element_id:
-                        dropdown_config = DROPDOWN_FIELDS.get("交通费", {})
-                    elif "formWF_YB6_3492_yc-chr_zc" in element_id:
-                        dropdown_config = DROPDOWN_FIELDS.get("人员类型", {})
-                    elif "formWF_YB6_3492_yc-chr_azzt" in element_id:
-                        dropdown_config = DROPDOWN_FIELDS.get("安排状态", {})
-                    break
         
-        if is_dropdown and dropdown_config:
-            # 获取下拉框的映射关系
-            dropdown_mapping = dropdown_config
-            # 查找对应的值
-            if value_str in dropdown_mapping:
-                mapped_value = dropdown_mapping[value_str]
+        if is_dropdown and (DROPDOWN_FIELDS.get(dropdown_name) or field_kind == "select"):
+            # 查找对应的值（全角/半角、括号、空白不同也能对应）
+            mapped_value = self.lookup_dropdown_mapping(dropdown_name, value_str)
+            annotate(operation="dropdown")
+            if mapped_value is not None:
                 await self.select_dropdown(element_id, mapped_value)
                 logger.info(f"下拉框映射: {title} = {value_str} -> {mapped_value}")
             else:
@@ -1514,30 +1558,28 @@ class LoginAutomation:
             return
         
         # 处理日期输入框（检查element_id是否包含日期相关的标识）
-        if (element_id and ("date" in element_id.lower() or "startdate" in element_id.lower() or "enddate" in element_id.lower() or 
-                           element_id.endswith("_startdate") or element_id.endswith("_enddate") or
-                           "temp-startdate" in element_id or "temp-enddate" in element_id or
-                           element_id == "formWF_YB6_3492_yc-chr_start1_0" or element_id == "formWF_YB6_3492_yc-chr_end1_0" or
-                           "start" in element_id or "end" in element_id)):
+        if self.is_date_field_id(element_id):
             logger.info(f"检测到日期输入框: {element_id} = {value_str}")
+            annotate(operation="date")
             
             # 优先尝试新的jQuery UI日历控件方法
             try:
                 await self.select_date_from_calendar(element_id, value_str)
                 return
             except Exception as e:
-                logger.debug(f"jQuery UI日历控件方法失败，尝试只读日期输入框方法: {e}")
+                logger.debug("jQuery UI日历控件方法失败，尝试只读日期输入框方法: %s", e)
                 # 如果新方法失败，回退到只读方法
                 try:
                     await self.fill_readonly_date_input(element_id, value_str)
                     return
                 except Exception as e2:
-                    logger.debug(f"只读日期输入框方法也失败，尝试普通方法: {e2}")
+                    logger.debug("只读日期输入框方法也失败，尝试普通方法: %s", e2)
                     # 如果只读方法也失败，回退到普通方法
                     await self.fill_date_input(element_id, value_str)
                     return
         
         # 处理普通输入框
+        annotate(operation="input")
         await self.fill_input(element_id, value_str, title=title)
     
     async def select_dropdown(self, element_id: str, value: str, retries: int = MAX_RETRIES):
@@ -1549,6 +1591,11 @@ class LoginAutomation:
             value: 要选择的选项值
             retries: 重试次数
         """
+        # 按选项快照把值解析成精确的选项值，选项中不存在时立即返回，不再重试
+        resolved = await self.select_dropdown_by_snapshot(element_id, value)
+        if resolved is not None:
+            return
+        
         for attempt in range(retries):
             try:
                 # 优先在iframe中查找（根据日志分析，大部分元素都在iframe中）
@@ -1560,10 +1607,10 @@ class LoginAutomation:
                         if await select_element.count() > 0:
                             await select_element.select_option(value=value)
                             logger.info(f"在iframe中成功选择下拉框 {element_id}: {value}")
-                            await asyncio.sleep(ELEMENT_WAIT)
+                            await traced_sleep(ELEMENT_WAIT)
                             return
                     except Exception as e:
-                        logger.debug(f"在iframe中查找下拉框失败: {e}")
+                        logger.debug("在iframe中查找下拉框失败: %s", e)
                         continue
                 
                 # 如果iframe中找不到，尝试在主页面查找
@@ -1571,10 +1618,10 @@ class LoginAutomation:
                     await self.page.wait_for_selector(f"#{element_id}", timeout=3000)
                     await self.page.select_option(f"#{element_id}", value)
                     logger.info(f"在主页面成功选择下拉框 {element_id}: {value}")
-                    await asyncio.sleep(ELEMENT_WAIT)
+                    await traced_sleep(ELEMENT_WAIT)
                     return
                 except Exception as e:
-                    logger.debug(f"在主页面查找下拉框失败: {e}")
+                    logger.debug("在主页面查找下拉框失败: %s", e)
                 
                 # 如果还是找不到，尝试通过name属性查找（优先在iframe中）
                 for frame in frames:
@@ -1583,91 +1630,245 @@ class LoginAutomation:
                         if await select_element.count() > 0:
                             await select_element.select_option(value=value)
                             logger.info(f"在iframe中通过name属性成功选择下拉框 {element_id}: {value}")
-                            await asyncio.sleep(ELEMENT_WAIT)
+                            await traced_sleep(ELEMENT_WAIT)
                             return
                     except Exception as e:
-                        logger.debug(f"在iframe中通过name属性查找失败: {e}")
+                        logger.debug("在iframe中通过name属性查找失败: %s", e)
                         continue
                 
                 # 最后尝试在主页面通过name属性查找
                 try:
                     await self.page.select_option(f"select[name='{element_id}']", value=value)
                     logger.info(f"在主页面通过name属性成功选择下拉框 {element_id}: {value}")
-                    await asyncio.sleep(ELEMENT_WAIT)
+                    await traced_sleep(ELEMENT_WAIT)
                     return
                 except Exception as e:
-                    logger.debug(f"在主页面通过name属性查找失败: {e}")
+                    logger.debug("在主页面通过name属性查找失败: %s", e)
                 
                 logger.warning(f"下拉框元素不存在: {element_id}")
+                annotate(outcome="failed", attempts=attempt + 1)
                 return
                     
             except Exception as e:
                 logger.warning(f"选择下拉框失败 (尝试 {attempt + 1}/{retries}): {element_id} - {e}")
                 if attempt < retries - 1:
-                    await asyncio.sleep(RETRY_DELAY)
+                    await traced_sleep(RETRY_DELAY)
                 else:
                     logger.error(f"选择下拉框最终失败: {element_id}")
+                    annotate(outcome="failed", attempts=retries)
     
-    async def handle_bank_card_selection(self, record_data: pd.DataFrame):
+    def lookup_dropdown_mapping(self, config_name: Optional[str], value_str: str) -> Optional[str]:
         """
-        处理银行卡选择弹窗
+        在DROPDOWN_FIELDS的映射表中查找Excel值对应的选项值（先精确匹配，再归一化匹配）
         
         Args:
-            record_data: 包含登录信息的DataFrame行
-        """
-        try:
-            logger.info("开始检测银行卡选择弹窗...")
+            config_name: DROPDOWN_FIELDS中的配置名（为None或不存在时没有映射）
+            value_str: Excel中的值
             
-            # 等待银行卡选择弹窗出现（缩减等待时间）
-            await asyncio.sleep(BANK_CARD_DIALOG_WAIT)
-            
-            # 等待银行卡选择弹窗出现 - 尝试多种选择器
-            bank_dialog_found = False
-            selectors_to_try = [
-                "#paybankdiv",                           # 主要的银行卡选择弹窗ID
-                "div[id='paybankdiv']",                  # 完整的div选择器
-                "div.ui-dialog-content",                 # UI对话框内容
-                "table[style*='background-color:#F2FAFD']",  # 银行卡表格
-                "input[name='rdoacnt']",                 # 银行卡选择radio按钮
-                "div.ui-dialog[aria-describedby='paybankdiv']",  # 完整的对话框
-                "div.ui-dialog-title:has-text('请选择卡号')",  # 对话框标题
-                "tbody tr td input[type='radio'][name='rdoacnt']"  # 表格中的radio按钮
-            ]
+        Returns:
+            选项值，映射表中没有时返回None
+        """
+        dropdown_mapping = DROPDOWN_FIELDS.get(config_name) if config_name else None
+        if not dropdown_mapping:
+            return None
+        if value_str in dropdown_mapping:
+            return dropdown_mapping[value_str]
+        if config_name not in self._normalized_dropdown_mappings:
+            self._normalized_dropdown_mappings[config_name] = build_normalized_mapping(dropdown_mapping)
+        return self._normalized_dropdown_mappings[config_name].get(normalize_option_text(value_str))
+    
+    async def select_dropdown_by_snapshot(self, element_id: str, value: str) -> Optional[bool]:
+        """
+        使用下拉框选项快照选择选项
+        
+        Args:
+            element_id: 下拉框的ID
+            value: 要选择的选项值或选项文字
             
-            # 方法1: 等待弹窗出现
-            for selector in selectors_to_try:
-                try:
-                    await self.page.wait_for_selector(selector, timeout=5000)
-                    logger.info(f"检测到银行卡选择弹窗，使用选择器: {selector}")
-                    bank_dialog_found = True
-                    break
-                except Exception as e:
-                    logger.debug(f"选择器 {selector} 未找到: {e}")
+        Returns:
+            True表示已选择；False表示下拉框中没有对应选项；None表示未找到下拉框（调用方使用原来的方式）
+        """
+        for frame in self.page.frames:
+            try:
+                index = await self.select_options.get(frame, element_id)
+                if index is None:
                     continue
-            
-            # 方法2: 如果方法1失败，尝试检测弹窗是否已经存在
-            if not bank_dialog_found:
-                logger.info("尝试检测已存在的银行卡选择弹窗...")
-                for selector in selectors_to_try:
+                option_value = index.resolve(value)
+                if option_value is None:
+                    # 选项可能由其他字段联动加载，重新读取一次
+                    index = await self.select_options.get(frame, element_id, refresh=True)
+                    option_value = index.resolve(value) if index else None
+                if option_value is None:
+                    self.unmatched_dropdown_values.append((element_id, value))
+                    logger.warning(f"下拉框 {element_id} 中没有与 '{value}' 对应的选项，可选项: {index.labels if index else []}")
+                    annotate(outcome="failed")
+                    return False
+                selector = f"#{element_id}" if await frame.locator(f"#{element_id}").count() > 0 else f"select[name='{element_id}']"
+                await frame.locator(selector).first.select_option(value=option_value)
+                logger.info(f"成功选择下拉框 {element_id}: {value} -> {option_value}")
+                await traced_sleep(ELEMENT_WAIT)
+                return True
+            except Exception as e:
+                logger.debug("使用选项快照选择下拉框失败: %s", e)
+                continue
+        return None
+    
+    def validate_dropdown_values(self):
+        """
+        预检查报销信息中下拉框列的值是否在DROPDOWN_FIELDS映射表中（归一化后比较，只记录警告）
+        """
+        if self.reimbursement_data is None:
+            return
+        unmatched = []
+        for col in self.reimbursement_data.columns:
+            base_col = str(col).split(".")[0]
+            config_title = DROPDOWN_TITLE_MAPPING.get(base_col, base_col)
+            if not DROPDOWN_FIELDS.get(config_title):
+                continue
+            for value in self.reimbursement_data[col].dropna().unique():
+                value_str = self.clean_value_string(value)
+                if not value_str or value_str.startswith((BUTTON_PREFIX, NAVIGATION_PREFIX, CARD_NUMBER_PREFIX)):
+                    continue
+                if self.lookup_dropdown_mapping(config_title, value_str) is None:
+                    unmatched.append((col, value_str))
+        for col, value_str in unmatched:
+            logger.warning(f"预检查: 列 '{col}' 的值 '{value_str}' 不在下拉框映射表 DROPDOWN_FIELDS 中")
+        if unmatched:
+            logger.warning(f"预检查: 共 {len(unmatched)} 个下拉框值没有对应的映射")
+    
+    async def press_enter_in_input(self, element_id: str):
+        """
+        在输入框中输入回车键（支持在iframe中查找）
+        
+        Args:
+            element_id: 输入框的ID
+        """
+        try:
+            # 首先尝试在主页面查找输入框并输入回车
+            if element_id and await self.wait_for_element(element_id, timeout=2):
+                await self.page.press(f"#{element_id}", "Enter")
+                logger.info(f"在主页面输入框中输入回车键: {element_id}")
+            else:
+                # 如果主页面找不到，尝试在iframe中查找
+                frames = self.page.frames
+                for frame in frames:
                     try:
-                        elements = await self.page.locator(selector).all()
-                        if len(elements) > 0:
-                            logger.info(f"检测到已存在的银行卡选择弹窗，使用选择器: {selector}")
-                            bank_dialog_found = True
+                        if await self.absence_cache.count(frame, f"#{element_id}") > 0:
+                            await frame.locator(f"#{element_id}").first.press("Enter")
+                            logger.info(f"在iframe中输入框中输入回车键: {element_id}")
                             break
                     except Exception as e:
-                        logger.debug(f"检测选择器 {selector} 失败: {e}")
+                        logger.debug("在iframe中查找输入框失败: %s", e)
                         continue
+                else:
+                    # 如果还是找不到，尝试通过name属性查找
+                    try:
+                        await self.page.press(f"input[name='{element_id}']", "Enter")
+                        logger.info(f"通过name属性输入框中输入回车键: {element_id}")
+                    except Exception as e:
+                        logger.debug("通过name属性查找失败: %s", e)
+        except Exception as e:
+            logger.warning(f"输入回车键失败: {e}")
+    
+    def is_employee_lookup_response(self, response, work_id: str = None) -> bool:
+        """
+        判断响应是否为工号查询请求（XHR/fetch且URL匹配EMPLOYEE_LOOKUP_URL_PATTERN）
+        
+        Args:
+            response: Playwright响应
+            work_id: 指定时要求请求URL或请求体中包含该工号（同时查询多个工号时区分响应）
+        """
+        if response.request.resource_type not in ("xhr", "fetch"):
+            return False
+        if re.search(EMPLOYEE_LOOKUP_URL_PATTERN, response.url) is None:
+            return False
+        if work_id:
+            return work_id in response.url or work_id in (response.request.post_data or "")
+        return True
+    
+    async def wait_for_employee_lookup(self, action, timeout: int = EMPLOYEE_LOOKUP_TIMEOUT,
+                                       work_id: str = None) -> bool:
+        """
+        执行触发工号查询的操作（填写工号/输入回车），并等待服务器的工号查询请求返回
+        
+        操作开始前注册响应监听（查询可能在操作过程中就已返回），超时时间从操作完成后开始计算；
+        操作本身抛出的异常（包括Playwright的TimeoutError）直接向上抛出，不当作“未等到查询响应”
+        
+        Args:
+            action: 无参数的异步函数
+            timeout: 操作完成后等待查询响应的超时时间（毫秒）
+            work_id: 指定时只接受请求中包含该工号的响应
             
-            # 方法3: 检查是否有"请选择卡号"的标题
-            if not bank_dialog_found:
-                try:
-                    title_elements = await self.page.locator("text=请选择卡号").all()
-                    if len(title_elements) > 0:
-                        logger.info("检测到'请选择卡号'标题，说明银行卡选择弹窗已出现")
-                        bank_dialog_found = True
-                except Exception as e:
-                    logger.debug(f"检测'请选择卡号'标题失败: {e}")
+        Returns:
+            是否等到了工号查询响应；未配置查询地址时执行操作后按原来的方式固定等待，返回False
+        """
+        if not EMPLOYEE_LOOKUP_URL_PATTERN:
+            await action()
+            await traced_sleep(EMPLOYEE_LOOKUP_FALLBACK_WAIT)
+            return False
+        
+        matched = asyncio.get_running_loop().create_future()
+        
+        def on_response(response):
+            if not matched.done() and self.is_employee_lookup_response(response, work_id):
+                matched.set_result(response)
+        
+        self.page.on("response", on_response)
+        try:
+            await action()
+            start_time = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(matched, timeout / 1000)
+            except asyncio.TimeoutError:
+                logger.info(f"{timeout / 1000:.1f}秒内未等到工号查询响应，请检查EMPLOYEE_LOOKUP_URL_PATTERN配置")
+                return False
+        finally:
+            self.page.remove_listener("response", on_response)
+        
+        elapsed = time.perf_counter() - start_time
+        if not response.ok:
+            logger.warning(f"工号查询请求返回异常状态 {response.status}: {response.url}")
+            return False
+        logger.info(f"工号查询请求已返回 (操作完成后 {elapsed:.2f}s): {response.url}")
+        return True
+    
+    async def get_input_value(self, element_id: str) -> Optional[str]:
+        """
+        读取输入框当前的值（支持在iframe中查找）
+        
+        Args:
+            element_id: 输入框的ID
+            
+        Returns:
+            输入框的值，未找到时返回None
+        """
+        for frame in self.page.frames:
+            try:
+                input_element = frame.locator(f"#{element_id}").first
+                if await input_element.count() > 0:
+                    return await input_element.input_value()
+            except Exception as e:
+                logger.debug("在iframe中读取输入框失败: %s", e)
+                continue
+        return None
+    
+    async def handle_bank_card_selection(self, record_data: pd.DataFrame):
+        """
+        处理银行卡选择弹窗
+        
+        Args:
+            record_data: 包含登录信息的DataFrame行
+        """
+        try:
+            logger.info("开始检测银行卡选择弹窗...")
+            
+            # 同时等待银行卡选择弹窗的各个特征选择器
+            race = await race_selectors([self.page], BANK_CARD_DIALOG_SELECTORS, DIALOG_DETECT_TIMEOUT)
+            if race is None:
+                race = await race_selectors([self.page], GENERIC_DIALOG_SELECTORS, GENERIC_DIALOG_CHECK_TIMEOUT)
+            bank_dialog_found = race is not None
+            if race:
+                logger.info(f"检测到银行卡选择弹窗，使用选择器: {race.selector} (耗时 {race.elapsed:.2f}s)")
             
             if not bank_dialog_found:
                 logger.info("未检测到银行卡选择弹窗，可能只有一张卡或弹窗未出现")
@@ -1690,7 +1891,7 @@ class LoginAutomation:
             logger.info(f"开始选择卡号尾号: {card_tail_value}")
             
             # 等待弹窗完全加载（缩减等待时间）
-            await asyncio.sleep(BANK_CARD_SELECTION_WAIT)
+            await traced_sleep(BANK_CARD_SELECTION_WAIT)
             
             # 尝试多种方式查找和点击radio按钮
             radio_clicked = False
@@ -1704,7 +1905,7 @@ class LoginAutomation:
                     logger.info(f"成功选择卡号尾号 {card_tail_value} 对应的银行卡")
                     radio_clicked = True
             except Exception as e:
-                logger.debug(f"方法1失败: {e}")
+                logger.debug("方法1失败: %s", e)
             
             # 方法2: 如果方法1失败，尝试在iframe中查找
             if not radio_clicked:
@@ -1719,7 +1920,7 @@ class LoginAutomation:
                             radio_clicked = True
                             break
                     except Exception as e:
-                        logger.debug(f"在iframe中查找失败: {e}")
+                        logger.debug("在iframe中查找失败: %s", e)
                         continue
             
             # 方法3: 通过onclick属性查找
@@ -1732,7 +1933,7 @@ class LoginAutomation:
                         logger.info(f"通过onclick属性成功选择卡号尾号 {card_tail_value} 对应的银行卡")
                         radio_clicked = True
                 except Exception as e:
-                    logger.debug(f"方法3失败: {e}")
+                    logger.debug("方法3失败: %s", e)
             
             # 方法4: 通过卡号文本查找
             if not radio_clicked:
@@ -1752,14 +1953,14 @@ class LoginAutomation:
                                 radio_clicked = True
                                 break
                         except Exception as e:
-                            logger.debug(f"在tr中查找radio失败: {e}")
+                            logger.debug("在tr中查找radio失败: %s", e)
                             continue
                 except Exception as e:
-                    logger.debug(f"方法4失败: {e}")
+                    logger.debug("方法4失败: %s", e)
             
             if radio_clicked:
                 logger.info("银行卡选择成功，等待选择生效...")
-                await asyncio.sleep(2)  # 等待选择生效
+                await traced_sleep(2)  # 等待选择生效
                 
                 # 尝试点击确定按钮
                 try:
@@ -1767,9 +1968,9 @@ class LoginAutomation:
                     if await confirm_button.count() > 0:
                         await confirm_button.click()
                         logger.info("成功点击确定按钮")
-                        await asyncio.sleep(1)
+                        await traced_sleep(1)
                 except Exception as e:
-                    logger.debug(f"点击确定按钮失败: {e}")
+                    logger.debug("点击确定按钮失败: %s", e)
             else:
                 logger.warning(f"未找到卡号尾号 {card_tail_value} 对应的银行卡")
                 
@@ -1786,109 +1987,20 @@ class LoginAutomation:
         """
         try:
             logger.info(f"开始检测转卡信息工号 {work_id} 的银行卡选择弹窗...")
+            self.current_work_id = work_id
             
-            # 等待银行卡选择弹窗出现 - 只在iframe中查找
-            bank_dialog_found = False
-            selectors_to_try = [
-                "#paybankdiv",                           # 主要的银行卡选择弹窗ID
-                "div.ui-dialog[aria-describedby='paybankdiv']",  # 完整的对话框
-                "div.ui-dialog-title:has-text('请选择卡号')",  # 对话框标题
-                "input[name='rdoacnt']",                 # 银行卡选择radio按钮
-                "table[style*='background-color:#F2FAFD']",  # 银行卡表格
-                "div.ui-dialog-content"                  # UI对话框内容
-            ]
-            
-            # 在所有iframe中查找弹窗
-            logger.info("在所有iframe中查找银行卡选择弹窗...")
+            # 在所有iframe中同时等待银行卡选择弹窗的各个特征选择器，最先出现的即为弹窗所在frame
             frames = self.page.frames
-            logger.info(f"找到 {len(frames)} 个iframe")
+            logger.info(f"在 {len(frames)} 个iframe中查找银行卡选择弹窗...")
+            race = await race_selectors(frames, BANK_CARD_DIALOG_SELECTORS, DIALOG_DETECT_TIMEOUT)
+            if race is None:
+                # 通用对话框选择器可能匹配到其他对话框，只在特征选择器都未出现时检查一次
+                race = await race_selectors(frames, GENERIC_DIALOG_SELECTORS, GENERIC_DIALOG_CHECK_TIMEOUT)
             
-            target_frame = None
-            for i, frame in enumerate(frames):
-                logger.info(f"检查iframe {i}: {frame.url}")
-                try:
-                    for selector in selectors_to_try:
-                        try:
-                            await frame.wait_for_selector(selector, timeout=2000)
-                            logger.info(f"✓ 在iframe {i} 中检测到银行卡选择弹窗，使用选择器: {selector}")
-                            bank_dialog_found = True
-                            target_frame = frame
-                            break
-                        except Exception as e:
-                            logger.debug(f"iframe {i} 选择器 {selector} 未找到: {e}")
-                            continue
-                    if bank_dialog_found:
-                        break
-                except Exception as e:
-                    logger.debug(f"检查iframe {i} 失败: {e}")
-                    continue
-            
-            # 如果没找到，尝试检测已存在的弹窗
-            if not bank_dialog_found:
-                logger.info("尝试检测已存在的银行卡选择弹窗...")
-                for i, frame in enumerate(frames):
-                    try:
-                        for selector in selectors_to_try:
-                            try:
-                                elements = await frame.locator(selector).all()
-                                if len(elements) > 0:
-                                    logger.info(f"✓ 在iframe {i} 中检测到已存在的银行卡选择弹窗，使用选择器: {selector}")
-                                    bank_dialog_found = True
-                                    target_frame = frame
-                                    break
-                            except Exception as e:
-                                logger.debug(f"iframe {i} 检测选择器 {selector} 失败: {e}")
-                                continue
-                        if bank_dialog_found:
-                            break
-                    except Exception as e:
-                        logger.debug(f"检查iframe {i} 失败: {e}")
-                        continue
-            
-            # 检查是否有"请选择卡号"的标题
-            if not bank_dialog_found:
-                logger.info("检查是否有'请选择卡号'标题...")
-                for i, frame in enumerate(frames):
-                    try:
-                        title_elements = await frame.locator("text=请选择卡号").all()
-                        if len(title_elements) > 0:
-                            logger.info(f"✓ 在iframe {i} 中检测到'请选择卡号'标题")
-                            bank_dialog_found = True
-                            target_frame = frame
-                            break
-                    except Exception as e:
-                        logger.debug(f"iframe {i} 检测'请选择卡号'标题失败: {e}")
-                        continue
-            
-            # 检查是否有radio按钮
-            if not bank_dialog_found:
-                logger.info("检查是否有银行卡选择radio按钮...")
-                for i, frame in enumerate(frames):
-                    try:
-                        radio_elements = await frame.locator("input[type='radio'][name='rdoacnt']").all()
-                        if len(radio_elements) > 0:
-                            logger.info(f"✓ 在iframe {i} 中检测到 {len(radio_elements)} 个银行卡选择radio按钮")
-                            bank_dialog_found = True
-                            target_frame = frame
-                            break
-                    except Exception as e:
-                        logger.debug(f"iframe {i} 检测radio按钮失败: {e}")
-                        continue
-            
-            # 检查是否有ui-dialog类的元素
-            if not bank_dialog_found:
-                logger.info("检查是否有ui-dialog类的元素...")
-                for i, frame in enumerate(frames):
-                    try:
-                        dialog_elements = await frame.locator("div.ui-dialog").all()
-                        if len(dialog_elements) > 0:
-                            logger.info(f"✓ 在iframe {i} 中检测到 {len(dialog_elements)} 个ui-dialog元素")
-                            bank_dialog_found = True
-                            target_frame = frame
-                            break
-                    except Exception as e:
-                        logger.debug(f"iframe {i} 检测ui-dialog元素失败: {e}")
-                        continue
+            bank_dialog_found = race is not None
+            target_frame = race.target if race else None
+            if race:
+                logger.info(f"✓ 在iframe {race.target_index} 中检测到银行卡选择弹窗，使用选择器: {race.selector} (耗时 {race.elapsed:.2f}s)")
             
             if not bank_dialog_found:
                 logger.warning("未检测到银行卡选择弹窗，可能只有一张卡或弹窗未出现")
@@ -1931,11 +2043,15 @@ class LoginAutomation:
                 logger.warning("未找到卡号尾号信息，将自动选择第一张银行卡")
                 # 自动选择第一张银行卡
                 try:
+                    cards = await read_bank_card_table(target_frame)
+                    if cards:
+                        self.bank_card_registry.record(work_id, cards)
+                    
                     radio_buttons = await target_frame.locator("input[type='radio'][name='rdoacnt']").all()
                     if len(radio_buttons) > 0:
                         await radio_buttons[0].click()
                         logger.info("✓ 自动选择第一张银行卡")
-                        await asyncio.sleep(1)
+                        await traced_sleep(1)
                         
                         # 点击确定按钮
                         await self.click_confirm_button_in_dialog()
@@ -1947,26 +2063,30 @@ class LoginAutomation:
             
             logger.info(f"开始选择卡号尾号: {card_tail_value}")
             
-            # 等待弹窗完全加载（缩减等待时间）
-            await asyncio.sleep(BANK_CARD_SELECTION_WAIT)
+            # 优先使用已记录的该工号银行卡直接选择，其次一次读取整个银行卡表格匹配
+            radio_clicked = await self.select_card_from_registry(target_frame, work_id, card_tail_value)
+            if not radio_clicked:
+                radio_clicked = await self.select_card_from_dialog_table(target_frame, work_id, card_tail_value)
             
-            # 尝试多种方式查找和点击radio按钮
-            radio_clicked = False
+            if not radio_clicked:
+                # 等待弹窗完全加载（缩减等待时间）
+                await traced_sleep(BANK_CARD_SELECTION_WAIT)
             
             # 方法1: 通过XPath查找包含卡号尾号的tr，然后点击其中的radio
-            logger.info("方法1: 通过XPath查找包含卡号尾号的tr...")
-            try:
-                # 查找包含卡号尾号的td元素，然后找到同行的radio按钮
-                radio_selector = f"//tr[td[contains(text(), '{card_tail_value}')]]/td/input[@type='radio'][@name='rdoacnt']"
-                radio_element = target_frame.locator(radio_selector).first
-                if await radio_element.count() > 0:
-                    await radio_element.click()
-                    logger.info(f"✓ 成功选择卡号尾号 {card_tail_value} 对应的银行卡")
-                    radio_clicked = True
-                else:
-                    logger.debug(f"未找到卡号尾号 {card_tail_value} 对应的radio按钮")
-            except Exception as e:
-                logger.debug(f"方法1失败: {e}")
+            if not radio_clicked:
+                logger.info("方法1: 通过XPath查找包含卡号尾号的tr...")
+                try:
+                    # 查找包含卡号尾号的td元素，然后找到同行的radio按钮
+                    radio_selector = f"//tr[td[contains(text(), '{card_tail_value}')]]/td/input[@type='radio'][@name='rdoacnt']"
+                    radio_element = target_frame.locator(radio_selector).first
+                    if await radio_element.count() > 0:
+                        await radio_element.click()
+                        logger.info(f"✓ 成功选择卡号尾号 {card_tail_value} 对应的银行卡")
+                        radio_clicked = True
+                    else:
+                        logger.debug("未找到卡号尾号 %s 对应的radio按钮", card_tail_value)
+                except Exception as e:
+                    logger.debug("方法1失败: %s", e)
             
             # 方法2: 通过onclick属性查找
             if not radio_clicked:
@@ -1979,7 +2099,7 @@ class LoginAutomation:
                         logger.info(f"✓ 通过onclick属性成功选择卡号尾号 {card_tail_value} 对应的银行卡")
                         radio_clicked = True
                 except Exception as e:
-                    logger.debug(f"方法2失败: {e}")
+                    logger.debug("方法2失败: %s", e)
             
             # 方法3: 通过卡号文本查找
             if not radio_clicked:
@@ -2000,10 +2120,10 @@ class LoginAutomation:
                                 radio_clicked = True
                                 break
                         except Exception as e:
-                            logger.debug(f"在tr中查找radio失败: {e}")
+                            logger.debug("在tr中查找radio失败: %s", e)
                             continue
                 except Exception as e:
-                    logger.debug(f"方法3失败: {e}")
+                    logger.debug("方法3失败: %s", e)
             
             # 方法4: 遍历所有radio按钮，检查其onclick属性
             if not radio_clicked:
@@ -2019,14 +2139,14 @@ class LoginAutomation:
                                 radio_clicked = True
                                 break
                         except Exception as e:
-                            logger.debug(f"检查radio按钮onclick属性失败: {e}")
+                            logger.debug("检查radio按钮onclick属性失败: %s", e)
                             continue
                 except Exception as e:
-                    logger.debug(f"方法4失败: {e}")
+                    logger.debug("方法4失败: %s", e)
             
             if radio_clicked:
                 logger.info("银行卡选择成功，等待选择生效...")
-                await asyncio.sleep(2)  # 等待选择生效
+                await traced_sleep(2)  # 等待选择生效
                 
                 # 点击确定按钮
                 await self.click_confirm_button_in_dialog()
@@ -2036,6 +2156,100 @@ class LoginAutomation:
         except Exception as e:
             logger.error(f"处理转卡信息工号银行卡选择失败: {e}")
     
+    async def select_card_from_registry(self, frame, work_id: str, card_tail: str) -> bool:
+        """
+        按已记录的该工号银行卡直接选择radio按钮（不需要读取整个对话框）
+        
+        radio按钮ID按行号生成，点击前核对该行当前显示的卡号；与卡号尾号不符时（该工号的银行卡列表或顺序已变化）
+        改为重新读取银行卡表格选择
+        
+        Args:
+            frame: 银行卡选择弹窗所在的frame
+            work_id: 转卡信息工号
+            card_tail: 卡号尾号（不包含*前缀）
+            
+        Returns:
+            是否选择成功
+        """
+        card = self.bank_card_registry.find_by_tail(work_id, card_tail) if work_id else None
+        if card is None:
+            return False
+        try:
+            radio_element = frame.locator(card.radio_selector).first
+            if await radio_element.count() == 0:
+                logger.info(f"已记录的银行卡 {card.card_number} 不在当前弹窗中，重新读取银行卡表格")
+                return False
+            displayed = await read_radio_card_number(radio_element)
+            if not displayed or not card_tail_matches(displayed, card_tail):
+                logger.warning(f"已记录的银行卡 {card.card_number} 的选择按钮现在对应卡号 {displayed}，"
+                               f"与卡号尾号 {card_tail} 不符，重新读取银行卡表格")
+                return await self.select_card_from_dialog_table(frame, work_id, card_tail)
+            await radio_element.click()
+            logger.info(f"✓ 按已记录的银行卡直接选择卡号尾号 {card_tail}: {card.card_number}")
+            return True
+        except Exception as e:
+            logger.debug("按已记录的银行卡选择失败: %s", e)
+            return False
+    
+    async def select_card_from_dialog_table(self, frame, work_id: str, card_tail: str) -> bool:
+        """
+        一次读取银行卡选择弹窗中的整个表格，记录该工号的银行卡，并选择卡号尾号对应的银行卡
+        
+        Args:
+            frame: 银行卡选择弹窗所在的frame
+            work_id: 转卡信息工号
+            card_tail: 卡号尾号（不包含*前缀）
+            
+        Returns:
+            是否选择成功
+        """
+        try:
+            cards = await read_bank_card_table(frame)
+            if not cards:
+                return False
+            self.bank_card_registry.record(work_id, cards)
+            matched = [card for card in cards if card_tail_matches(card.card_number, card_tail)]
+            if len(matched) != 1:
+                logger.info(f"银行卡表格中卡号尾号 {card_tail} 对应 {len(matched)} 张银行卡")
+                return False
+            await click_bank_card(frame, matched[0])
+            logger.info(f"✓ 通过银行卡表格选择卡号尾号 {card_tail}: {matched[0].card_number}")
+            return True
+        except Exception as e:
+            logger.debug("读取银行卡表格失败: %s", e)
+            return False
+    
+    def precheck_card_tails(self):
+        """
+        根据已记录的银行卡预检查报销信息中的卡号尾号（只记录警告，不阻塞流程）
+        """
+        if self.reimbursement_data is None or "转卡信息工号" not in self.reimbursement_data.columns:
+            return
+        tail_columns = [col for col in self.reimbursement_data.columns if str(col).startswith("卡号尾号")]
+        if not tail_columns:
+            return
+        
+        checked = 0
+        for _, row in self.reimbursement_data.iterrows():
+            if pd.isna(row["转卡信息工号"]):
+                continue
+            work_id = self.clean_value_string(row["转卡信息工号"])
+            for col in tail_columns:
+                if pd.isna(row[col]):
+                    continue
+                value_str = self.clean_value_string(row[col])
+                if not value_str.startswith(CARD_NUMBER_PREFIX):
+                    continue
+                card_tail = value_str[1:]
+                result = self.bank_card_registry.has_tail(work_id, card_tail)
+                if result is None:
+                    continue
+                checked += 1
+                if not result:
+                    logger.warning(f"预检查: 工号 {work_id} 的已记录银行卡中没有尾号 {card_tail}，请核对报销信息")
+        if checked:
+            logger.info(f"预检查完成: 核对了 {checked} 个卡号尾号")
+    
     async def click_confirm_button_in_dialog(self):
         """
         在对话框中点击确定按钮
@@ -2060,11 +2274,11 @@ class LoginAutomation:
                     if await confirm_button.count() > 0:
                         await confirm_button.click()
                         logger.info(f"✓ 在主页面成功点击确定按钮 (使用选择器: {selector})")
-                        await asyncio.sleep(BUTTON_CLICK_WAIT)
+                        await traced_sleep(BUTTON_CLICK_WAIT)
                         confirm_clicked = True
                         break
                 except Exception as e:
-                    logger.debug(f"主页面确定按钮选择器 {selector} 失败: {e}")
+                    logger.debug("主页面确定按钮选择器 %s 失败: %s", selector, e)
                     continue
             
             # 如果主页面没找到，尝试在所有iframe中查找
@@ -2077,11 +2291,11 @@ class LoginAutomation:
                             if await confirm_button.count() > 0:
                                 await confirm_button.click()
                                 logger.info(f"✓ 在iframe {i} 中成功点击确定按钮 (使用选择器: {selector})")
-                                await asyncio.sleep(BUTTON_CLICK_WAIT)
+                                await traced_sleep(BUTTON_CLICK_WAIT)
                                 confirm_clicked = True
                                 break
                         except Exception as e:
-                            logger.debug(f"iframe {i} 确定按钮选择器 {selector} 失败: {e}")
+                            logger.debug("iframe %s 确定按钮选择器 %s 失败: %s", i, selector, e)
                             continue
                     if confirm_clicked:
                         break
@@ -2090,7 +2304,7 @@ class LoginAutomation:
                 logger.warning("未找到确定按钮")
                 
         except Exception as e:
-            logger.debug(f"点击确定按钮失败: {e}")
+            logger.debug("点击确定按钮失败: %s", e)
     
     async def select_card_by_number(self, card_tail: str, retries: int = MAX_RETRIES):
         """
@@ -2102,6 +2316,13 @@ class LoginAutomation:
         """
         logger.info(f"开始选择卡号尾号: {card_tail}")
         
+        # 按当前转卡信息工号已记录的银行卡直接选择
+        if self.current_work_id:
+            for frame in self.page.frames:
+                if await self.select_card_from_registry(frame, self.current_work_id, card_tail):
+                    await traced_sleep(ELEMENT_WAIT)
+                    return
+        
         for attempt in range(retries):
             try:
                 frames = self.page.frames
@@ -2114,10 +2335,10 @@ class LoginAutomation:
                     if await radio_element.count() > 0:
                         await radio_element.click()
                         logger.info(f"成功选择卡号尾号 {card_tail} 对应的radio按钮")
-                        await asyncio.sleep(ELEMENT_WAIT)
+                        await traced_sleep(ELEMENT_WAIT)
                         return
                 except Exception as e:
-                    logger.debug(f"在主页面查找radio按钮失败: {e}")
+                    logger.debug("在主页面查找radio按钮失败: %s", e)
                 
                 # 在iframe中查找
                 for frame in frames:
@@ -2127,10 +2348,10 @@ class LoginAutomation:
                         if await radio_element.count() > 0:
                             await radio_element.click()
                             logger.info(f"在iframe中成功选择卡号尾号 {card_tail} 对应的radio按钮")
-                            await asyncio.sleep(ELEMENT_WAIT)
+                            await traced_sleep(ELEMENT_WAIT)
                             return
                     except Exception as e:
-                        logger.debug(f"在iframe中查找radio按钮失败: {e}")
+                        logger.debug("在iframe中查找radio按钮失败: %s", e)
                         continue
                 
                 # 尝试更通用的选择器
@@ -2143,7 +2364,7 @@ class LoginAutomation:
                     if await radio_element.count() > 0:
                         await radio_element.click()
                         logger.info(f"通过onclick属性成功选择卡号尾号 {card_tail} 对应的radio按钮")
-                        await asyncio.sleep(ELEMENT_WAIT)
+                        await traced_sleep(ELEMENT_WAIT)
                         return
                     
                     # 在iframe中尝试
@@ -2153,14 +2374,14 @@ class LoginAutomation:
                             if await radio_element.count() > 0:
                                 await radio_element.click()
                                 logger.info(f"在iframe中通过onclick属性成功选择卡号尾号 {card_tail} 对应的radio按钮")
-                                await asyncio.sleep(ELEMENT_WAIT)
+                                await traced_sleep(ELEMENT_WAIT)
                                 return
                         except Exception as e:
-                            logger.debug(f"在iframe中通过onclick属性查找失败: {e}")
+                            logger.debug("在iframe中通过onclick属性查找失败: %s", e)
                             continue
                 
                 except Exception as e:
-                    logger.debug(f"通过onclick属性查找失败: {e}")
+                    logger.debug("通过onclick属性查找失败: %s", e)
                 
                 logger.warning(f"未找到卡号尾号 {card_tail} 对应的radio按钮")
                 return
@@ -2168,9 +2389,10 @@ class LoginAutomation:
             except Exception as e:
                 logger.warning(f"选择卡号radio按钮失败 (尝试 {attempt + 1}/{retries}): {card_tail} - {e}")
                 if attempt < retries - 1:
-                    await asyncio.sleep(RETRY_DELAY)
+                    await traced_sleep(RETRY_DELAY)
                 else:
                     logger.error(f"选择卡号radio按钮最终失败: {card_tail}")
+                    annotate(outcome="failed", attempts=retries)
     
     async def click_print_button(self):
         """
@@ -2180,7 +2402,7 @@ class LoginAutomation:
             logger.info("查找网页上的打印确认单按钮...")
             
             # 等待页面加载完成
-            await asyncio.sleep(2)
+            await traced_sleep(2)
             
             # 查找并点击网页上的打印确认单按钮
             print_button_found = await self._find_and_click_print_button()
@@ -2190,7 +2412,7 @@ class LoginAutomation:
                 
                 # 等待5秒钟，确保Chrome打印页面完全加载
                 logger.info("等待5秒钟，确保Chrome打印页面加载完成...")
-                await asyncio.sleep(5)
+                await traced_sleep(5)
                 
                 # 从配置中获取Chrome打印对话框中保存按钮的坐标
                 from config import PRINT_DIALOG_COORDINATES
@@ -2206,7 +2428,7 @@ class LoginAutomation:
                 logger.info("✓ Chrome打印对话框保存按钮点击成功")
                 
                 # 等待一下，看看是否真的点击成功了
-                await asyncio.sleep(1)
+                await traced_sleep(1)
                 
                 # 检查是否出现了文件保存对话框（通过检查是否有文件路径输入框）
                 logger.info("检查是否出现文件保存对话框...")
@@ -2223,7 +2445,7 @@ class LoginAutomation:
                     logger.info("尝试重新点击Chrome打印对话框中的保存按钮...")
                     # 再次尝试点击保存按钮
                     await self.page.mouse.click(chrome_print_x, chrome_print_y)
-                    await asyncio.sleep(1)
+                    await traced_sleep(1)
                 
                 # 处理文件保存对话框
                 await self.handle_print_dialog()
@@ -2298,7 +2520,7 @@ class LoginAutomation:
                                 logger.info(f"所有点击方法都失败，但继续执行，假设打印按钮已点击")
                                 return True
                     except Exception as e:
-                        logger.debug(f"iframe {i} 选择器 {selector} 失败: {e}")
+                        logger.debug("iframe %s 选择器 %s 失败: %s", i, selector, e)
                         continue
             
             # 如果在iframe中没找到，在主页面查找
@@ -2344,7 +2566,7 @@ class LoginAutomation:
                             logger.info(f"所有点击方法都失败，但继续执行，假设打印按钮已点击")
                             return True
                 except Exception as e:
-                    logger.debug(f"主页面选择器 {selector} 失败: {e}")
+                    logger.debug("主页面选择器 %s 失败: %s", selector, e)
                     continue
             
             logger.warning("未找到打印按钮")
@@ -2388,7 +2610,7 @@ class LoginAutomation:
                             print_button_found = True
                             break
                 except Exception as e:
-                    logger.debug(f"主页面选择器 {selector} 失败: {e}")
+                    logger.debug("主页面选择器 %s 失败: %s", selector, e)
                     continue
             
             # 如果在主页面没找到，在iframe中查找
@@ -2412,7 +2634,7 @@ class LoginAutomation:
                                     print_button_found = True
                                     break
                         except Exception as e:
-                            logger.debug(f"iframe {i} 选择器 {selector} 失败: {e}")
+                            logger.debug("iframe %s 选择器 %s 失败: %s", i, selector, e)
                             continue
                     if print_button_found:
                         break
@@ -2422,7 +2644,7 @@ class LoginAutomation:
                 
                 # 等待5秒钟，确保Chrome打印页面完全加载
                 logger.info("等待5秒钟，确保Chrome打印页面加载完成...")
-                await asyncio.sleep(5)
+                await traced_sleep(5)
                 
                 # 从配置中获取Chrome打印对话框中保存按钮的坐标
                 from config import PRINT_DIALOG_COORDINATES
@@ -2438,7 +2660,7 @@ class LoginAutomation:
                 logger.info("✓ 备用方案：Chrome打印对话框保存按钮点击成功")
                 
                 # 等待一下，看看是否真的点击成功了
-                await asyncio.sleep(1)
+                await traced_sleep(1)
                 
                 # 检查是否出现了文件保存对话框
                 logger.info("备用方案：检查是否出现文件保存对话框...")
@@ -2455,7 +2677,7 @@ class LoginAutomation:
                     logger.info("备用方案：尝试重新点击Chrome打印对话框中的保存按钮...")
                     # 再次尝试点击保存按钮
                     await self.page.mouse.click(chrome_print_x, chrome_print_y)
-                    await asyncio.sleep(1)
+                    await traced_sleep(1)
                 
                 # 处理文件保存对话框
                 await self.handle_print_dialog()
@@ -2480,7 +2702,7 @@ class LoginAutomation:
             
             # 等待打印对话框出现
             logger.info("等待打印对话框出现...")
-            await asyncio.sleep(PRINT_DIALOG_WAIT_TIME)
+            await traced_sleep(PRINT_DIALOG_WAIT_TIME)
             
             # 从config中获取坐标配置和文件路径
             coords = PRINT_DIALOG_COORDINATES
@@ -2501,25 +2723,25 @@ class LoginAutomation:
             # 先点击文件路径输入框
             logger.info(f"点击文件路径输入框，坐标: ({filepath_x}, {filepath_y})")
             await self.page.mouse.click(filepath_x, filepath_y)
-            await asyncio.sleep(0.5)
+            await traced_sleep(0.5)
             
             # 确保输入框获得焦点后再输入
             logger.info(f"确保输入框获得焦点...")
-            await asyncio.sleep(0.3)
+            await traced_sleep(0.3)
             
             # 清空现有内容并输入文件路径
             logger.info(f"输入文件路径: {file_path}")
             await self.page.keyboard.press('Control+a')  # 全选现有内容
-            await asyncio.sleep(0.2)
+            await traced_sleep(0.2)
             await self.page.keyboard.press('Delete')   # 删除现有内容
-            await asyncio.sleep(0.2)
+            await traced_sleep(0.2)
             await self.page.keyboard.type(file_path)   # 输入新路径
-            await asyncio.sleep(0.5)
+            await traced_sleep(0.5)
             
             # 按Tab键移动到文件名输入框
             logger.info("按Tab键移动到文件名输入框")
             await self.page.keyboard.press('Tab')
-            await asyncio.sleep(0.5)
+            await traced_sleep(0.5)
             
             # 尝试导入打印对话框处理模块
             try:
@@ -2560,7 +2782,7 @@ class LoginAutomation:
             logger.info("使用备用方案处理打印对话框...")
             
             # 等待一段时间让用户看到对话框
-            await asyncio.sleep(2)
+            await traced_sleep(2)
             
             # 从config中获取文件路径
             from config import PRINT_FILE_PATH
@@ -2574,21 +2796,21 @@ class LoginAutomation:
                 
                 logger.info(f"备用方案：点击文件路径输入框，坐标: ({filepath_x}, {filepath_y})")
                 await self.page.mouse.click(filepath_x, filepath_y)
-                await asyncio.sleep(0.5)
+                await traced_sleep(0.5)
                 
                 # 清空现有内容并输入文件路径
                 logger.info(f"备用方案：输入文件路径: {file_path}")
                 await self.page.keyboard.press('Control+a')  # 全选现有内容
-                await asyncio.sleep(0.2)
+                await traced_sleep(0.2)
                 await self.page.keyboard.press('Delete')   # 删除现有内容
-                await asyncio.sleep(0.2)
+                await traced_sleep(0.2)
                 await self.page.keyboard.type(file_path)   # 输入新路径
-                await asyncio.sleep(0.5)
+                await traced_sleep(0.5)
                 
                 # 按Tab键移动到文件名输入框
                 logger.info("备用方案：按Tab键移动到文件名输入框")
                 await self.page.keyboard.press('Tab')
-                await asyncio.sleep(0.5)
+                await traced_sleep(0.5)
                 
             except Exception as e:
                 logger.warning(f"备用方案文件路径输入失败: {e}")
@@ -2597,17 +2819,17 @@ class LoginAutomation:
             logger.info("尝试按Tab键导航...")
             for i in range(15):
                 await self.page.keyboard.press('Tab')
-                await asyncio.sleep(0.3)
+                await traced_sleep(0.3)
             
             # 按Enter键确认
             logger.info("按Enter键确认...")
             await self.page.keyboard.press('Enter')
-            await asyncio.sleep(2)
+            await traced_sleep(2)
             
             # 如果还在对话框中，尝试按Escape键关闭
             logger.info("尝试按Escape键关闭对话框...")
             await self.page.keyboard.press('Escape')
-            await asyncio.sleep(1)
+            await traced_sleep(1)
             
             logger.info("备用方案处理完成")
             
@@ -2643,7 +2865,7 @@ class LoginAutomation:
             # 如果没找到，返回默认值
             return "未知项目"
         except Exception as e:
-            logger.debug(f"获取项目编号失败: {e}")
+            logger.debug("获取项目编号失败: %s", e)
             return "未知项目"
     
     def get_current_total_amount(self) -> str:
@@ -2674,7 +2896,7 @@ class LoginAutomation:
             # 如果没找到，返回默认值
             return "0"
         except Exception as e:
-            logger.debug(f"获取总金额失败: {e}")
+            logger.debug("获取总金额失败: %s", e)
             return "0"
     
     async def process_sequence_with_subsequences(self, sequence_num: int, group_data: pd.DataFrame):
@@ -2686,6 +2908,7 @@ class LoginAutomation:
             group_data: 该序号下的所有数据行
         """
         logger.info(f"开始处理序号 {sequence_num} 的报销记录，共 {len(group_data)} 行")
+        set_trace_context(sequence=str(sequence_num), row=None)
         
         # 检查是否包含登录信息（通常在第一行）
         first_row = group_data.iloc[0]
@@ -2741,6 +2964,7 @@ class LoginAutomation:
             row = rows[i]
             current_sequence = row.get(SEQUENCE_COL, None)
             logger.info(f"处理第 {i+1} 行数据，序号: {current_sequence}")
+            set_trace_context(row=i + 1)
             
             # 查找子序列开始和结束列的位置（支持自动重命名）
             subsequence_start_idx = None
@@ -2841,7 +3065,8 @@ class LoginAutomation:
                                     logger.info(f"找到金额列: {amount_col} = {amount_str}")
                                     
                                     # 填写金额到对应的输入框
-                                    await self.fill_input(input_id, amount_str, title=amount_col)
+                                    with self.step_tracer.span("subject_amount", title=amount_col, element_id=input_id):
+                                        await self.fill_input(input_id, amount_str, title=amount_col)
                                     logger.info(f"成功填写科目 '{subject_name}' 的金额: {amount_str}")
                                     
                                     # 跳过金额列，因为已经处理了
@@ -2922,7 +3147,8 @@ class LoginAutomation:
                             logger.info(f"找到金额列: {amount_col} = {amount_str}")
                             
                             # 填写金额到对应的输入框
-                            await self.fill_input(input_id, amount_str, title=amount_col)
+                            with self.step_tracer.span("subject_amount", title=amount_col, element_id=input_id):
+                                await self.fill_input(input_id, amount_str, title=amount_col)
                             logger.info(f"成功填写科目 '{subject_name}' 的金额: {amount_str}")
                             
                             # 跳过金额列，因为已经处理了
@@ -2997,12 +3223,16 @@ class LoginAutomation:
         import sys
         sys.stdout.flush()
         
-        try:
-            captcha = input("请输入验证码: ")
-            logger.info(f"用户输入验证码: {captcha}")
-        except Exception as e:
-            logger.error(f"验证码输入失败: {e}")
-            captcha = ""
+        if self.captcha is not None:
+            captcha = self.captcha
+            logger.info(f"使用预先提供的验证码: {captcha}")
+        else:
+            try:
+                captcha = input("请输入验证码: ")
+                logger.info(f"用户输入验证码: {captcha}")
+            except Exception as e:
+                logger.error(f"验证码输入失败: {e}")
+                captcha = ""
         
         # 查找验证码输入框并填写
         try:
@@ -3017,15 +3247,11 @@ class LoginAutomation:
             ]
             
             captcha_filled = False
-            for selector in captcha_selectors:
-                try:
-                    await self.page.wait_for_selector(selector, timeout=1000)
-                    await self.page.fill(selector, captcha)
-                    logger.info(f"成功填写验证码: {captcha}")
-                    captcha_filled = True
-                    break
-                except:
-                    continue
+            race = await race_selectors([self.page], captcha_selectors, CAPTCHA_DETECT_TIMEOUT)
+            if race:
+                await self.page.fill(race.selector, captcha)
+                logger.info(f"成功填写验证码: {captcha}")
+                captcha_filled = True
             
             if not captcha_filled:
                 logger.warning("未找到验证码输入框，请手动输入验证码")
@@ -3041,7 +3267,7 @@ class LoginAutomation:
         
         # 等待登录完成
         logger.info("登录请求已发送，等待页面跳转...")
-        await asyncio.sleep(LOGIN_WAIT_TIME)
+        await traced_sleep(LOGIN_WAIT_TIME)
         
         # 登录完成后，继续处理当前记录中的其他操作
         logger.info("登录完成，继续处理当前记录中的其他操作...")
@@ -3095,7 +3321,8 @@ class LoginAutomation:
                             logger.info(f"找到金额列: {amount_col} = {amount_str}")
                             
                             # 填写金额到对应的输入框
-                            await self.fill_input(input_id, amount_str, title=amount_col)
+                            with self.step_tracer.span("subject_amount", title=amount_col, element_id=input_id):
+                                await self.fill_input(input_id, amount_str, title=amount_col)
                             logger.info(f"成功填写科目 '{subject_name}' 的金额: {amount_str}")
                             
                             # 跳过金额列，因为已经处理了
@@ -3170,6 +3397,8 @@ class LoginAutomation:
         """
         处理第二种子序列逻辑：填写出差人信息到网页表格
         采用类似第一种子序列的方式，自动为字段名添加后缀并查询标题-ID映射
+        先把整个出差人信息块编译成字段列表：普通输入框和下拉框一次批量填写，
+        日期字段单独填写，会触发服务器查询的工号字段最后单独填写
         
         Args:
             group_data: 同一序号下的所有数据行
@@ -3177,34 +3406,70 @@ class LoginAutomation:
         """
         logger.info(f"开始处理出差人信息子序列，从第 {start_row_idx + 1} 行开始")
         
-        # 从开始行开始，逐行处理子序列
-        # 重置traveler_index，确保从0开始
-        traveler_index = 0  # 出差人索引，用于生成后缀
-        logger.info(f"重置traveler_index为0，开始处理第二种子序列")
-        
         # 强制重置traveler_index，确保从0开始
         self.traveler_index = 0
         
+        # 先探测当前页面上所有映射ID的字段类型，编译时按实际类型区分日期/下拉框/输入框
+        await self.field_types.probe(self.page, self.title_id_mapping.values())
+        block = self.compile_traveler_block(group_data, start_row_idx)
+        
+        # 所有出差人的普通字段一次批量填写，未完成的字段退回逐个填写
+        if block["batch"]:
+            with self.step_tracer.span("traveler_batch", fields=len(block["batch"])):
+                results = await apply_field_batch(self.page, block["batch"])
+                fallback = 0
+                for op in block["batch"]:
+                    if results.get(op.element_id) == "ok":
+                        continue
+                    logger.info(f"批量填写未完成 ({results.get(op.element_id)})，单独填写{op.title}: {op.value}")
+                    fallback += 1
+                    if op.kind == "select":
+                        await self.select_dropdown(op.element_id, op.value)
+                    else:
+                        await self.fill_input(op.element_id, op.value, title=op.title)
+                annotate(fallback=fallback)
+        
+        # 日期字段一次直接设置，未成功的使用日历控件
+        if block["dates"]:
+            with self.step_tracer.span("traveler_dates", fields=len(block["dates"])):
+                await self.fill_dates(block["dates"])
+        
+        # 工号字段会触发服务器查询，最后单独填写并确认姓名
+        await self.fill_traveler_employee_ids(block["employee"])
+        
+        # 所有字段填写完成
+        logger.info(f"所有字段填写完成")
+        
+        logger.info(f"出差人信息填写完成，共处理了 {block['count']} 个出差人")
+    
+    def compile_traveler_block(self, group_data: pd.DataFrame, start_row_idx: int) -> dict:
+        """
+        把出差人信息子序列编译成字段列表（预先解析所有 字段-序号 对应的ID）
+        
+        Args:
+            group_data: 同一序号下的所有数据行
+            start_row_idx: 子序列开始的行索引
+            
+        Returns:
+            {'batch': 可批量填写的字段, 'dates': 日期字段, 'employee': 工号字段, 'count': 出差人数量}
+        """
+        batch_ops: List[FieldOp] = []
+        date_fills = []
+        employee_fills = []
+        traveler_index = 0  # 出差人索引，用于生成后缀
+        
         for row_idx in range(start_row_idx, len(group_data)):
             row = group_data.iloc[row_idx]
             
             # 检查是否为子序列结束（但先处理当前行的信息，支持自动重命名）
-            is_end_marker = False
+            should_break = False
             for end_col in group_data.columns:
                 if end_col.startswith(SUBSEQUENCE_END_COL):
                     if pd.notna(row[end_col]) and self.clean_value_string(row[end_col]) == TRAVELER_SUBSEQUENCE_MARKER:
-                        is_end_marker = True
+                        should_break = True
                         logger.info(f"检测到子序列结束标记，在第 {row_idx + 1} 行的列 {end_col}")
                         break
             
-            if is_end_marker:
-                logger.info(f"检测到子序列结束标记，在第 {row_idx + 1} 行")
-                # 如果是子序列结束标记所在行，先处理当前行的出差人信息，然后结束
-                logger.info(f"处理子序列结束标记所在行的出差人信息")
-                should_break = True
-            else:
-                should_break = False
-            
             # 检查当前行是否有有效的出差人信息
             has_traveler_info = False
             for field in TRAVELER_FIELDS.keys():
@@ -3221,54 +3486,40 @@ class LoginAutomation:
                 logger.warning(f"出差人数量超过6个，跳过第 {traveler_index + 1} 个")
                 break
             
-            logger.info(f"处理第 {traveler_index + 1} 个出差人信息（第 {row_idx + 1} 行）")
+            logger.info(f"编译第 {traveler_index + 1} 个出差人信息（第 {row_idx + 1} 行）")
             
-            # 逐列处理当前行的出差人信息
-            # 调整字段处理顺序：先填写姓名，再填写工号，避免工号触发的事件清空姓名
+            # 先填写姓名，再填写工号，避免工号触发的事件清空姓名
             field_order = ["姓名", "人员类型", "单位", "职称", "工号"]
             
             for field in field_order:
                 if field in TRAVELER_FIELDS.keys() and field in group_data.columns and pd.notna(row[field]) and row[field] != "":
                     value = self.clean_value_string(row[field])
                     
-                    # 为字段名添加后缀
+                    # 为字段名添加后缀，并在标题-ID映射表中查找对应的输入框ID
                     field_with_suffix = f"{field}-{traveler_index}"
-                    logger.info(f"处理字段: {field} -> {field_with_suffix} = {value}")
-                    
-                    # 在标题-ID映射表中查找对应的输入框ID
                     input_id = self.get_object_id(field_with_suffix)
                     if not input_id:
                         logger.warning(f"未找到字段 '{field_with_suffix}' 对应的ID映射")
                         continue
                     
-                    # 根据字段类型选择填写方式
-                    if field == "人员类型":
-                        # 人员类型使用下拉选择
-                        await self.select_dropdown(input_id, value)
-                        logger.info(f"选择{field_with_suffix}: {value}")
-                    elif field == "工号":
-                        # 工号字段特殊处理：填写后等待一下，让JavaScript事件完成
-                        await self.fill_input(input_id, value, title=field_with_suffix)
-                        logger.info(f"填写{field_with_suffix}: {value}")
-                        # 等待JavaScript事件完成
-                        await asyncio.sleep(2)
-                        logger.info(f"工号填写完成，等待JavaScript事件处理")
-                        
-                        # 重新填写姓名，确保不被JavaScript事件清空
+                    if field == "工号":
                         name_field = f"姓名-{traveler_index}"
-                        name_value = self.clean_value_string(row["姓名"])
-                        name_input_id = self.get_object_id(name_field)
-                        if name_input_id and name_value:
-                            await self.fill_input(name_input_id, name_value, title=name_field)
-                            logger.info(f"重新填写{name_field}: {name_value}")
-                            await asyncio.sleep(0.5)
+                        name_value = self.clean_value_string(row["姓名"]) if "姓名" in group_data.columns else ""
+                        employee_fills.append({
+                            "input_id": input_id,
+                            "value": value,
+                            "field": field_with_suffix,
+                            "name_input_id": self.get_object_id(name_field) if name_value else "",
+                            "name_value": name_value,
+                            "name_field": name_field,
+                        })
+                    elif field == "人员类型":
+                        # 人员类型使用下拉选择
+                        batch_ops.append(FieldOp(input_id, value, kind="select", title=field_with_suffix))
                     else:
-                        # 其他字段使用输入框填写
-                        await self.fill_input(input_id, value, title=field_with_suffix)
-                        logger.info(f"填写{field_with_suffix}: {value}")
+                        batch_ops.append(FieldOp(input_id, value, title=field_with_suffix))
             
-            # 处理当前行的其他字段（非出差人信息字段，但仅限于子序列范围内的字段）
-            logger.info(f"处理第 {row_idx + 1} 行的其他字段")
+            # 当前行的其他字段（非出差人信息字段，但仅限于子序列范围内的字段）
             for col in group_data.columns:
                 # 跳过序号列、处理进度列、子序列标记列、出差人信息字段和登录相关字段
                 if (col in [SEQUENCE_COL, "处理进度", "登录界面工号", "登录界面密码", "登录按钮", "网上预约报账按钮", "等待", "申请报销单按钮", "已阅读并同意按钮", "选择业务大类", "报销项目号", "附件张数", "备注", "特殊事项说明", "下一步按钮1", "等待.1"] or 
@@ -3277,67 +3528,23 @@ class LoginAutomation:
                     col in TRAVELER_FIELDS.keys()):
                     continue
                 
-                # 检查是否为子序列结束后的字段，如果是则跳过，让后续的正常处理逻辑处理
-                # 注意：这里只跳过真正的子序列结束后的字段，不包括正常的操作字段
-                if col.startswith("下一步按钮") and col != "下一步按钮1":
-                    # 不跳过下一步按钮，让它在后续的正常处理逻辑中处理
-                    pass
-                
                 value = row[col]
                 if pd.notna(value) and value != "":
                     value_str = self.clean_value_string(value)
                     
                     # 为字段名添加后缀（使用固定的子序列索引0）
                     field_with_suffix = f"{col}-0"
-                    logger.info(f"处理子序列操作: {col} -> {field_with_suffix} = {value_str}")
-                    
-                    # 在标题-ID映射表中查找对应的输入框ID
                     input_id = self.get_object_id(field_with_suffix)
                     if not input_id:
                         logger.warning(f"未找到字段 '{field_with_suffix}' 对应的ID映射")
                         continue
                     
-                    # 根据字段类型选择填写方式
-                    # 检查是否为下拉字段（通过字段名或ID模式）
-                    is_dropdown = False
-                    if col in DROPDOWN_FIELDS:
-                        is_dropdown = True
-                    elif col == "省份":  # 省份字段特殊处理
-                        is_dropdown = True
-                    elif input_id and "sf" in input_id:  # 省份字段的ID模式
-                        is_dropdown = True
-                    elif input_id and "hsf" in input_id:  # hsf字段的ID模式
-                        is_dropdown = True
-                    elif input_id and "jtf" in input_id:  # jtf字段的ID模式
-                        is_dropdown = True
-                    
-                    # 检查是否为日期字段
-                    is_date = False
-                    if (input_id and ("date" in input_id.lower() or "startdate" in input_id.lower() or "enddate" in input_id.lower() or 
-                                     input_id.endswith("_startdate") or input_id.endswith("_enddate") or
-                                     "temp-startdate" in input_id or "temp-enddate" in input_id or
-                                     input_id == "formWF_YB6_3492_yc-chr_start1_0" or input_id == "formWF_YB6_3492_yc-chr_end1_0" or
-                                     "start" in input_id or "end" in input_id)):
-                        is_date = True
-                    
-                    if is_date:
-                        # 日期字段使用日历控件
-                        logger.info(f"检测到日期输入框: {input_id} = {value_str}")
-                        try:
-                            await self.select_date_from_calendar(input_id, value_str)
-                            logger.info(f"日期填写完成: {field_with_suffix}")
-                        except Exception as e:
-                            logger.warning(f"日期选择失败，尝试普通输入: {e}")
-                            await self.fill_input(input_id, value_str, title=field_with_suffix)
-                            logger.info(f"填写{field_with_suffix}: {value_str}")
-                    elif is_dropdown:
-                        # 下拉选择
-                        await self.select_dropdown(input_id, value_str)
-                        logger.info(f"选择{field_with_suffix}: {value_str}")
+                    if self.is_date_field_id(input_id):
+                        date_fills.append((input_id, value_str, field_with_suffix))
+                    elif self.is_dropdown_field(col, input_id):
+                        batch_ops.append(FieldOp(input_id, value_str, kind="select", title=field_with_suffix))
                     else:
-                        # 普通输入框
-                        await self.fill_input(input_id, value_str, title=field_with_suffix)
-                        logger.info(f"填写{field_with_suffix}: {value_str}")
+                        batch_ops.append(FieldOp(input_id, value_str, title=field_with_suffix))
             
             traveler_index += 1
             
@@ -3345,10 +3552,87 @@ class LoginAutomation:
             if should_break:
                 break
         
-        # 所有字段填写完成
-        logger.info(f"所有字段填写完成")
+        logger.info(f"出差人信息块: {traveler_index} 个出差人, 批量字段 {len(batch_ops)} 个, "
+                    f"日期字段 {len(date_fills)} 个, 工号字段 {len(employee_fills)} 个")
+        return {"batch": batch_ops, "dates": date_fills, "employee": employee_fills, "count": traveler_index}
+    
+    async def get_field_kind(self, element_id: str) -> Optional[str]:
+        """
+        获取元素的字段类型；第一次遇到时探测当前页面上所有映射ID的类型并缓存
         
-        logger.info(f"出差人信息填写完成，共处理了 {traveler_index} 个出差人")
+        Args:
+            element_id: 元素ID
+            
+        Returns:
+            select / date / input 等，当前页面上不存在该元素时返回None
+        """
+        kind = self.field_types.kind(element_id)
+        if kind is None and element_id:
+            await self.field_types.probe(self.page, [element_id, *self.title_id_mapping.values()])
+            kind = self.field_types.kind(element_id)
+        return kind
+    
+    def is_dropdown_field(self, col: str, input_id: str) -> bool:
+        """判断是否为下拉字段：优先使用探测到的字段类型，未探测到时通过字段名或ID模式判断"""
+        kind = self.field_types.kind(input_id)
+        if kind is not None:
+            return kind == "select"
+        if col in DROPDOWN_FIELDS:
+            return True
+        if col == "省份":  # 省份字段特殊处理
+            return True
+        # 省份（sf）、hsf、jtf字段的ID模式
+        return bool(input_id) and ("sf" in input_id or "hsf" in input_id or "jtf" in input_id)
+    
+    def is_date_field_id(self, input_id: str) -> bool:
+        """判断是否为日期字段：优先使用探测到的字段类型，未探测到时通过ID模式判断"""
+        info = self.field_types.fields.get(input_id)
+        if info is not None and not (info.kind == "input" and info.readonly):
+            return info.kind == "date"
+        # 没有日历标记的只读输入框无法直接填写，仍按ID模式判断
+        return bool(input_id) and (
+            "date" in input_id.lower() or "startdate" in input_id.lower() or "enddate" in input_id.lower() or
+            input_id.endswith("_startdate") or input_id.endswith("_enddate") or
+            "temp-startdate" in input_id or "temp-enddate" in input_id or
+            input_id == "formWF_YB6_3492_yc-chr_start1_0" or input_id == "formWF_YB6_3492_yc-chr_end1_0" or
+            "start" in input_id or "end" in input_id)
+    
+    async def fill_traveler_employee_ids(self, employee_fills: list):
+        """
+        填写出差人工号：等待每个工号的服务器查询返回，并确认姓名没有被查询结果清空或覆盖
+        TRAVELER_LOOKUP_CONCURRENCY大于1时多个工号同时查询（按请求中的工号区分响应）
+        
+        Args:
+            employee_fills: compile_traveler_block编译出的工号字段
+        """
+        concurrent = TRAVELER_LOOKUP_CONCURRENCY > 1 and len(employee_fills) > 1
+        semaphore = asyncio.Semaphore(max(1, TRAVELER_LOOKUP_CONCURRENCY))
+        
+        async def fill_one(entry: dict):
+            async with semaphore:
+                with self.step_tracer.span("traveler_employee", title=entry["field"], element_id=entry["input_id"]):
+                    lookup_done = await self.wait_for_employee_lookup(
+                        lambda: self.fill_input(entry["input_id"], entry["value"], title=entry["field"]),
+                        work_id=entry["value"] if concurrent else None)
+                    logger.info(f"填写{entry['field']}: {entry['value']}")
+                    annotate(lookup="response" if lookup_done else "timeout")
+                
+                    # 确认姓名没有被工号查询的JavaScript事件清空或覆盖
+                    name_input_id, name_value = entry["name_input_id"], entry["name_value"]
+                    if name_input_id and name_value:
+                        if lookup_done and await self.get_input_value(name_input_id) == name_value:
+                            logger.info(f"{entry['name_field']} 保持不变: {name_value}")
+                        else:
+                            await self.fill_input(name_input_id, name_value, title=entry["name_field"])
+                            logger.info(f"重新填写{entry['name_field']}: {name_value}")
+                            if not lookup_done:
+                                await traced_sleep(0.5)
+        
+        if concurrent:
+            await asyncio.gather(*(fill_one(entry) for entry in employee_fills))
+        else:
+            for entry in employee_fills:
+                await fill_one(entry)
     
     async def process_remaining_operations(self, group_data: pd.DataFrame):
         """
@@ -3368,6 +3652,7 @@ class LoginAutomation:
             row = rows[i]
             current_sequence = row.get(SEQUENCE_COL, None)
             logger.info(f"处理第 {i+1} 行数据的剩余操作，序号: {current_sequence}")
+            set_trace_context(row=i + 1)
             
             # 处理当前行的所有列
             col_idx = 0
@@ -3490,7 +3775,8 @@ class LoginAutomation:
                                 logger.info(f"找到金额列: {amount_col} = {amount_str}")
                                 
                                 # 填写金额到对应的输入框
-                                await self.fill_input(input_id, amount_str, title=amount_col)
+                                with self.step_tracer.span("subject_amount", title=amount_col, element_id=input_id):
+                                    await self.fill_input(input_id, amount_str, title=amount_col)
                                 logger.info(f"成功填写科目 '{subject_name}' 的金额: {amount_str}")
                                 
                                 # 跳过金额列，因为已经处理了
@@ -3579,6 +3865,84 @@ class LoginAutomation:
                 
                 i += 1
     
+    async def open_page(self, storage_state: Optional[Dict] = None):
+        """
+        新建浏览器上下文和页面，并注册往返计数、默认超时、元素变化通知、网络监控和内存监控
+        
+        Args:
+            storage_state: 沿用的登录状态（cookie和localStorage），为None时使用全新的上下文
+        """
+        context = await self.browser.new_context(storage_state=storage_state)
+        page = await context.new_page()
+        # CDP会话需要原始页面，在包装之前建立
+        await self.memory_monitor.attach(page)
+        if ROUNDTRIP_COUNTER_ENABLED:
+            # 之后通过self.page发起的每次Playwright调用都按操作和调用方法计数
+            page = self.roundtrip_counter.wrap(page)
+        # 设置页面默认超时时间为3秒
+        page.set_default_timeout(3000)
+        # 在打开页面之前注册元素变化通知，用于清除元素不存在缓存
+        await self.absence_cache.attach(page)
+        if NETWORK_MONITOR_ENABLED:
+            self.network_monitor.attach(page)
+        self.page = page
+    
+    async def check_memory(self, sequence_num):
+        """
+        一条记录处理完后采样内存，超过阈值时回收浏览器上下文
+        
+        Args:
+            sequence_num: 刚处理完的序号
+        """
+        sample = await self.memory_monitor.sample(self.page, sequence_num)
+        reason = self.memory_monitor.recycle_reason(sample)
+        if reason is None:
+            return
+        try:
+            await self.recycle_page()
+        except Exception as e:
+            # 不再尝试回收，避免之后每条记录都新建一次上下文
+            self.memory_monitor.recycle = False
+            logger.warning(f"回收浏览器上下文失败，继续使用当前页面，本次运行不再回收: {e}")
+            return
+        self.memory_monitor.record_recycle(sequence_num, reason)
+        logger.info(f"序号 {sequence_num} 之后回收浏览器上下文: {reason}")
+    
+    async def recycle_page(self):
+        """
+        换用新的浏览器上下文和页面：沿用当前的登录状态（cookie和localStorage），打开当前页面地址，
+        再把各个子frame（如navToPrj打开的mainFrame）加载回原来的地址，确认都已恢复后才关闭旧的上下文
+        
+        旧上下文中累积的frame、对话框和JS堆随之释放；按页面缓存的下拉框选项一并清除。
+        任何一步失败（包括子frame没有恢复）时关闭新的上下文，继续使用旧页面
+        """
+        old_page = self.page
+        url = old_page.url
+        # 主页面的直接子frame {frame名称: 地址}（报销单在mainFrame中，地址由页面脚本设置，主页面地址中没有）
+        child_frames = {frame.name: frame.url for frame in old_page.main_frame.child_frames
+                        if frame.name and frame.url not in ("", "about:blank")}
+        storage_state = await old_page.context.storage_state()
+        await self.open_page(storage_state=storage_state)
+        try:
+            await self.page.goto(url, timeout=10000)
+            for name, frame_url in child_frames.items():
+                frame = self.page.frame(name=name)
+                if frame is None:
+                    raise RuntimeError(f"新页面中没有frame {name}")
+                await frame.goto(frame_url, timeout=10000)
+            restored = {frame.name: frame.url for frame in self.page.main_frame.child_frames}
+            missing = [name for name, frame_url in child_frames.items() if restored.get(name) != frame_url]
+            if missing:
+                raise RuntimeError(f"子frame没有恢复到原来的地址: {missing}")
+        except Exception:
+            # 新页面没有恢复到原来的状态时继续使用旧页面
+            await self.page.context.close()
+            self.page = old_page
+            raise
+        await old_page.context.close()
+        self.select_options.clear()
+        await traced_sleep(PAGE_LOAD_WAIT)
+    
     async def run_automation(self, target_url: str = TARGET_URL):
         """
         运行自动化程序
@@ -3590,68 +3954,105 @@ class LoginAutomation:
             # 加载数据
             await self.load_data()
             
+            # 根据已记录的银行卡预检查卡号尾号
+            self.precheck_card_tails()
+            
+            # 预检查下拉框列的值
+            self.validate_dropdown_values()
+            
+            # 启动步骤追踪的后台写入线程
+            self.step_tracer.start()
+            self.profiler.start()
+            self.memory_monitor.start()
+            
             # 启动浏览器
+            startup_start = time.perf_counter()
             async with async_playwright() as p:
                 if BROWSER_TYPE == "chromium":
-                    self.browser = await p.chromium.launch(headless=HEADLESS)
+                    self.browser = await p.chromium.launch(headless=self.headless)
                 elif BROWSER_TYPE == "firefox":
-                    self.browser = await p.firefox.launch(headless=HEADLESS)
+                    self.browser = await p.firefox.launch(headless=self.headless)
                 elif BROWSER_TYPE == "webkit":
-                    self.browser = await p.webkit.launch(headless=HEADLESS)
+                    self.browser = await p.webkit.launch(headless=self.headless)
                 else:
                     raise ValueError(f"不支持的浏览器类型: {BROWSER_TYPE}")
                 
-                self.page = await self.browser.new_page()
-                # 设置页面默认超时时间为3秒
-                self.page.set_default_timeout(3000)
+                await self.open_page()
                 
                 # 导航到目标页面
                 await self.page.goto(target_url, timeout=10000)
-                logger.info(f"成功导航到页面: {target_url}")
+                self.startup_time = time.perf_counter() - startup_start
+                logger.info(f"成功导航到页面: {target_url} (启动耗时 {self.startup_time:.2f}秒)")
                 
                 # 等待页面加载
-                await asyncio.sleep(PAGE_LOAD_WAIT)
+                await traced_sleep(PAGE_LOAD_WAIT)
                 
                 # 按序号分组处理报销记录
                 grouped_data = self.reimbursement_data.groupby(SEQUENCE_COL)
                 
+                records_start = time.perf_counter()
                 for sequence_num, group_data in grouped_data:
                     logger.info(f"开始处理序号 {sequence_num} 的报销记录")
                     
                     # 处理子序列逻辑
-                    await self.process_sequence_with_subsequences(sequence_num, group_data)
+                    record_start = time.perf_counter()
+                    with self.roundtrip_counter.record(sequence_num), self.profiler.record(sequence_num):
+                        await self.process_sequence_with_subsequences(sequence_num, group_data)
+                    self.record_durations.append((sequence_num, time.perf_counter() - record_start))
+                    
+                    # 采样内存，超过阈值时换用新的浏览器上下文
+                    await self.check_memory(sequence_num)
                     
                     # 处理完一条记录后等待一下
-                    await asyncio.sleep(RECORD_PROCESS_WAIT)
+                    await traced_sleep(RECORD_PROCESS_WAIT)
+                self.records_wall_time = time.perf_counter() - records_start
                 
                 logger.info("所有报销记录处理完成")
-                
-                # 等待用户手动关闭浏览器
-                logger.info("=" * 50)
-                logger.info("所有操作已完成！")
-                logger.info("浏览器将保持打开状态，您可以手动关闭。")
-                logger.info("=" * 50)
-                
-                # 等待用户手动关闭浏览器
-                try:
-                    input("按回车键关闭浏览器...")
-                except KeyboardInterrupt:
-                    logger.info("用户中断程序")
-                finally:
-                    # 关闭浏览器
-                    if self.browser:
-                        await self.browser.close()
-                        logger.info("浏览器已关闭")
+                if self.unmatched_dropdown_values:
+                    logger.warning(f"以下下拉框值在页面选项中没有对应项，请核对报销信息: {self.unmatched_dropdown_values}")
+                logger.info(f"元素不存在缓存: 命中 {self.absence_cache.hits} 次, 页面变化清除 {self.absence_cache.invalidations} 次")
+                self.step_tracer.log_summary()
+                self.roundtrip_counter.log_report()
+                self.network_monitor.log_report()
+                self.memory_monitor.log_report()
+                log_overhead()
+                
+                if self.wait_for_close:
+                    # 等待用户手动关闭浏览器
+                    logger.info("=" * 50)
+                    logger.info("所有操作已完成！")
+                    logger.info("浏览器将保持打开状态，您可以手动关闭。")
+                    logger.info("=" * 50)
+                    
+                    try:
+                        input("按回车键关闭浏览器...")
+                    except KeyboardInterrupt:
+                        logger.info("用户中断程序")
+                
+                # 关闭浏览器
+                if self.browser:
+                    await self.browser.close()
+                    logger.info("浏览器已关闭")
 
         except Exception as e:
             logger.error(f"自动化程序运行失败: {e}")
             raise
         finally:
+            self.profiler.stop()
+            self.memory_monitor.stop()
+            self.strategy_memory.flush()
+            self.step_tracer.close()
             if self.browser:
                 await self.browser.close()
 
 async def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="电子科技大学财务系统自动报销")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"对整批记录做性能剖析，火焰图和Chrome trace写入 {PROFILE_OUTPUT_DIR}/")
+    args = parser.parse_args()
+    setup_logging()
+    
     # 检查文件是否存在
     if not os.path.exists(EXCEL_FILE):
         logger.error(f"报销信息文件不存在: {EXCEL_FILE}")
@@ -3662,7 +4063,7 @@ async def main():
         return
     
     # 创建自动化实例并运行
-    automation = LoginAutomation()
+    automation = LoginAutomation(profile=args.profile)
     await automation.run_automation()
 
 if __name__ == "__main__":
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内存增长监控
+每条报销记录处理完后采样一次：Python侧用tracemalloc记录已分配内存，并定期做快照比较增长最多的代码位置
+（tracemalloc会增加每次内存分配的开销，默认只在基准测试和性能剖析时开启）；
+浏览器侧通过CDP的Performance.getMetrics读取JS堆、DOM节点、文档和事件监听器数量（非Chromium浏览器退回
+performance.memory），同时记录页面的frame数量。采样写入步骤追踪文件，超过阈值时给出回收浏览器上下文的原因
+"""
+
+import time
+import tracemalloc
+import logging
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+
+# 非Chromium浏览器或CDP不可用时读取performance.memory（只有Chromium支持，其他浏览器返回null）
+_PERFORMANCE_MEMORY_JS = """
+() => performance.memory
+    ? {used: performance.memory.usedJSHeapSize, total: performance.memory.totalJSHeapSize}
+    : null
+"""
+
+
+@dataclass
+class MemorySample:
+    """一条记录处理完后的内存采样"""
+    label: str
+    frames: int
+    python_mb: Optional[float] = None  # 未开启tracemalloc时为None
+    python_peak_mb: Optional[float] = None
+    js_heap_used_mb: Optional[float] = None
+    js_heap_total_mb: Optional[float] = None
+    dom_nodes: Optional[int] = None
+    documents: Optional[int] = None
+    listeners: Optional[int] = None
+
+
+def _mb(value) -> Optional[float]:
+    return round(value / _MB, 1) if value is not None else None
+
+
+class MemoryMonitor:
+    """按记录采样Python和浏览器内存，判断是否需要回收浏览器上下文"""
+
+    def __init__(self, tracer=None, enabled: bool = None, recycle: bool = None, trace_python: bool = None):
+        """
+        Args:
+            tracer: 步骤追踪器（StepTracer），采样记录写入同一追踪文件
+            enabled: 是否采样，默认使用config.MEMORY_MONITOR_ENABLED
+            recycle: 超过阈值时是否回收，默认使用config.MEMORY_RECYCLE_ENABLED
+            trace_python: 是否用tracemalloc追踪Python内存，默认使用config.MEMORY_TRACEMALLOC_ENABLED
+        """
+        self.tracer = tracer
+        self.enabled = config.MEMORY_MONITOR_ENABLED if enabled is None else enabled
+        self.trace_python = config.MEMORY_TRACEMALLOC_ENABLED if trace_python is None else trace_python
+        self.recycle = config.MEMORY_RECYCLE_ENABLED if recycle is None else recycle
+        self.samples: List[MemorySample] = []
+        self.recycles: List[Dict] = []  # [{"label": 记录, "reason": 原因}]
+        self.records_since_recycle = 0
+        self._session = None
+        self._started_tracemalloc = False
+        self._snapshot = None
+
+    def start(self) -> None:
+        """开始tracemalloc追踪（已在追踪时沿用）"""
+        if not self.enabled or not self.trace_python or tracemalloc.is_tracing():
+            return
+        tracemalloc.start(config.MEMORY_TRACEMALLOC_FRAMES)
+        self._started_tracemalloc = True
+
+    def stop(self) -> None:
+        """停止由本监控开启的tracemalloc追踪"""
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        self._snapshot = None
+
+    async def attach(self, page) -> None:
+        """
+        为页面建立CDP会话（每个新页面调用一次）
+
+        Args:
+            page: Playwright页面（未经往返计数包装的原始页面，CDP会话需要原始对象）
+        """
+        self._session = None
+        self.records_since_recycle = 0
+        if not self.enabled:
+            return
+        try:
+            session = await page.context.new_cdp_session(page)
+            await session.send("Performance.enable")
+            self._session = session
+        except Exception as e:
+            logger.debug(f"无法建立CDP会话，浏览器内存改用performance.memory: {e}")
+
+    async def _browser_metrics(self, page) -> Dict:
+        if self._session is not None:
+            try:
+                result = await self._session.send("Performance.getMetrics")
+                metrics = {metric["name"]: metric["value"] for metric in result.get("metrics", [])}
+                return {
+                    "js_heap_used_mb": _mb(metrics.get("JSHeapUsedSize")),
+                    "js_heap_total_mb": _mb(metrics.get("JSHeapTotalSize")),
+                    "dom_nodes": int(metrics["Nodes"]) if "Nodes" in metrics else None,
+                    "documents": int(metrics["Documents"]) if "Documents" in metrics else None,
+                    "listeners": int(metrics["JSEventListeners"]) if "JSEventListeners" in metrics else None,
+                }
+            except Exception as e:
+                logger.debug(f"读取CDP内存指标失败: {e}")
+        try:
+            memory = await page.evaluate(_PERFORMANCE_MEMORY_JS)
+        except Exception as e:
+            logger.debug(f"读取performance.memory失败: {e}")
+            return {}
+        if not memory:
+            return {}
+        return {"js_heap_used_mb": _mb(memory["used"]), "js_heap_total_mb": _mb(memory["total"])}
+
+    async def sample(self, page, label) -> Optional[MemorySample]:
+        """
+        一条记录处理完后采样
+
+        Args:
+            page: 当前页面
+            label: 记录标签（如序号）
+        """
+        if not self.enabled:
+            return None
+        self.records_since_recycle += 1
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+        sample = MemorySample(label=str(label), frames=len(page.frames), python_mb=_mb(current),
+                              python_peak_mb=_mb(peak), **await self._browser_metrics(page))
+        self.samples.append(sample)
+        if self.tracer is not None:
+            self.tracer.emit({"kind": "memory", "time": round(time.time(), 3), **asdict(sample)})
+        logger.debug(f"记录 {sample.label} 内存: Python {sample.python_mb}MB, JS堆 {sample.js_heap_used_mb}MB, "
+                     f"DOM节点 {sample.dom_nodes}, frame {sample.frames}")
+        if config.MEMORY_SNAPSHOT_EVERY and len(self.samples) % config.MEMORY_SNAPSHOT_EVERY == 0:
+            self.log_snapshot_growth()
+        return sample
+
+    def recycle_reason(self, sample: Optional[MemorySample]) -> Optional[str]:
+        """超过阈值时返回回收原因，否则返回None"""
+        if not self.recycle or sample is None:
+            return None
+        checks = [
+            ("JS堆", sample.js_heap_used_mb, config.MEMORY_RECYCLE_JS_HEAP_MB, "MB"),
+            ("DOM节点", sample.dom_nodes, config.MEMORY_RECYCLE_DOM_NODES, ""),
+            ("frame数量", sample.frames, config.MEMORY_RECYCLE_FRAMES, ""),
+            ("Python内存", sample.python_mb, config.MEMORY_RECYCLE_PYTHON_MB, "MB"),
+            ("已处理记录", self.records_since_recycle, config.MEMORY_RECYCLE_EVERY_RECORDS, "条"),
+        ]
+        for name, value, limit, unit in checks:
+            if limit and value is not None and value >= limit:
+                return f"{name} {value}{unit} >= {limit}{unit}"
+        return None
+
+    def record_recycle(self, label, reason: str) -> None:
+        self.recycles.append({"label": str(label), "reason": reason})
+        if self.tracer is not None:
+            self.tracer.emit({"kind": "context_recycle", "time": round(time.time(), 3),
+                              "label": str(label), "reason": reason})
+
+    def log_snapshot_growth(self) -> None:
+        """与上一次tracemalloc快照比较，输出内存增长最多的代码位置"""
+        if not tracemalloc.is_tracing():
+            return
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        previous, self._snapshot = self._snapshot, snapshot
+        if previous is None:
+            return
+        stats = snapshot.compare_to(previous, "lineno")[:config.MEMORY_SNAPSHOT_TOP]
+        logger.info(f"最近 {config.MEMORY_SNAPSHOT_EVERY} 条记录内存增长最多的代码位置:")
+        for stat in stats:
+            frame = stat.traceback[0]
+            logger.info(f"  {frame.filename}:{frame.lineno}: {stat.size_diff / 1024:+.1f}KB "
+                        f"(共 {stat.size / 1024:.1f}KB, {stat.count_diff:+d} 个对象)")
+
+    def log_report(self) -> None:
+        """输出第一条和最后一条记录之间的内存增长、峰值和回收次数"""
+        if not self.samples:
+            return
+        first, last = self.samples[0], self.samples[-1]
+        python = (f"Python {first.python_mb}MB -> {last.python_mb}MB (峰值 {last.python_peak_mb}MB), "
+                  if last.python_mb is not None else "")
+        logger.info(f"内存: {python}frame {first.frames} -> {last.frames}")
+        heap = [sample.js_heap_used_mb for sample in self.samples if sample.js_heap_used_mb is not None]
+        if heap:
+            nodes = [sample.dom_nodes for sample in self.samples if sample.dom_nodes is not None]
+            logger.info(f"浏览器内存: JS堆 {heap[0]}MB -> {heap[-1]}MB (峰值 {max(heap)}MB)"
+                        + (f", DOM节点峰值 {max(nodes)}" if nodes else ""))
+        if self.recycles:
+            logger.info(f"浏览器上下文回收 {len(self.recycles)} 次:")
+            for recycle in self.recycles:
+                logger.info(f"  记录 {recycle['label']} 之后: {recycle['reason']}")
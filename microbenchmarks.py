@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+纯Python热点路径的微基准测试
+用合成报销信息（workload_generator.py）在1万~100万个单元格上单独计时每个单元格都会经过的函数，
+不启动浏览器，把Python自身的开销和浏览器时间分开跟踪：
+clean_value_string、process_cell的分派链、下拉框映射和ID模式判断、日期字段判断、卡号匹配、
+get_current_project_number（每次调用都按序号筛选整个DataFrame）以及process_subsequences中的
+iterrows/to_dict转换。每项测试先准备数据再重复计时，结果写入JSON文件，可与基线比较
+
+用法: python microbenchmarks.py [--cells 10000,100000,1000000] [--only clean_value_string,dispatch] [--baseline ...]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import platform
+import statistics
+import tempfile
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+import config
+from bank_cards import card_tail_matches
+from field_probe import FieldInfo, FieldTypeCache
+from login_automation import LoginAutomation
+from mock_portal import SELECT_FIELD_CONFIG, TRIP_FIELD_IDS, RESERVATION_DATE_ID, title_id_rows, mock_cards_for
+from step_trace import StepTracer
+from workload_generator import WorkloadGenerator, WorkloadShape
+
+logger = logging.getLogger(__name__)
+
+# 名称 -> 准备函数：接收单元格数量，返回 (计时的函数, 实际处理的单元格数)
+MICROBENCHMARKS: Dict[str, Callable[[int], Tuple[Callable[[], None], int]]] = {}
+
+# process_subsequences中由科目/金额配对或出差人信息块处理、不经过process_cell的列
+_NON_DISPATCH_COLUMNS = {"处理进度", config.SEQUENCE_COL, config.SUBSEQUENCE_START_COL, config.SUBSEQUENCE_END_COL,
+                         *config.TRAVELER_FIELDS.keys(),
+                         "省份", "出差地点", "起", "迄", "飞机票", "住宿费", "是否安排伙食", "是否安排交通"}
+
+
+def microbenchmark(name: str):
+    """注册一个微基准测试"""
+    def register(setup):
+        MICROBENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def workload_rows(cells: int, seed: int = 0) -> Tuple[List[Dict], List[str]]:
+    """生成至少包含cells个单元格（行数×列数）的合成报销信息"""
+    generator = WorkloadGenerator(WorkloadShape(records=0), seed=seed)
+    rows: List[Dict] = []
+    sequence = 0
+    while len(rows) * len(generator.columns) < cells:
+        sequence += 1
+        rows.extend(generator.generate_record(sequence))
+    return rows, generator.columns
+
+
+def workload_frame(cells: int, seed: int = 0) -> pd.DataFrame:
+    """合成报销信息的DataFrame（空单元格为NaN，与read_excel的结果一致）"""
+    rows, columns = workload_rows(cells, seed)
+    return pd.DataFrame([[row.get(column, float('nan')) for column in columns] for row in rows], columns=columns)
+
+
+def make_automation() -> LoginAutomation:
+    """
+    不连接浏览器的LoginAutomation：标题-ID映射使用模拟系统的元素ID，字段类型按模拟系统预先填入缓存，
+    关闭步骤追踪文件，页面操作（填写、点击、选择、查询等待）替换为空操作，只保留分派判断本身
+    """
+    automation = LoginAutomation()
+    automation.title_id_mapping = dict(title_id_rows())
+    automation.step_tracer = StepTracer(enabled=False)
+    automation.field_types = FieldTypeCache(cache_file=os.path.join(tempfile.gettempdir(), "microbench_field_types.json"))
+    date_ids = {TRIP_FIELD_IDS["起"], TRIP_FIELD_IDS["迄"], RESERVATION_DATE_ID}
+    for element_id in automation.title_id_mapping.values():
+        if element_id in SELECT_FIELD_CONFIG:
+            automation.field_types.fields[element_id] = FieldInfo(tag="select")
+        elif element_id in date_ids:
+            automation.field_types.fields[element_id] = FieldInfo(tag="input", readonly=True, datepicker=True)
+        else:
+            automation.field_types.fields[element_id] = FieldInfo(tag="input", input_type="text")
+
+    async def page_operation(*args, **kwargs):
+        return True
+
+    async def employee_lookup(action, *args, **kwargs):
+        await action()
+        return True
+
+    for method in ("fill_input", "click_button", "click_radio_button", "click_first_row_reservation_button",
+                   "click_navigation_panel", "select_dropdown", "select_date_from_calendar", "select_card_by_number",
+                   "handle_bank_card_selection_for_transfer", "press_enter_in_input", "click_print_button"):
+        setattr(automation, method, page_operation)
+    automation.wait_for_employee_lookup = employee_lookup
+    return automation
+
+
+@microbenchmark("clean_value_string")
+def bench_clean_value_string(cells: int):
+    automation = LoginAutomation()
+    samples = [123.0, 5130008, "  个人转卡 ", float('nan'), "", "$点击", -45.0, 12.5, "2025-08-17", "*1142"]
+    values = (samples * (cells // len(samples) + 1))[:cells]
+
+    def run():
+        clean = automation.clean_value_string
+        for value in values:
+            clean(value)
+    return run, len(values)
+
+
+@microbenchmark("dispatch")
+def bench_dispatch(cells: int):
+    """process_cell -> dispatch_cell的完整判断链（页面操作为空操作）"""
+    automation = make_automation()
+    rows, columns = workload_rows(cells)
+    dispatch_columns = [column for column in columns if column not in _NON_DISPATCH_COLUMNS
+                        and not column.startswith(("科目", "金额"))]
+    items = [(column, row[column]) for row in rows for column in dispatch_columns if row.get(column, "") != ""]
+    items = (items * (cells // max(len(items), 1) + 1))[:cells]
+    loop = asyncio.new_event_loop()
+
+    async def dispatch_all():
+        for title, value in items:
+            await automation.process_cell(title, value)
+
+    def run():
+        loop.run_until_complete(dispatch_all())
+    return run, len(items)
+
+
+@microbenchmark("dropdown_patterns")
+def bench_dropdown_patterns(cells: int):
+    """下拉框映射查找（精确匹配和全角/括号/空白归一化匹配）与下拉框ID模式判断"""
+    automation = LoginAutomation()
+    lookups = []
+    for name in ("省份地区", "人员类型", "支付方式", "安排状态"):
+        for text in config.DROPDOWN_FIELDS[name]:
+            lookups.append((name, text))
+            lookups.append((name, text.replace("（", "(").replace("）", ")") + " "))
+    ids = list(dict(title_id_rows()).items())
+    lookups = (lookups * (cells // (2 * len(lookups)) + 1))[:cells // 2]
+    id_checks = (ids * (cells // (2 * len(ids)) + 1))[:cells - len(lookups)]
+
+    def run():
+        for name, value in lookups:
+            automation.lookup_dropdown_mapping(name, value)
+        for title, element_id in id_checks:
+            automation.is_dropdown_field(title, element_id)
+    return run, len(lookups) + len(id_checks)
+
+
+@microbenchmark("date_heuristic")
+def bench_date_heuristic(cells: int):
+    """is_date_field_id：未探测到字段类型时按ID模式判断"""
+    automation = LoginAutomation()
+    automation.field_types = FieldTypeCache(cache_file=os.path.join(tempfile.gettempdir(), "microbench_empty.json"))
+    automation.field_types.fields = {}
+    ids = [element_id for _, element_id in title_id_rows()]
+    ids = (ids * (cells // len(ids) + 1))[:cells]
+
+    def run():
+        for element_id in ids:
+            automation.is_date_field_id(element_id)
+    return run, len(ids)
+
+
+@microbenchmark("match_card_number")
+def bench_match_card_number(cells: int):
+    """演示流程的match_card_number和银行卡弹窗使用的card_tail_matches"""
+    try:
+        from uestc_financial_demo import UESTCFinancialAutomation
+        match_card_number = UESTCFinancialAutomation.match_card_number
+    except Exception as e:
+        logger.warning(f"无法导入演示流程的match_card_number，只测试card_tail_matches: {e}")
+        match_card_number = None
+    pairs = []
+    for index in range(200):
+        for card in mock_cards_for(f"2020{index:06d}"):
+            masked = card["card_number"]
+            full = masked.replace("********", "12345678")
+            pairs.append((full, masked, masked[-4:]))
+            pairs.append((full[:-1] + "0", masked, "0000"))
+    pairs = (pairs * (cells // len(pairs) + 1))[:cells]
+    # match_card_number匹配成功时输出INFO日志，计时期间关闭演示模块的INFO日志
+    demo_logger = logging.getLogger("uestc_financial_demo")
+
+    def run():
+        level = demo_logger.level
+        demo_logger.setLevel(logging.WARNING)
+        try:
+            for full, masked, tail in pairs:
+                if match_card_number is not None:
+                    match_card_number(None, full, masked)
+                card_tail_matches(masked, tail)
+        finally:
+            demo_logger.setLevel(level)
+    return run, len(pairs)
+
+
+@microbenchmark("get_current_project_number")
+def bench_get_current_project_number(cells: int):
+    """未保存报销项目号时每条记录按序号筛选整个DataFrame"""
+    automation = LoginAutomation()
+    automation.reimbursement_data = workload_frame(cells)
+    sequences = automation.reimbursement_data[config.SEQUENCE_COL].unique().tolist()
+
+    def run():
+        automation.current_project_number = None
+        for sequence in sequences:
+            automation.current_sequence = sequence
+            automation.get_current_project_number()
+    return run, automation.reimbursement_data.size
+
+
+@microbenchmark("group_to_dict")
+def bench_group_to_dict(cells: int):
+    """按序号分组后每组to_dict('records')（process_subsequences）"""
+    frame = workload_frame(cells)
+
+    def run():
+        for _, group_data in frame.groupby(config.SEQUENCE_COL):
+            for row in group_data.to_dict('records'):
+                for column in group_data.columns:
+                    row[column]
+    return run, frame.size
+
+
+@microbenchmark("group_iterrows")
+def bench_group_iterrows(cells: int):
+    """按序号分组后每组iterrows逐行逐列读取（process_sequence_with_subsequences的出差人子序列检查）"""
+    frame = workload_frame(cells)
+
+    def run():
+        for _, group_data in frame.groupby(config.SEQUENCE_COL):
+            for _, row in group_data.iterrows():
+                for column in group_data.columns:
+                    row[column]
+    return run, frame.size
+
+
+def time_benchmark(name: str, cells: int, repeat: int) -> Dict:
+    """准备数据后重复计时，返回最快一次和中位数"""
+    run, processed = MICROBENCHMARKS[name](cells)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {
+        "cells": processed,
+        "repeat": repeat,
+        "best_seconds": round(best, 6),
+        "median_seconds": round(statistics.median(timings), 6),
+        "ns_per_cell": round(best / processed * 1e9, 1) if processed else 0.0,
+        "cells_per_second": round(processed / best) if best else 0,
+    }
+
+
+def compare_with_baseline(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """每个单元格耗时（最快一次）比基线慢超过容差的测试"""
+    regressions = []
+    previous_results = baseline.get("benchmarks", {})
+    for key, metrics in results["benchmarks"].items():
+        previous = previous_results.get(key, {}).get("ns_per_cell")
+        if not previous:
+            continue
+        change = (metrics["ns_per_cell"] - previous) / previous
+        if change > tolerance:
+            regressions.append(f"{key}: {previous} -> {metrics['ns_per_cell']} 纳秒/单元格 ({change:+.1%}，容差 {tolerance:.0%})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="纯Python热点路径的微基准测试（不启动浏览器）")
+    parser.add_argument("--cells", default=",".join(str(cells) for cells in config.MICROBENCH_CELLS),
+                        help="单元格数量，逗号分隔")
+    parser.add_argument("--only", default="", help=f"只运行指定的测试，逗号分隔（{', '.join(MICROBENCHMARKS)}）")
+    parser.add_argument("--repeat", type=int, default=config.MICROBENCH_REPEAT, help="每项测试的计时次数")
+    parser.add_argument("--output", default=config.MICROBENCH_RESULTS_FILE, help="结果文件")
+    parser.add_argument("--baseline", default=None, help="基线结果文件（指定时比较，退化超过容差返回非零状态）")
+    parser.add_argument("--tolerance", type=float, default=config.BENCHMARK_TOLERANCE, help="允许的退化比例")
+    args = parser.parse_args()
+
+    # 被测函数内部的日志不输出（只计入日志级别判断的开销），如卡号尾号列没有ID映射时每个单元格的警告
+    logging.basicConfig(level=logging.WARNING, format=config.LOG_FORMAT)
+    logging.getLogger("login_automation").setLevel(logging.ERROR)
+    logger.setLevel(logging.INFO)
+    names = [name.strip() for name in args.only.split(",") if name.strip()] or list(MICROBENCHMARKS)
+    unknown = [name for name in names if name not in MICROBENCHMARKS]
+    if unknown:
+        parser.error(f"未知的测试: {unknown}")
+
+    results = {
+        "created": datetime.now().isoformat(timespec='seconds'),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "benchmarks": {},
+    }
+    for cells in [int(cells) for cells in args.cells.split(",") if cells.strip()]:
+        for name in names:
+            metrics = time_benchmark(name, cells, args.repeat)
+            results["benchmarks"][f"{name}/{cells}"] = metrics
+            logger.info(f"{name}/{cells}: {metrics['ns_per_cell']} 纳秒/单元格, "
+                        f"{metrics['cells_per_second']} 单元格/秒 (最快 {metrics['best_seconds']}秒, "
+                        f"中位数 {metrics['median_seconds']}秒)")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    logger.info(f"微基准测试结果已写入: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            logger.error("微基准测试发现退化:")
+            for regression in regressions:
+                logger.error(f"  {regression}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
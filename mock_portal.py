@@ -0,0 +1,1171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟财务系统
+用标准库http.server在本机模拟 https://cwcx.uestc.edu.cn/WFManager/home.jsp 中自动化程序依赖的页面结构：
+登录表单和验证码、div.syslink导览框、嵌套的main2.jsp iframe（以及about:blank的同级iframe）、
+button[btnname]按钮、报销科目.txt中的jqGrid科目表、jQuery UI日历控件、#paybankdiv银行卡选择弹窗、
+预约表格和BtnPrint/ybprint打印确认单。每个页面和接口请求的服务器延迟可以配置，
+LoginAutomation的完整流程可以在没有网络的情况下运行（用于离线基准测试）
+
+用法: python mock_portal.py [--port 8765] [--latency 150] [--jitter 50]
+启动后把输出的地址作为target_url传给run_automation（或改config.TARGET_URL），验证码为config.MOCK_PORTAL_CAPTCHA
+"""
+
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import logging
+import secrets
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import config
+
+logger = logging.getLogger(__name__)
+
+BASE_PATH = "/WFManager"
+SUBJECT_GRID_FILE = "报销科目.txt"
+SUBJECT_GRID_ID = "gridWF_YB6_2375"
+
+# 基本信息页的字段（标题 -> ID，与标题-ID.xlsx一致）
+BASIC_FIELD_IDS = {
+    "报销项目号": "formWF_YB6_230_yta-uni_prj_code",
+    "附件张数": "formWF_YB6_230_yta-addition",
+    "支付方式": "formWF_YB6_230_yta-pay_type",
+    "备注": "formWF_YB6_230_yta-remark",
+    "特殊事项说明": "formWF_YB6_230_yta-tsremark",
+}
+
+# 出差人信息表（最多6人），字段 -> ID前缀，实际ID为 前缀_出差人序号，标题为 字段-出差人序号
+MAX_TRAVELERS = 6
+TRAVELER_FIELD_PREFIXES = {
+    "姓名": "formWF_YB6_3492_yc-chr_xm",
+    "工号": "formWF_YB6_3492_yc-chr_gh",
+    "人员类型": "formWF_YB6_3492_yc-chr_zc",
+    "单位": "formWF_YB6_3492_yc-chr_dw",
+    "职称": "formWF_YB6_3492_yc-chr_zw",
+}
+
+# 行程信息（只有一组，标题后缀固定为-0）
+TRIP_FIELD_IDS = {
+    "省份": "formWF_YB6_3492_yc-chr_sf_0",
+    "出差地点": "formWF_YB6_3492_yc-chr_ccdd_0",
+    "起": "formWF_YB6_3492_yc-chr_start1_0",
+    "迄": "formWF_YB6_3492_yc-chr_end1_0",
+    "飞机票": "formWF_YB6_3492_yc-chr_fj_0",
+    "住宿费": "formWF_YB6_3492_yc-chr_zs_0",
+    "是否安排伙食": "formWF_YB6_3492_yc-chr_hsf_0",
+    "是否安排交通": "formWF_YB6_3492_yc-chr_jtf_0",
+}
+
+# 转卡信息页
+TRANSFER_FIELD_IDS = {
+    "转卡信息工号": "formWF_YB6_3950_ypt-sno",
+    "个人金额": "formWF_YB6_3950_ypt-amount",
+}
+TRANSFER_NAME_ID = "formWF_YB6_3950_ypt-name"
+TRANSFER_BANK_ID = "formWF_YB6_3950_ypt-bankacnt"
+
+# 预约页
+RESERVATION_DATE_ID = "formWF_YB6_2178_temp-startdate"
+CAMPUS_RADIO_NAME = "formWF_YB6_2178_temp-school_area"
+CAMPUSES = ["清水河校区", "沙河校区"]
+
+# 下拉框ID -> DROPDOWN_FIELDS中的配置名
+SELECT_FIELD_CONFIG = {
+    BASIC_FIELD_IDS["支付方式"]: "支付方式",
+    TRIP_FIELD_IDS["省份"]: "省份地区",
+    TRIP_FIELD_IDS["是否安排伙食"]: "安排状态",
+    TRIP_FIELD_IDS["是否安排交通"]: "交通费",
+    **{f"{TRAVELER_FIELD_PREFIXES['人员类型']}_{i}": "人员类型" for i in range(MAX_TRAVELERS)},
+}
+
+# 报销科目.txt不存在时使用的科目（行ID, 科目名称）
+_FALLBACK_SUBJECTS = [
+    ("B0103KY58020102", "资料信息费"),
+    ("B0201KY58020102", "办公用品费"),
+    ("B0601KY58020102", "电费"),
+    ("B1001KY58020102", "邮寄费"),
+    ("B1601KY58020102", "印刷费"),
+    ("B2201KY58020102", "差旅费"),
+]
+
+# jqGrid中的末级科目行：行ID和科目名称
+_SUBJECT_ROW_PATTERN = re.compile(
+    r'<tr role="row" id="([^"]+)"[^>]*>(?:(?!</tr>).)*?<span class="cell-wrapperleaf">([^<]+)</span>', re.S)
+
+# 工号查询返回的人员信息（按工号确定性生成，多次运行结果一致）
+_SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何林罗高"
+_GIVEN_NAMES = ["伟", "芳", "娜", "敏", "静", "磊", "洋", "勇", "艳", "杰", "涛", "明", "超", "霞", "平", "刚",
+                "桂英", "建华", "晓东", "海燕"]
+_DEPARTMENTS = ["计算机科学与工程学院", "信息与通信工程学院", "电子科学与工程学院", "数学科学学院", "物理学院",
+                "自动化工程学院"]
+_TITLES = ["教授", "副教授", "讲师", "研究员", "工程师", "博士研究生"]
+_BANKS = [("6217", "中国建设银行", "105651000014"), ("6222", "中国工商银行", "102651020018"),
+          ("6228", "中国农业银行", "103651000015")]
+_CARD_TYPES = ["借记卡", "公务卡"]
+# 报销信息.xlsx示例中使用的工号和卡号尾号
+KNOWN_CARD_TAILS = {"5130008": ["1142"], "202422090507": ["5054"]}
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.md5(text.encode('utf-8')).digest()
+
+
+def mock_person_for(sno: str) -> Dict:
+    """工号对应的模拟人员信息（姓名、单位、职称）"""
+    d = _digest(f"person:{sno}")
+    return {
+        "sno": sno,
+        "name": _SURNAMES[d[0] % len(_SURNAMES)] + _GIVEN_NAMES[d[1] % len(_GIVEN_NAMES)],
+        "dept": _DEPARTMENTS[d[2] % len(_DEPARTMENTS)],
+        "title": _TITLES[d[3] % len(_TITLES)],
+    }
+
+
+def mock_cards_for(sno: str) -> List[Dict]:
+    """工号对应的模拟银行卡（2~3张，卡号为掩码格式，尾号互不相同）"""
+    d = _digest(f"cards:{sno}")
+    count = 2 + d[0] % 2
+    tails = list(KNOWN_CARD_TAILS.get(sno, []))
+    offset = 1
+    while len(tails) < count and offset < 8:
+        tail = f"{int.from_bytes(d[offset:offset + 2], 'big') % 10000:04d}"
+        offset += 2
+        if tail not in tails:
+            tails.append(tail)
+    name = mock_person_for(sno)["name"]
+    cards = []
+    for index, tail in enumerate(tails):
+        prefix, bank, bank_code = _BANKS[d[8 + index] % len(_BANKS)]
+        cards.append({
+            "name": name,
+            "card_number": f"{prefix}********{tail}",
+            "card_type": _CARD_TYPES[d[12 + index] % len(_CARD_TYPES)],
+            "bank": bank,
+            "bank_code": bank_code,
+        })
+    return cards
+
+
+def _grid_row(row_id: str, name: str) -> str:
+    return (f'<tr role="row" id="{row_id}" tabindex="-1" class="ui-widget-content jqgrow ui-row-ltr">'
+            f'<td role="gridcell"><span class="cell-wrapperleaf">{name}</span></td>'
+            f'<td role="gridcell"><input type="text" value="" class="qinput" cname="t.value" '
+            f'id="input_t_value_{row_id}"></td></tr>')
+
+
+def load_subject_grid(subject_file: str = SUBJECT_GRID_FILE) -> Tuple[str, List[Tuple[str, str]]]:
+    """
+    读取jqGrid科目表
+
+    Args:
+        subject_file: 从真实页面保存的科目表tbody（报销科目.txt），不存在时使用内置的少量科目
+
+    Returns:
+        (tbody的HTML, [(科目名称, 行ID)])，科目只包含末级科目，金额输入框ID为 input_t_value_行ID
+    """
+    if subject_file and os.path.exists(subject_file):
+        with open(subject_file, 'r', encoding='utf-8') as f:
+            html = f.read()
+        subjects = [(name.strip(), row_id) for row_id, name in _SUBJECT_ROW_PATTERN.findall(html)]
+        if subjects:
+            return html, subjects
+        logger.warning(f"{subject_file} 中没有找到科目行，使用内置科目")
+    html = "<tbody>" + "".join(_grid_row(row_id, name) for row_id, name in _FALLBACK_SUBJECTS) + "</tbody>"
+    return html, [(name, row_id) for row_id, name in _FALLBACK_SUBJECTS]
+
+
+def title_id_rows(subjects: Optional[List[Tuple[str, str]]] = None) -> List[Tuple[str, str]]:
+    """
+    模拟系统对应的标题-ID映射（可直接写入标题-ID.xlsx）
+
+    Args:
+        subjects: [(科目名称, 行ID)]，默认读取报销科目.txt
+
+    Returns:
+        [(标题, ID)]
+    """
+    if subjects is None:
+        subjects = load_subject_grid()[1]
+    rows = [
+        ("登录界面工号", "uid"),
+        ("登录界面密码", "pwd"),
+        ("登录按钮", "zhLogin"),
+        ("网上预约报账按钮", "navToPrj('WF_YB6')"),
+        ("申请报销单按钮", "申请报销单"),
+        ("已阅读并同意按钮", "已阅读并同意"),
+    ]
+    rows += list(BASIC_FIELD_IDS.items())
+    rows += [("下一步按钮1", "下一步"), ("下一步按钮2", "下一步"), ("下一步按钮3", "下一步")]
+    rows += [(name, f"input_t_value_{row_id}") for name, row_id in subjects]
+    rows += list(TRANSFER_FIELD_IDS.items())
+    rows += [("提交按钮", "提交"), ("日期", RESERVATION_DATE_ID)]
+    rows += [(campus, campus) for campus in CAMPUSES]
+    rows += [("打印确认单按钮", "BtnPrint"), ("返回按钮", "返回")]
+    for index in range(MAX_TRAVELERS):
+        rows += [(f"{field}-{index}", f"{prefix}_{index}") for field, prefix in TRAVELER_FIELD_PREFIXES.items()]
+    rows += [(f"{title}-0", element_id) for title, element_id in TRIP_FIELD_IDS.items()]
+    return rows
+
+
+# 登录页：登录表单（含验证码），登录后显示系统导览框；main2.jsp在mainFrame中打开
+_HOME_HTML = r"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>电子科技大学财务综合信息门户</title>
+<style>
+body { font-family: sans-serif; margin: 0; }
+#loginPanel { width: 320px; margin: 40px auto; padding: 16px; border: 1px solid #ccc; }
+#loginPanel input { width: 200px; margin: 4px 0; }
+.syslinks { display: flex; gap: 12px; padding: 12px; }
+.syslink { border: 1px solid #9bc; background: #eef6fb; padding: 16px; cursor: pointer; }
+#mainFrame { width: 100%; height: 900px; border: 0; }
+</style>
+<script>
+window.loggedIn = false;
+function val(id) {
+    return document.getElementById(id).value;
+}
+function doLogin() {
+    var body = { uid: val('uid'), pwd: val('pwd'), captcha: val('captcha') };
+    fetch('login.do', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(body) })
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+            if (!data.ok) {
+                document.getElementById('loginMsg').textContent = data.msg;
+                document.getElementById('captchaImg').src = 'captcha.svg?t=' + Date.now();
+                return;
+            }
+            window.loggedIn = true;
+            document.getElementById('loginPanel').remove();
+            document.getElementById('userInfo').textContent = data.name + '（' + data.uid + '）';
+            document.getElementById('sysPanel').style.display = 'block';
+        });
+}
+function navToPrj(code) {
+    if (!window.loggedIn) {
+        return;
+    }
+    document.getElementById('mainFrame').src = 'main2.jsp?sso=y&prj=' + encodeURIComponent(code) + '&context=__CONTEXT__';
+}
+</script>
+</head>
+<body>
+<div id="loginPanel">
+    <h3>统一身份认证登录</h3>
+    <div>工号 <input type="text" id="uid" name="uid"></div>
+    <div>密码 <input type="password" id="pwd" name="pwd"></div>
+    <div>验证码 <input type="text" id="captcha" name="captcha" placeholder="验证码" style="width:100px">
+        <img id="captchaImg" src="captcha.svg" alt="验证码"></div>
+    <div id="loginMsg" style="color:red"></div>
+    <button type="button" id="zhLogin" onclick="doLogin()">登录</button>
+</div>
+<div id="sysPanel" style="display:none">
+    <div class="sysbar">欢迎 <span id="userInfo"></span></div>
+    <div class="syslinks">
+        <div class="syslink" onclick="navToPrj('WF_CX1')" title="财务查询"><span>财务查询</span></div>
+        <div class="syslink" onclick="navToPrj('WF_YB6')" title="网上预约报账"><span>网上预约报账</span></div>
+        <div class="syslink" onclick="navToPrj('WF_GZ2')" title="薪酬查询"><span>薪酬查询</span></div>
+    </div>
+</div>
+<iframe name="hideFrame" src="about:blank" style="display:none"></iframe>
+<iframe name="printFrame" src="about:blank" style="display:none"></iframe>
+<iframe id="mainFrame" name="mainFrame" src="about:blank"></iframe>
+</body>
+</html>
+"""
+
+# 未模拟的项目
+_UNAVAILABLE_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>提示</title></head>
+<body><p>该项目暂未开放</p></body></html>
+"""
+
+# 网上预约报账页面：按步骤只显示当前步骤的内容，切换步骤时请求服务器（step.do）
+_MAIN_HTML = r"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>网上预约报账</title>
+<style>
+body { font-family: sans-serif; font-size: 13px; }
+.wf-form th { text-align: right; font-weight: normal; padding-right: 6px; }
+.wf-grid { border-collapse: collapse; margin: 8px 0; }
+.wf-grid th, .wf-grid td { border: 1px solid #ccc; padding: 2px 4px; }
+.wf-button { margin: 8px 8px 8px 0; }
+.wf-message { color: red; }
+.wf-radios { list-style: none; padding: 0; margin: 0; }
+.ui-widget-overlay { position: fixed; top: 0; left: 0; width: 100%; height: 100%; background: rgba(0, 0, 0, 0.3); }
+.ui-dialog { position: absolute; top: 80px; left: 120px; width: 640px; background: #fff; border: 1px solid #999; }
+.ui-dialog-titlebar { background: #5c9ccc; color: #fff; padding: 4px 8px; }
+.ui-dialog-buttonpane { text-align: right; padding: 6px; }
+#ui-datepicker-div { background: #fff; border: 1px solid #999; padding: 4px; }
+#ui-datepicker-div td a { display: block; padding: 2px 4px; text-align: right; }
+</style>
+<script src="js/jquery.mock.js"></script>
+<script>window.MOCK_CONFIG = __CONFIG__;</script>
+</head>
+<body>
+<div id="wfMessage" class="wf-message"></div>
+<div id="wfContainer"></div>
+<script>
+(function () {
+    var CONFIG = window.MOCK_CONFIG;
+    var container = document.getElementById('wfContainer');
+    var lookupTimers = {};
+    var state = newState();
+
+    function newState() {
+        return { step: 0, fields: {}, transfers: [], pickedCard: null, reservation: null, printed: false };
+    }
+
+    function escapeHtml(text) {
+        return String(text === undefined || text === null ? '' : text).replace(/&/g, '&amp;')
+            .replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;').replace(/'/g, '&#39;');
+    }
+
+    function value(id) {
+        var el = document.getElementById(id);
+        return el ? el.value.trim() : '';
+    }
+
+    function message(text) {
+        document.getElementById('wfMessage').textContent = text || '';
+    }
+
+    // 与页面中的jQuery.ajax一样使用XMLHttpRequest
+    function request(method, url, body) {
+        return new Promise(function (resolve, reject) {
+            var xhr = new XMLHttpRequest();
+            xhr.open(method, url);
+            xhr.setRequestHeader('Content-Type', 'application/json');
+            xhr.onload = function () {
+                var type = xhr.getResponseHeader('Content-Type') || '';
+                resolve(type.indexOf('json') >= 0 ? JSON.parse(xhr.responseText) : xhr.responseText);
+            };
+            xhr.onerror = reject;
+            xhr.send(body === undefined ? null : JSON.stringify(body));
+        });
+    }
+
+    function button(name, handler) {
+        return '<button type="button" class="ui-button wf-button" btnname="' + name + '" guid="wfbtn_' + name
+            + '" onclick="' + handler + '">' + name + '</button>';
+    }
+
+    function field(kind, id) {
+        if (kind === 'select') {
+            var html = '<select id="' + id + '" name="' + id + '"><option value="">&lt;请选择&gt;</option>';
+            (CONFIG.selects[id] || []).forEach(function (option) {
+                html += '<option value="' + escapeHtml(option[0]) + '">' + escapeHtml(option[1]) + '</option>';
+            });
+            return html + '</select>';
+        }
+        if (kind === 'textarea') {
+            return '<textarea id="' + id + '" name="' + id + '" rows="2"></textarea>';
+        }
+        var extra = kind === 'date' ? ' readonly="readonly" class="wf-date"' : '';
+        return '<input type="text" id="' + id + '" name="' + id + '"' + extra + '>';
+    }
+
+    function formTable(rows) {
+        return '<table class="wf-form">' + rows.map(function (row) {
+            return '<tr><th>' + row[0] + '</th><td>' + field(row[2], row[1]) + '</td></tr>';
+        }).join('') + '</table>';
+    }
+
+    function renderStart() {
+        return '<h3>网上预约报账</h3><p>请选择要办理的业务</p>' + button('申请报销单', 'wf.next()');
+    }
+
+    function renderNotice() {
+        return '<h3>报销须知</h3><div class="wf-notice">报销前请确认票据齐全、金额无误，预约后按时到所选校区投递。</div>'
+            + button('已阅读并同意', 'wf.next()');
+    }
+
+    function renderBasic() {
+        var html = '<h3>基本信息</h3>' + formTable(CONFIG.basic) + '<h4>出差人信息</h4>'
+            + '<table class="wf-grid" id="travelerTable"><thead><tr><th>序号</th>';
+        CONFIG.traveler.forEach(function (column) {
+            html += '<th>' + column[0] + '</th>';
+        });
+        html += '</tr></thead><tbody>';
+        for (var i = 0; i < CONFIG.max_travelers; i++) {
+            html += '<tr><td>' + (i + 1) + '</td>';
+            CONFIG.traveler.forEach(function (column) {
+                html += '<td>' + field(column[2], column[1] + '_' + i) + '</td>';
+            });
+            html += '</tr>';
+        }
+        return html + '</tbody></table><h4>行程信息</h4>' + formTable(CONFIG.trip) + button('下一步', 'wf.next()');
+    }
+
+    function renderSubjects() {
+        return '<h3>报销科目</h3><div class="ui-jqgrid ui-widget" id="gbox_' + CONFIG.grid_id + '">'
+            + '<table id="' + CONFIG.grid_id + '" class="ui-jqgrid-btable" role="presentation">'
+            + '<tbody><tr><td>正在加载...</td></tr></tbody></table></div>' + button('下一步', 'wf.next()');
+    }
+
+    function transferRows() {
+        return state.transfers.map(function (entry) {
+            return '<tr><td>' + escapeHtml(entry.sno) + '</td><td>' + escapeHtml(entry.name) + '</td><td>'
+                + escapeHtml(entry.card) + '</td><td>' + escapeHtml(entry.amount) + '</td></tr>';
+        }).join('');
+    }
+
+    function renderTransfer() {
+        var t = CONFIG.transfer;
+        return '<h3>转卡信息</h3><table class="wf-form">'
+            + '<tr><th>工号</th><td>' + field('input', t.sno) + '</td><th>姓名</th><td><span id="' + t.name + '"></span></td></tr>'
+            + '<tr><th>银行卡号</th><td><input type="text" id="' + t.bank + '" name="' + t.bank + '" readonly="readonly"></td>'
+            + '<th>金额</th><td>' + field('input', t.amount) + '</td></tr></table>'
+            + button('提交', 'wf.addTransfer()')
+            + '<table class="wf-grid" id="transferList"><thead><tr><th>工号</th><th>姓名</th><th>卡号</th><th>金额</th></tr></thead>'
+            + '<tbody>' + transferRows() + '</tbody></table>' + button('下一步', 'wf.next()');
+    }
+
+    function renderReservation() {
+        var campuses = CONFIG.campuses.map(function (campus) {
+            return '<li><label><input type="radio" name="' + CONFIG.campus_name + '" id="' + campus + '" value="'
+                + campus + '"><span>' + campus + '</span></label></li>';
+        }).join('');
+        return '<h3>预约报账</h3><table class="wf-form"><tr><th>预约日期</th><td>' + field('date', CONFIG.reservation_date)
+            + '</td></tr><tr><th>校区</th><td><ul class="wf-radios">' + campuses + '</ul></td></tr></table>'
+            + '<table class="wf-grid" id="slotTable"><thead><tr><th>日期</th><th>时间段</th><th>剩余</th><th>操作</th></tr></thead>'
+            + '<tbody id="slotBody"></tbody></table><div id="reserveResult"></div>' + button('返回', 'wf.back()');
+    }
+
+    var steps = [renderStart, renderNotice, renderBasic, renderSubjects, renderTransfer, renderReservation];
+
+    function render() {
+        container.innerHTML = steps[state.step]();
+        bind();
+        if (steps[state.step] === renderSubjects) {
+            request('GET', 'getkm.do?prj=' + encodeURIComponent(state.fields[CONFIG.project_id] || '')).then(function (html) {
+                var table = document.getElementById(CONFIG.grid_id);
+                if (table) {
+                    table.innerHTML = html;
+                }
+            });
+        }
+    }
+
+    function bind() {
+        $('.wf-date').datepicker({ dateFormat: 'yy-mm-dd', changeYear: true, changeMonth: true });
+        for (var i = 0; i < CONFIG.max_travelers; i++) {
+            var sno = document.getElementById(CONFIG.traveler_ids.sno + '_' + i);
+            if (sno) {
+                sno.addEventListener('input', scheduleTravelerLookup.bind(null, i));
+            }
+        }
+        var transferSno = document.getElementById(CONFIG.transfer.sno);
+        if (transferSno) {
+            transferSno.addEventListener('keydown', function (event) {
+                if (event.key === 'Enter') {
+                    lookupTransfer(transferSno.value.trim());
+                }
+            });
+        }
+        if (steps[state.step] === renderReservation) {
+            document.getElementById(CONFIG.reservation_date).addEventListener('change', loadSlots);
+            Array.prototype.forEach.call(container.querySelectorAll('input[name="' + CONFIG.campus_name + '"]'), function (radio) {
+                radio.addEventListener('change', loadSlots);
+            });
+        }
+    }
+
+    function collectFields() {
+        Array.prototype.forEach.call(container.querySelectorAll('input[id], select[id], textarea[id]'), function (el) {
+            if (el.type !== 'radio' && el.type !== 'button' && el.value !== '') {
+                state.fields[el.id] = el.value;
+            }
+        });
+    }
+
+    // 出差人工号：输入后查询人员信息，姓名使用服务器返回的值，单位和职称只在为空时填写
+    function scheduleTravelerLookup(index) {
+        clearTimeout(lookupTimers[index]);
+        lookupTimers[index] = setTimeout(function () { lookupTraveler(index); }, 300);
+    }
+
+    function lookupTraveler(index) {
+        var ids = CONFIG.traveler_ids;
+        var sno = value(ids.sno + '_' + index);
+        if (!sno) {
+            return;
+        }
+        request('GET', 'getuser.do?sno=' + encodeURIComponent(sno) + '&row=' + index).then(function (person) {
+            var name = document.getElementById(ids.name + '_' + index);
+            var dept = document.getElementById(ids.dept + '_' + index);
+            var title = document.getElementById(ids.title + '_' + index);
+            if (name) {
+                name.value = person.name;
+            }
+            if (dept && !dept.value) {
+                dept.value = person.dept;
+            }
+            if (title && !title.value) {
+                title.value = person.title;
+            }
+        });
+    }
+
+    // 转卡信息工号：回车后查询，弹出银行卡选择对话框
+    function lookupTransfer(sno) {
+        if (!sno) {
+            return;
+        }
+        request('GET', 'getuser.do?sno=' + encodeURIComponent(sno)).then(function (person) {
+            document.getElementById(CONFIG.transfer.name).textContent = person.name;
+            showBankDialog(person);
+        });
+    }
+
+    function showBankDialog(person) {
+        closeBankDialog();
+        state.pickedCard = null;
+        var rows = person.cards.map(function (card, index) {
+            return '<tr><td><input type="radio" name="rdoacnt" id="rdoacnt_' + index + '" value="' + index
+                + '" onclick="wf.pickCard(\'' + card.card_number + '\')"></td><td>' + escapeHtml(card.name) + '</td><td>'
+                + card.card_number + '</td><td>' + card.card_type + '</td><td>' + card.bank_code + '</td></tr>';
+        }).join('');
+        var overlay = document.createElement('div');
+        overlay.id = 'paybankoverlay';
+        overlay.className = 'ui-widget-overlay ui-front';
+        var dialog = document.createElement('div');
+        dialog.id = 'paybankdialog';
+        dialog.className = 'ui-dialog ui-widget ui-widget-content ui-corner-all ui-front';
+        dialog.setAttribute('role', 'dialog');
+        dialog.setAttribute('aria-describedby', 'paybankdiv');
+        dialog.innerHTML = '<div class="ui-dialog-titlebar ui-widget-header ui-corner-all"><span class="ui-dialog-title">请选择卡号</span></div>'
+            + '<div id="paybankdiv" class="ui-dialog-content ui-widget-content">'
+            + '<table style="background-color:#F2FAFD" width="100%"><thead><tr><th></th><th>姓名</th><th>卡号</th><th>卡类型</th><th>联行号</th></tr></thead>'
+            + '<tbody>' + rows + '</tbody></table></div>'
+            + '<div class="ui-dialog-buttonpane ui-widget-content"><div class="ui-dialog-buttonset">'
+            + '<button type="button" class="ui-button ui-widget ui-state-default ui-corner-all" role="button" onclick="wf.confirmCard()">确定</button>'
+            + '</div></div>';
+        document.body.appendChild(overlay);
+        document.body.appendChild(dialog);
+    }
+
+    function closeBankDialog() {
+        ['paybankoverlay', 'paybankdialog'].forEach(function (id) {
+            var el = document.getElementById(id);
+            if (el) {
+                el.remove();
+            }
+        });
+    }
+
+    function loadSlots() {
+        var checked = container.querySelector('input[name="' + CONFIG.campus_name + '"]:checked');
+        if (!checked) {
+            return;
+        }
+        var url = 'getslots.do?date=' + encodeURIComponent(value(CONFIG.reservation_date)) + '&campus=' + encodeURIComponent(checked.value);
+        request('GET', url).then(function (slots) {
+            document.getElementById('slotBody').innerHTML = slots.map(function (slot) {
+                return '<tr id="' + slot.id + '"><td>' + slot.date + '</td><td>' + slot.time + '</td><td>' + slot.remain
+                    + '</td><td>' + button('预约', 'wf.reserve(\'' + slot.id + '\')') + '</td></tr>';
+            }).join('');
+        });
+    }
+
+    window.ybprint = function (number) {
+        request('GET', 'ybprint.do?no=' + encodeURIComponent(number)).then(function (html) {
+            document.getElementById('ybprintDiv').innerHTML = html;
+            state.printed = true;
+        });
+    };
+
+    window.wf = {
+        next: function () {
+            collectFields();
+            var target = state.step + 1;
+            request('POST', 'step.do', { step: target }).then(function () {
+                message('');
+                state.step = target;
+                render();
+            });
+        },
+        addTransfer: function () {
+            var t = CONFIG.transfer;
+            var entry = { sno: value(t.sno), name: document.getElementById(t.name).textContent, card: value(t.bank), amount: value(t.amount) };
+            if (!entry.sno || !entry.card || !entry.amount) {
+                message('请填写工号、选择银行卡并填写金额');
+                return;
+            }
+            request('POST', 'step.do', { step: state.step, transfer: entry }).then(function () {
+                message('');
+                state.transfers.push(entry);
+                render();
+            });
+        },
+        pickCard: function (cardNumber) {
+            state.pickedCard = cardNumber;
+        },
+        confirmCard: function () {
+            if (!state.pickedCard) {
+                message('请选择卡号');
+                return;
+            }
+            document.getElementById(CONFIG.transfer.bank).value = state.pickedCard;
+            closeBankDialog();
+        },
+        reserve: function (slotId) {
+            var checked = container.querySelector('input[name="' + CONFIG.campus_name + '"]:checked');
+            var body = { slot: slotId, date: value(CONFIG.reservation_date), campus: checked ? checked.value : '',
+                project: state.fields[CONFIG.project_id] || '' };
+            request('POST', 'reserve.do', body).then(function (result) {
+                state.reservation = result;
+                document.getElementById('reserveResult').innerHTML = '<p>预约成功，预约号：<b id="reserveNo">' + result.number + '</b></p>'
+                    + '<input type="button" name="BtnPrint" id="BtnPrint" class="buttHighlight" value="打印确认单" onclick="ybprint(\'' + result.number + '\')">'
+                    + '<div id="ybprintDiv"></div>';
+            });
+        },
+        back: function () {
+            collectFields();
+            var submission = { fields: state.fields, transfers: state.transfers, reservation: state.reservation, printed: state.printed };
+            request('POST', 'save.do', submission).then(function () {
+                closeBankDialog();
+                state = newState();
+                render();
+            });
+        }
+    };
+
+    render();
+})();
+</script>
+</body>
+</html>
+"""
+
+# 最小化的jQuery：只实现页面和date_fill.py用到的 hasClass/trigger/val 以及jQuery UI datepicker
+# （与jQuery UI相同的#ui-datepicker-div结构：年份/月份下拉框、td[data-handler=selectDay] a.ui-state-default）
+_JQUERY_SHIM_JS = r"""(function (window, document) {
+    'use strict';
+
+    function Query(nodes) {
+        this.nodes = nodes;
+        this.length = nodes.length;
+    }
+
+    function $(selector) {
+        if (selector instanceof Query) {
+            return selector;
+        }
+        if (typeof selector === 'string') {
+            return new Query(Array.prototype.slice.call(document.querySelectorAll(selector)));
+        }
+        return new Query(selector ? [selector] : []);
+    }
+
+    $.fn = Query.prototype;
+
+    $.fn.hasClass = function (name) {
+        return this.nodes.some(function (node) { return node.classList.contains(name); });
+    };
+
+    $.fn.trigger = function (type) {
+        this.nodes.forEach(function (node) { node.dispatchEvent(new Event(type, { bubbles: true })); });
+        return this;
+    };
+
+    $.fn.val = function (value) {
+        if (value === undefined) {
+            return this.nodes.length ? this.nodes[0].value : undefined;
+        }
+        this.nodes.forEach(function (node) { node.value = value; });
+        return this;
+    };
+
+    var MONTH_NAMES = ['1月', '2月', '3月', '4月', '5月', '6月', '7月', '8月', '9月', '10月', '11月', '12月'];
+    var DAY_NAMES = ['日', '一', '二', '三', '四', '五', '六'];
+    var EMPTY_CELL = '<td class="ui-datepicker-other-month ui-datepicker-unselectable ui-state-disabled">&#xa0;</td>';
+    var active = null;
+
+    function pad(n) {
+        return (n < 10 ? '0' : '') + n;
+    }
+
+    function formatDate(date) {
+        return date.getFullYear() + '-' + pad(date.getMonth() + 1) + '-' + pad(date.getDate());
+    }
+
+    function parseDate(value) {
+        if (value instanceof Date) {
+            return isNaN(value.getTime()) ? null : new Date(value.getFullYear(), value.getMonth(), value.getDate());
+        }
+        var match = /^(\d{4})-(\d{1,2})-(\d{1,2})$/.exec(String(value || '').trim());
+        return match ? new Date(+match[1], +match[2] - 1, +match[3]) : null;
+    }
+
+    function getDiv() {
+        var div = document.getElementById('ui-datepicker-div');
+        if (!div) {
+            div = document.createElement('div');
+            div.id = 'ui-datepicker-div';
+            div.className = 'ui-datepicker ui-widget ui-widget-content ui-helper-clearfix ui-corner-all';
+            div.style.cssText = 'position: absolute; display: none; z-index: 1000;';
+            div.addEventListener('change', onSelectChange);
+            div.addEventListener('click', onClick);
+            document.body.appendChild(div);
+        }
+        return div;
+    }
+
+    function setDate(inst, value) {
+        inst.date = parseDate(value);
+        inst.input.value = inst.date ? formatDate(inst.date) : '';
+    }
+
+    function renderCalendar() {
+        var inst = active;
+        var year = inst.viewYear;
+        var month = inst.viewMonth;
+        var html = '<div class="ui-datepicker-header ui-widget-header ui-helper-clearfix ui-corner-all">'
+            + '<a class="ui-datepicker-prev ui-corner-all" data-handler="prev" data-event="click" title="上月"><span class="ui-icon ui-icon-circle-triangle-w">上月</span></a>'
+            + '<a class="ui-datepicker-next ui-corner-all" data-handler="next" data-event="click" title="下月"><span class="ui-icon ui-icon-circle-triangle-e">下月</span></a>'
+            + '<div class="ui-datepicker-title"><select class="ui-datepicker-year" data-handler="selectYear" data-event="change">';
+        for (var y = year - 10; y <= year + 10; y++) {
+            html += '<option value="' + y + '"' + (y === year ? ' selected="selected"' : '') + '>' + y + '</option>';
+        }
+        html += '</select><select class="ui-datepicker-month" data-handler="selectMonth" data-event="change">';
+        for (var m = 0; m < 12; m++) {
+            html += '<option value="' + m + '"' + (m === month ? ' selected="selected"' : '') + '>' + MONTH_NAMES[m] + '</option>';
+        }
+        html += '</select></div></div><table class="ui-datepicker-calendar"><thead><tr>';
+        DAY_NAMES.forEach(function (name, index) {
+            var weekend = index === 0 || index === 6 ? ' class="ui-datepicker-week-end"' : '';
+            html += '<th' + weekend + '><span title="星期' + name + '">' + name + '</span></th>';
+        });
+        html += '</tr></thead><tbody><tr>';
+        var cell = 0;
+        var first = new Date(year, month, 1).getDay();
+        var days = new Date(year, month + 1, 0).getDate();
+        for (; cell < first; cell++) {
+            html += EMPTY_CELL;
+        }
+        for (var day = 1; day <= days; day++, cell++) {
+            if (cell > 0 && cell % 7 === 0) {
+                html += '</tr><tr>';
+            }
+            var selected = inst.date && inst.date.getFullYear() === year && inst.date.getMonth() === month
+                && inst.date.getDate() === day;
+            html += '<td data-handler="selectDay" data-event="click" data-month="' + month + '" data-year="' + year + '"'
+                + (selected ? ' class="ui-datepicker-current-day"' : '') + '><a class="ui-state-default'
+                + (selected ? ' ui-state-active' : '') + '" href="#">' + day + '</a></td>';
+        }
+        for (; cell % 7 !== 0; cell++) {
+            html += EMPTY_CELL;
+        }
+        getDiv().innerHTML = html + '</tr></tbody></table>';
+    }
+
+    function show(inst) {
+        var base = inst.date || new Date();
+        active = inst;
+        inst.viewYear = base.getFullYear();
+        inst.viewMonth = base.getMonth();
+        renderCalendar();
+        var rect = inst.input.getBoundingClientRect();
+        var div = getDiv();
+        div.style.left = (rect.left + window.pageXOffset) + 'px';
+        div.style.top = (rect.bottom + window.pageYOffset) + 'px';
+        div.style.display = 'block';
+    }
+
+    function hide() {
+        getDiv().style.display = 'none';
+        active = null;
+    }
+
+    function onSelectChange(event) {
+        var handler = event.target.getAttribute('data-handler');
+        if (!active || (handler !== 'selectYear' && handler !== 'selectMonth')) {
+            return;
+        }
+        if (handler === 'selectYear') {
+            active.viewYear = +event.target.value;
+        } else {
+            active.viewMonth = +event.target.value;
+        }
+        renderCalendar();
+    }
+
+    function onClick(event) {
+        var target = active ? event.target.closest('[data-handler]') : null;
+        var handler = target ? target.getAttribute('data-handler') : '';
+        if (handler === 'prev' || handler === 'next') {
+            event.preventDefault();
+            var view = new Date(active.viewYear, active.viewMonth + (handler === 'prev' ? -1 : 1), 1);
+            active.viewYear = view.getFullYear();
+            active.viewMonth = view.getMonth();
+            renderCalendar();
+        } else if (handler === 'selectDay') {
+            event.preventDefault();
+            var inst = active;
+            setDate(inst, new Date(+target.getAttribute('data-year'), +target.getAttribute('data-month'), +target.textContent));
+            hide();
+            inst.input.dispatchEvent(new Event('change', { bubbles: true }));
+        }
+    }
+
+    function attach(input, options) {
+        if (input.__datepicker) {
+            return;
+        }
+        var inst = { input: input, options: options, date: parseDate(input.value) };
+        input.__datepicker = inst;
+        input.classList.add('hasDatepicker');
+        input.addEventListener('focus', function () { show(inst); });
+        input.addEventListener('click', function () {
+            if (active !== inst) {
+                show(inst);
+            }
+        });
+        getDiv();
+    }
+
+    document.addEventListener('mousedown', function (event) {
+        if (active && !getDiv().contains(event.target) && event.target !== active.input) {
+            hide();
+        }
+    });
+
+    $.fn.datepicker = function (options, value) {
+        if (typeof options === 'string') {
+            var first = this.nodes.length ? this.nodes[0].__datepicker : null;
+            if (options === 'getDate') {
+                return first && first.date ? new Date(first.date.getTime()) : null;
+            }
+            this.nodes.forEach(function (node) {
+                var inst = node.__datepicker;
+                if (!inst) {
+                    return;
+                }
+                if (options === 'setDate') {
+                    setDate(inst, value);
+                } else if (options === 'show') {
+                    show(inst);
+                } else if (options === 'hide') {
+                    hide();
+                }
+            });
+            return this;
+        }
+        this.nodes.forEach(function (node) { attach(node, options || {}); });
+        return this;
+    };
+
+    window.jQuery = window.$ = $;
+})(window, document);
+"""
+
+# 验证码图片
+_CAPTCHA_SVG = """<svg xmlns="http://www.w3.org/2000/svg" width="80" height="28">
+<rect width="80" height="28" fill="#eef"/>
+<text x="10" y="21" font-size="18" font-family="monospace" fill="#336">{code}</text>
+</svg>
+"""
+
+# 预约确认单（ybprint）
+_YBPRINT_HTML = """<div class="ybprint">
+<h4>网上预约报账确认单</h4>
+<p>预约号：{number}</p>
+<p>项目号：{project}</p>
+<p>预约时间：{date} {time}（{campus}）</p>
+</div>
+"""
+
+# 预约时间段
+_SLOT_TIMES = ["09:00-10:00", "10:00-11:00", "14:30-15:30", "15:30-16:30"]
+
+
+class _PortalRequestHandler(BaseHTTPRequestHandler):
+    """把请求分派给MockPortalServer的各个接口"""
+
+    server_version = "MockWFManager/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str) -> None:
+        portal: "MockPortalServer" = self.server.portal
+        parsed = urlparse(self.path)
+        route = portal.routes.get((method, parsed.path))
+        if route is None:
+            self._send(404, "text/plain; charset=utf-8", "Not Found")
+            return
+        handler, delayed = route
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        body = {}
+        if method == "POST":
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            try:
+                body = json.loads(raw.decode('utf-8')) if raw else {}
+            except ValueError:
+                self._send(400, "text/plain; charset=utf-8", "Bad Request")
+                return
+        portal.request_counts[parsed.path.rsplit('/', 1)[-1]] += 1
+        if delayed:
+            time.sleep(portal.next_delay())
+        content_type, payload = handler(query, body)
+        self._send(200, content_type, payload)
+
+    def _send(self, status: int, content_type: str, payload) -> None:
+        if not isinstance(payload, (str, bytes)):
+            payload = json.dumps(payload, ensure_ascii=False)
+            content_type = "application/json; charset=utf-8"
+        data = payload.encode('utf-8') if isinstance(payload, str) else payload
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class MockPortalServer:
+    """本地模拟财务系统（后台线程运行）"""
+
+    def __init__(self, host: str = None, port: int = None, latency_ms: float = None, jitter_ms: float = None,
+                 captcha: str = None, subject_file: str = SUBJECT_GRID_FILE, seed: int = 0):
+        """
+        Args:
+            host: 监听地址，默认config.MOCK_PORTAL_HOST
+            port: 端口，默认config.MOCK_PORTAL_PORT，为0时自动选择空闲端口
+            latency_ms: 每个页面和接口请求的服务器延迟（毫秒），默认config.MOCK_PORTAL_LATENCY_MS
+            jitter_ms: 延迟的随机波动范围（毫秒，均匀分布），默认config.MOCK_PORTAL_JITTER_MS
+            captcha: 登录验证码，默认config.MOCK_PORTAL_CAPTCHA
+            subject_file: jqGrid科目表文件
+            seed: 延迟波动的随机种子（相同种子的延迟序列相同）
+        """
+        self.host = host or config.MOCK_PORTAL_HOST
+        self.port = config.MOCK_PORTAL_PORT if port is None else port
+        self.latency_ms = config.MOCK_PORTAL_LATENCY_MS if latency_ms is None else latency_ms
+        self.jitter_ms = config.MOCK_PORTAL_JITTER_MS if jitter_ms is None else jitter_ms
+        self.captcha = captcha or config.MOCK_PORTAL_CAPTCHA
+        self.subject_grid_html, self.subjects = load_subject_grid(subject_file)
+        # 点击"返回"时保存的报销单（用于核对基准测试的处理结果）
+        self.submissions: List[Dict] = []
+        self.reservations: List[Dict] = []
+        self.logins = 0
+        self.request_counts: Counter = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._context = secrets.token_hex(200)
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        # (方法, 路径) -> (处理函数, 是否模拟服务器延迟)
+        self.routes = {
+            ("GET", f"{BASE_PATH}/home.jsp"): (self._home_page, True),
+            ("GET", f"{BASE_PATH}/main2.jsp"): (self._main_page, True),
+            ("GET", f"{BASE_PATH}/js/jquery.mock.js"): (self._jquery_shim, False),
+            ("GET", f"{BASE_PATH}/captcha.svg"): (self._captcha_image, False),
+            ("POST", f"{BASE_PATH}/login.do"): (self._login, True),
+            ("POST", f"{BASE_PATH}/step.do"): (self._step, True),
+            ("GET", f"{BASE_PATH}/getkm.do"): (self._subject_grid, True),
+            ("GET", f"{BASE_PATH}/getuser.do"): (self._employee_lookup, True),
+            ("GET", f"{BASE_PATH}/getslots.do"): (self._slots, True),
+            ("POST", f"{BASE_PATH}/reserve.do"): (self._reserve, True),
+            ("GET", f"{BASE_PATH}/ybprint.do"): (self._ybprint, True),
+            ("POST", f"{BASE_PATH}/save.do"): (self._save, True),
+        }
+
+    @property
+    def url(self) -> str:
+        """登录页地址（相当于config.TARGET_URL）"""
+        return f"http://{self.host}:{self.port}{BASE_PATH}/home.jsp"
+
+    def start(self) -> "MockPortalServer":
+        """在后台线程中启动服务器"""
+        if self._httpd is not None:
+            return self
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _PortalRequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.portal = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-portal", daemon=True)
+        self._thread.start()
+        logger.info(f"模拟财务系统已启动: {self.url} (延迟 {self.latency_ms}±{self.jitter_ms}毫秒)")
+        return self
+
+    def stop(self) -> None:
+        """停止服务器"""
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join(timeout=5)
+        self._httpd = None
+        self._thread = None
+
+    def __enter__(self) -> "MockPortalServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    def next_delay(self) -> float:
+        """下一个请求的服务器延迟（秒）"""
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def _page_config(self) -> Dict:
+        """注入main2.jsp的页面配置（各字段ID和下拉框选项）"""
+        selects = {element_id: [[value, text] for text, value in config.DROPDOWN_FIELDS.get(name, {}).items()]
+                   for element_id, name in SELECT_FIELD_CONFIG.items()}
+
+        def kind(element_id: str) -> str:
+            if element_id in SELECT_FIELD_CONFIG:
+                return "select"
+            if element_id in (TRIP_FIELD_IDS["起"], TRIP_FIELD_IDS["迄"]):
+                return "date"
+            if element_id == BASIC_FIELD_IDS["特殊事项说明"]:
+                return "textarea"
+            return "input"
+
+        return {
+            "basic": [[title, element_id, kind(element_id)] for title, element_id in BASIC_FIELD_IDS.items()],
+            "traveler": [[field, prefix, "select" if field == "人员类型" else "input"]
+                         for field, prefix in TRAVELER_FIELD_PREFIXES.items()],
+            "traveler_ids": {
+                "name": TRAVELER_FIELD_PREFIXES["姓名"],
+                "sno": TRAVELER_FIELD_PREFIXES["工号"],
+                "dept": TRAVELER_FIELD_PREFIXES["单位"],
+                "title": TRAVELER_FIELD_PREFIXES["职称"],
+            },
+            "max_travelers": MAX_TRAVELERS,
+            "trip": [[title, element_id, kind(element_id)] for title, element_id in TRIP_FIELD_IDS.items()],
+            "transfer": {
+                "sno": TRANSFER_FIELD_IDS["转卡信息工号"],
+                "amount": TRANSFER_FIELD_IDS["个人金额"],
+                "name": TRANSFER_NAME_ID,
+                "bank": TRANSFER_BANK_ID,
+            },
+            "project_id": BASIC_FIELD_IDS["报销项目号"],
+            "grid_id": SUBJECT_GRID_ID,
+            "reservation_date": RESERVATION_DATE_ID,
+            "campus_name": CAMPUS_RADIO_NAME,
+            "campuses": CAMPUSES,
+            "selects": selects,
+        }
+
+    def _home_page(self, query: Dict, body: Dict):
+        return "text/html; charset=utf-8", _HOME_HTML.replace("__CONTEXT__", self._context)
+
+    def _main_page(self, query: Dict, body: Dict):
+        if query.get("prj") != "WF_YB6":
+            return "text/html; charset=utf-8", _UNAVAILABLE_HTML
+        page_config = json.dumps(self._page_config(), ensure_ascii=False).replace("</", "<\\/")
+        return "text/html; charset=utf-8", _MAIN_HTML.replace("__CONFIG__", page_config)
+
+    def _jquery_shim(self, query: Dict, body: Dict):
+        return "application/javascript; charset=utf-8", _JQUERY_SHIM_JS
+
+    def _captcha_image(self, query: Dict, body: Dict):
+        return "image/svg+xml", _CAPTCHA_SVG.format(code=self.captcha)
+
+    def _login(self, query: Dict, body: Dict):
+        uid = str(body.get("uid", "")).strip()
+        if not uid or not body.get("pwd"):
+            return "application/json", {"ok": False, "msg": "请输入工号和密码"}
+        if str(body.get("captcha", "")).strip() != self.captcha:
+            return "application/json", {"ok": False, "msg": "验证码错误"}
+        with self._lock:
+            self.logins += 1
+        return "application/json", {"ok": True, "uid": uid, "name": mock_person_for(uid)["name"]}
+
+    def _step(self, query: Dict, body: Dict):
+        return "application/json", {"ok": True, "step": body.get("step")}
+
+    def _subject_grid(self, query: Dict, body: Dict):
+        return "text/html; charset=utf-8", self.subject_grid_html
+
+    def _employee_lookup(self, query: Dict, body: Dict):
+        sno = query.get("sno", "").strip()
+        person = mock_person_for(sno)
+        person["cards"] = mock_cards_for(sno)
+        return "application/json", person
+
+    def _slots(self, query: Dict, body: Dict):
+        date = query.get("date") or time.strftime("%Y-%m-%d")
+        # 不同日期和校区的剩余名额不同（确定性生成）
+        d = _digest(f"slots:{date}:{query.get('campus', '')}")
+        slots = [{"id": f"2179_{index + 1}", "date": date, "time": slot_time, "remain": 1 + d[index] % 9}
+                 for index, slot_time in enumerate(_SLOT_TIMES)]
+        return "application/json", slots
+
+    def _reserve(self, query: Dict, body: Dict):
+        with self._lock:
+            number = f"YB{str(body.get('date', '')).replace('-', '')}{len(self.reservations) + 1:04d}"
+            reservation = {**body, "number": number}
+            self.reservations.append(reservation)
+        return "application/json", {"ok": True, **reservation}
+
+    def _ybprint(self, query: Dict, body: Dict):
+        number = query.get("no", "")
+        reservation = next((r for r in self.reservations if r["number"] == number), {})
+        slot_index = int(str(reservation.get("slot", "2179_1")).rsplit('_', 1)[-1]) - 1
+        html = _YBPRINT_HTML.format(
+            number=number,
+            project=reservation.get("project", ""),
+            date=reservation.get("date", ""),
+            time=_SLOT_TIMES[slot_index % len(_SLOT_TIMES)],
+            campus=reservation.get("campus", ""),
+        )
+        return "text/html; charset=utf-8", html
+
+    def _save(self, query: Dict, body: Dict):
+        with self._lock:
+            self.submissions.append(body)
+            count = len(self.submissions)
+        logger.debug("保存报销单 %s: %s", count, body)
+        return "application/json", {"ok": True, "count": count}
+
+
+def main():
+    """命令行启动模拟财务系统"""
+    parser = argparse.ArgumentParser(description="本地模拟财务系统（离线运行自动化程序和基准测试）")
+    parser.add_argument("--host", default=config.MOCK_PORTAL_HOST, help="监听地址")
+    parser.add_argument("--port", type=int, default=config.MOCK_PORTAL_PORT, help="端口（0为自动选择）")
+    parser.add_argument("--latency", type=float, default=config.MOCK_PORTAL_LATENCY_MS, help="服务器延迟（毫秒）")
+    parser.add_argument("--jitter", type=float, default=config.MOCK_PORTAL_JITTER_MS, help="延迟波动范围（毫秒）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, config.LOG_LEVEL), format=config.LOG_FORMAT)
+    server = MockPortalServer(args.host, args.port, args.latency, args.jitter).start()
+    logger.info(f"验证码: {server.captcha}，按Ctrl+C停止")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        logger.info(f"已停止，共保存报销单 {len(server.submissions)} 张")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+元素不存在缓存
+记录 (frame, frame地址, 选择器) 在当前页面状态下不存在，同一状态下再次查找时直接返回，不再访问浏览器
+frame导航、frame移除或页面中新增元素（由注入的MutationObserver通知）时清除对应frame的记录
+"""
+
+import time
+import logging
+from typing import Dict, Tuple
+
+from playwright.async_api import TimeoutError
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 页面回调函数名
+_BINDING_NAME = "__absenceCacheInvalidate"
+
+# 注入每个frame的脚本：新增元素或id/name属性变化时通知Python清除该frame的记录
+# 首次变化立即通知，之后50毫秒内的变化合并为一次结尾通知，保证每次变化之后都有通知
+_OBSERVER_INIT_JS = """
+(() => {
+    if (window.__absenceObserverInstalled) {
+        return;
+    }
+    window.__absenceObserverInstalled = true;
+    let throttled = false;
+    const notify = () => {
+        try {
+            window.%s();
+        } catch (e) {
+        }
+    };
+    const observer = new MutationObserver((records) => {
+        if (throttled) {
+            return;
+        }
+        const relevant = records.some(r => r.type === 'attributes'
+            || Array.from(r.addedNodes).some(n => n.nodeType === 1));
+        if (!relevant) {
+            return;
+        }
+        throttled = true;
+        notify();
+        setTimeout(() => { throttled = false; notify(); }, 50);
+    });
+    observer.observe(document, { childList: true, subtree: true, attributes: true, attributeFilter: ['id', 'name'] });
+})();
+""" % _BINDING_NAME
+
+
+class AbsenceCache:
+    """按frame记录当前页面状态下不存在的选择器"""
+
+    def __init__(self, ttl: float = None):
+        """
+        Args:
+            ttl: 记录的最长有效时间（秒），防止漏掉变化通知时长期误判
+        """
+        self.ttl = config.NEGATIVE_CACHE_TTL if ttl is None else ttl
+        self.enabled = False
+        self.hits = 0
+        self.invalidations = 0
+        # {(frame, frame地址): {选择器: 记录时间}}
+        self._absent: Dict[Tuple[object, str], Dict[str, float]] = {}
+
+    async def attach(self, page) -> bool:
+        """
+        在页面上注册导航事件和变化通知（需在打开目标页面之前调用）
+
+        Args:
+            page: Playwright页面
+
+        Returns:
+            是否启用成功（失败时缓存不生效，每次都访问浏览器）
+        """
+        try:
+            await page.expose_binding(_BINDING_NAME, lambda source: self.invalidate(source["frame"]))
+            await page.add_init_script(_OBSERVER_INIT_JS)
+        except Exception as e:
+            logger.warning(f"注册元素变化通知失败，不使用元素不存在缓存: {e}")
+            self.enabled = False
+            return False
+        page.on("framenavigated", self.invalidate)
+        page.on("framedetached", self.invalidate)
+        self.clear()
+        self.enabled = True
+        return True
+
+    def clear(self) -> None:
+        self._absent.clear()
+
+    def invalidate(self, frame) -> None:
+        """清除某个frame的全部记录"""
+        removed = [key for key in self._absent if key[0] == frame]
+        for key in removed:
+            del self._absent[key]
+        if removed:
+            self.invalidations += 1
+
+    def is_absent(self, frame, selector: str) -> bool:
+        """选择器在frame的当前状态下是否已确认不存在"""
+        if not self.enabled:
+            return False
+        recorded_at = self._absent.get((frame, frame.url), {}).get(selector)
+        if recorded_at is None:
+            return False
+        if time.monotonic() - recorded_at > self.ttl:
+            del self._absent[(frame, frame.url)][selector]
+            return False
+        self.hits += 1
+        return True
+
+    def record_absent(self, frame, selector: str) -> None:
+        """记录选择器在frame的当前状态下不存在"""
+        if self.enabled:
+            self._absent.setdefault((frame, frame.url), {})[selector] = time.monotonic()
+
+    async def count(self, frame, selector: str) -> int:
+        """
+        统计frame中匹配选择器的元素数量，已确认不存在时直接返回0
+
+        Args:
+            frame: Playwright frame
+            selector: 选择器
+        """
+        if self.is_absent(frame, selector):
+            return 0
+        found = await frame.locator(selector).count()
+        if found == 0:
+            self.record_absent(frame, selector)
+        return found
+
+    async def wait_for_selector(self, page, selector: str, timeout: int) -> bool:
+        """
+        在主页面等待选择器出现；等待超时后，主页面没有变化之前再次等待直接返回False
+
+        Args:
+            page: Playwright页面
+            selector: 选择器
+            timeout: 超时时间（毫秒）
+        """
+        waited_key = f"waited:{selector}"
+        if self.is_absent(page.main_frame, waited_key):
+            return False
+        try:
+            await page.wait_for_selector(selector, timeout=timeout)
+            return True
+        except TimeoutError:
+            self.record_absent(page.main_frame, waited_key)
+            return False
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网络请求监控
+通过页面的request/requestfinished/requestfailed事件记录每个XHR和页面导航请求，按请求的时间信息区分
+服务器处理时间（发出请求到收到响应头）和传输时间，归属到当时正在执行的操作（步骤追踪的span），
+请求记录写入步骤追踪文件，运行结束时按接口输出服务器时间的分位数
+"""
+
+import re
+import math
+import time
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 需要记录的请求类型（图片、样式、脚本等静态资源不记录）
+_MONITORED_RESOURCE_TYPES = ("xhr", "fetch", "document")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    最近秩法计算分位数
+
+    Args:
+        values: 数值列表（不需要排序）
+        fraction: 0~1，如0.95
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(fraction * len(ordered))
+    return ordered[min(len(ordered), max(rank, 1)) - 1]
+
+
+class NetworkMonitor:
+    """记录页面的XHR和导航请求，按接口统计服务器时间"""
+
+    def __init__(self, tracer=None, endpoint_patterns: Dict[str, str] = None):
+        """
+        Args:
+            tracer: 步骤追踪器（StepTracer），用于把请求归属到当前操作并写入同一追踪文件
+            endpoint_patterns: {接口名称: URL正则表达式}，默认使用config.NETWORK_ENDPOINT_PATTERNS
+        """
+        self.tracer = tracer
+        patterns = config.NETWORK_ENDPOINT_PATTERNS if endpoint_patterns is None else endpoint_patterns
+        self.endpoint_patterns = [(name, re.compile(pattern)) for name, pattern in patterns.items() if pattern]
+        # 已发出、尚未完成的请求 {request: (开始时间, span)}
+        self._pending: Dict[object, tuple] = {}
+        self.records: List[Dict] = []
+
+    def attach(self, page) -> None:
+        """在页面上注册请求事件"""
+        page.on("request", self._on_request)
+        page.on("requestfinished", self._on_finished)
+        page.on("requestfailed", self._on_failed)
+
+    def classify(self, url: str) -> str:
+        """按配置的正则表达式识别接口，未匹配时使用URL路径中的文件名"""
+        for name, pattern in self.endpoint_patterns:
+            if pattern.search(url):
+                return name
+        path = urlparse(url).path
+        return path.rsplit('/', 1)[-1] or path or url
+
+    def _on_request(self, request) -> None:
+        if request.resource_type not in _MONITORED_RESOURCE_TYPES:
+            return
+        span = self.tracer.innermost_open_span() if self.tracer else None
+        self._pending[request] = (time.perf_counter(), span)
+
+    async def _on_finished(self, request) -> None:
+        entry = self._pending.pop(request, None)
+        if entry is None:
+            return
+        status = None
+        try:
+            response = await request.response()
+            status = response.status if response else None
+        except Exception as e:
+            logger.debug("读取响应状态失败: %s", e)
+        self._record(request, entry, status=status)
+
+    def _on_failed(self, request) -> None:
+        entry = self._pending.pop(request, None)
+        if entry is not None:
+            self._record(request, entry, failure=request.failure)
+
+    def _record(self, request, entry: tuple, status: Optional[int] = None, failure: Optional[str] = None) -> None:
+        started, span = entry
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        # timing中的时间为相对startTime的毫秒数，未获得的阶段为-1
+        timing = request.timing or {}
+        request_start = timing.get("requestStart", -1)
+        response_start = timing.get("responseStart", -1)
+        response_end = timing.get("responseEnd", -1)
+        server_ms = response_start - request_start if request_start >= 0 and response_start >= 0 else None
+        transfer_ms = response_end - response_start if response_start >= 0 and response_end >= 0 else None
+
+        parsed = urlparse(request.url)
+        record = {
+            "kind": "request",
+            "endpoint": self.classify(request.url),
+            "method": request.method,
+            "resource_type": request.resource_type,
+            "url": f"{parsed.netloc}{parsed.path}",
+            "status": status,
+            "failure": failure,
+            "server_ms": round(server_ms, 1) if server_ms is not None else None,
+            "transfer_ms": round(transfer_ms, 1) if transfer_ms is not None else None,
+            "total_ms": round(elapsed_ms, 1),
+            "span_id": span.span_id if span else None,
+            "operation": span.operation if span else None,
+            "title": span.fields.get("title") if span else None,
+        }
+        self.records.append(record)
+        if span is not None and server_ms is not None:
+            span.fields["server_ms"] = round(span.fields.get("server_ms", 0) + server_ms, 1)
+            span.fields["requests"] = span.fields.get("requests", 0) + 1
+        if self.tracer is not None:
+            self.tracer.emit(record)
+
+    def endpoint_summary(self) -> Dict[str, Dict]:
+        """按接口汇总：请求数、失败数、服务器时间的p50/p90/p95/最大值（毫秒）"""
+        grouped = defaultdict(list)
+        for record in self.records:
+            grouped[record["endpoint"]].append(record)
+        summary = {}
+        for endpoint, records in grouped.items():
+            server_times = [r["server_ms"] for r in records if r["server_ms"] is not None]
+            summary[endpoint] = {
+                "count": len(records),
+                "failed": sum(1 for r in records if r["failure"]),
+                "p50": percentile(server_times, 0.50),
+                "p90": percentile(server_times, 0.90),
+                "p95": percentile(server_times, 0.95),
+                "max": max(server_times) if server_times else 0.0,
+                "total_ms": sum(r["total_ms"] for r in records),
+            }
+        return summary
+
+    def log_report(self) -> None:
+        """输出各接口的服务器时间分位数"""
+        summary = self.endpoint_summary()
+        if not summary:
+            return
+        logger.info(f"网络请求: 共 {len(self.records)} 个，按接口的服务器时间（毫秒）:")
+        for endpoint, stats in sorted(summary.items(), key=lambda item: item[1]["total_ms"], reverse=True):
+            logger.info(f"  {endpoint}: {stats['count']} 个 (失败 {stats['failed']}), "
+                        f"p50={stats['p50']:.0f} p90={stats['p90']:.0f} p95={stats['p95']:.0f} max={stats['max']:.0f}")
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地LLM（Ollama）调用封装
+支持普通调用和流式调用；流式调用时在已知科目名称出现后提前结束生成
+支持模型预热和keep_alive，并分别统计冷启动（含模型加载）和稳态推理耗时
+"""
+
+import json
+import time
+import logging
+from typing import List, Optional
+
+import requests
+
+import config
+from subject_matcher import StreamingSubjectDetector
+
+logger = logging.getLogger(__name__)
+
+# 模型加载耗时超过该值（秒）时，认为本次调用是冷启动
+COLD_START_LOAD_THRESHOLD = 1.0
+
+
+class OllamaClient:
+    """Ollama /api/generate 接口客户端（同步阻塞，异步代码中应放到线程中调用）"""
+
+    def __init__(self, base_url: str = None, model: str = None, timeout: float = None):
+        """
+        Args:
+            base_url: Ollama服务地址
+            model: 模型名称
+            timeout: 请求超时时间（秒）
+        """
+        self.base_url = (base_url or config.OLLAMA_BASE_URL).rstrip("/")
+        self.model = model or config.OLLAMA_MODEL
+        self.timeout = timeout or config.OLLAMA_TIMEOUT
+        self.keep_alive = config.OLLAMA_KEEP_ALIVE
+
+        # 模型加载状态与耗时统计
+        self.model_loaded = False
+        self.cold_start_latencies: List[float] = []
+        self.inference_latencies: List[float] = []
+
+    @property
+    def generate_url(self) -> str:
+        return f"{self.base_url}/api/generate"
+
+    def _record_latency(self, elapsed: float, load_duration: Optional[float] = None) -> None:
+        """
+        记录一次调用耗时，按是否包含模型加载分别统计
+
+        Args:
+            elapsed: 调用总耗时（秒）
+            load_duration: Ollama返回的模型加载耗时（秒），流式提前结束时没有该值
+        """
+        if load_duration is None:
+            is_cold = not self.model_loaded
+        else:
+            is_cold = load_duration >= COLD_START_LOAD_THRESHOLD
+        if is_cold:
+            self.cold_start_latencies.append(elapsed)
+        else:
+            self.inference_latencies.append(elapsed)
+        self.model_loaded = True
+
+    def _log_stats(self, result: dict, elapsed: float, prefix: str = "Ollama调用") -> None:
+        """记录提示词token数与耗时（Ollama耗时单位为纳秒）"""
+        load_duration = result.get('load_duration', 0) / 1e9
+        self._record_latency(elapsed, load_duration)
+        logger.info(
+            f"{prefix}耗时 {elapsed:.2f}s (模型加载 {load_duration:.2f}s): 提示词 {result.get('prompt_eval_count', '?')} tokens "
+            f"({result.get('prompt_eval_duration', 0) / 1e9:.2f}s), "
+            f"生成 {result.get('eval_count', '?')} tokens ({result.get('eval_duration', 0) / 1e9:.2f}s)"
+        )
+
+    def warm_up(self) -> bool:
+        """
+        预热模型：发送不带提示词的请求，Ollama只加载模型并按keep_alive保持在内存中
+
+        Returns:
+            模型是否加载成功
+        """
+        data = {
+            "model": self.model,
+            "keep_alive": self.keep_alive
+        }
+
+        logger.info(f"开始预热模型 {self.model} (keep_alive={self.keep_alive})")
+        start_time = time.perf_counter()
+        try:
+            response = requests.post(self.generate_url, json=data, timeout=config.OLLAMA_WARMUP_TIMEOUT)
+        except requests.RequestException as e:
+            logger.warning(f"模型预热失败: {e}")
+            return False
+        elapsed = time.perf_counter() - start_time
+        if response.status_code != 200:
+            logger.warning(f"模型预热失败: {response.status_code}")
+            return False
+
+        load_duration = response.json().get('load_duration', 0) / 1e9
+        self._record_latency(elapsed, load_duration)
+        logger.info(f"模型预热完成，耗时 {elapsed:.2f}s (模型加载 {load_duration:.2f}s)")
+        return True
+
+    def latency_summary(self) -> dict:
+        """冷启动与稳态推理耗时汇总"""
+        inference = sorted(self.inference_latencies)
+        return {
+            "model_loaded": self.model_loaded,
+            "cold_start_count": len(self.cold_start_latencies),
+            "cold_start_max": max(self.cold_start_latencies) if self.cold_start_latencies else None,
+            "inference_count": len(inference),
+            "inference_avg": sum(inference) / len(inference) if inference else None,
+            "inference_max": inference[-1] if inference else None,
+        }
+
+    def log_latency_summary(self) -> None:
+        """输出冷启动与稳态推理耗时"""
+        summary = self.latency_summary()
+        cold = f"{summary['cold_start_count']} 次, 最长 {summary['cold_start_max']:.2f}s" if summary['cold_start_count'] else "0 次"
+        steady = (f"{summary['inference_count']} 次, 平均 {summary['inference_avg']:.2f}s, 最长 {summary['inference_max']:.2f}s"
+                  if summary['inference_count'] else "0 次")
+        logger.info(f"LLM耗时统计: 冷启动 {cold}; 稳态推理 {steady}")
+
+    def generate(self, prompt: str) -> str:
+        """
+        普通调用，等待完整响应
+
+        Args:
+            prompt: 提示词
+
+        Returns:
+            响应文本，失败时返回空字符串
+        """
+        data = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": self.keep_alive
+        }
+
+        start_time = time.perf_counter()
+        response = requests.post(self.generate_url, json=data, timeout=self.timeout)
+        elapsed = time.perf_counter() - start_time
+        if response.status_code != 200:
+            logger.error(f"Ollama API调用失败: {response.status_code}")
+            return ""
+
+        result = response.json()
+        self._log_stats(result, elapsed)
+        return result.get("response", "").strip()
+
+    def generate_until_subject(self, prompt: str, subject_names: List[str]) -> str:
+        """
+        流式调用，逐块检测已知科目名称，出现无歧义匹配时立即断开连接以取消生成
+
+        Args:
+            prompt: 提示词
+            subject_names: 已知科目名称列表
+
+        Returns:
+            提前匹配到的科目名称；未提前匹配时返回最长的候选匹配或完整响应文本
+        """
+        data = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": self.keep_alive
+        }
+        detector = StreamingSubjectDetector(subject_names)
+        chunks = []
+
+        start_time = time.perf_counter()
+        # 退出with块时关闭连接，Ollama检测到客户端断开后会停止生成
+        with requests.post(self.generate_url, json=data, stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                logger.error(f"Ollama API调用失败: {response.status_code}")
+                return ""
+
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                piece = chunk.get("response", "")
+                chunks.append(piece)
+
+                matched = detector.feed(piece)
+                if matched:
+                    elapsed = time.perf_counter() - start_time
+                    self._record_latency(elapsed)
+                    logger.info(f"流式响应中检测到科目 '{matched}'，提前结束生成 "
+                                f"(耗时 {elapsed:.2f}s, 已接收 {len(chunks)} 个分块)")
+                    return matched
+
+                if chunk.get("done"):
+                    self._log_stats(chunk, time.perf_counter() - start_time, prefix="Ollama流式调用")
+                    break
+
+        text = "".join(chunks).strip()
+        if detector.best_match:
+            logger.info(f"流式响应结束，使用最长的候选匹配: {detector.best_match}")
+            return detector.best_match
+        return text
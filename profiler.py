@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能剖析（--profile运行模式）
+后台线程按固定间隔对事件循环线程采样：线程正在执行Python代码时记录实际调用栈；线程空闲在事件循环中时
+沿主任务的await链还原协程调用栈，并按await链判断是在等待Playwright调用、固定等待（traced_sleep）还是其他等待。
+每个样本归属到当时的报销记录（序号）和步骤追踪span，同时通过任务工厂记录asyncio任务的创建和完成。
+结束时输出火焰图折叠栈文件（flamegraph.pl、speedscope可直接打开）和Chrome trace文件（chrome://tracing、Perfetto），
+并按记录汇总Python执行、Playwright等待和固定等待各占多少时间
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 样本状态
+STATE_PYTHON = "python"
+STATE_PLAYWRIGHT = "playwright"
+STATE_SLEEP = "sleep"
+STATE_OTHER = "other"
+STATE_LABELS = {
+    STATE_PYTHON: "Python执行",
+    STATE_PLAYWRIGHT: "等待Playwright",
+    STATE_SLEEP: "固定等待",
+    STATE_OTHER: "其他等待",
+}
+
+# 不写入调用栈的事件循环和线程框架模块
+_SKIPPED_MODULES = ("asyncio", "selectors", "threading", "runpy")
+
+# 事件循环等待IO事件时所在的模块
+_LOOP_POLL_MODULES = ("selectors", "asyncio.windows_events")
+
+# Chrome trace中的线程编号
+_TID_RECORDS = 1
+_TID_STATES = 2
+_TID_SPANS = 3
+
+
+def _module_name(frame) -> str:
+    return frame.f_globals.get("__name__", "?")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{_module_name(frame)}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _is_skipped(frame) -> bool:
+    return _module_name(frame).split(".")[0] in _SKIPPED_MODULES
+
+
+def _thread_stack(frame) -> List:
+    """线程当前的调用栈（从外到内）"""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _is_loop_idle(stack: List) -> bool:
+    """
+    线程是否空闲在事件循环中（阻塞在等待IO事件上，没有执行任何回调）
+
+    最内层帧在selectors（SelectorEventLoop）或asyncio.windows_events（Windows的ProactorEventLoop）中，
+    或者最内层帧就是事件循环的_run_once（等待事件的调用在C代码中完成，如其他事件循环实现）时视为空闲
+    """
+    if not stack:
+        return False
+    innermost = stack[-1]
+    module = _module_name(innermost)
+    if module in _LOOP_POLL_MODULES:
+        return True
+    return module.startswith("asyncio") and innermost.f_code.co_name == "_run_once"
+
+
+def _await_chain(task) -> List:
+    """沿任务的await链收集挂起中的协程帧（从外到内）"""
+    frames = []
+    awaitable = task.get_coro() if task is not None else None
+    while awaitable is not None and len(frames) < 256:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+        if frame is not None:
+            frames.append(frame)
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+    return frames
+
+
+def classify_wait(frames: List) -> tuple:
+    """
+    根据await链判断等待类型
+
+    Returns:
+        (状态, 等待点)：固定等待为traced_sleep/asyncio.sleep，Playwright等待为最外层的Playwright API调用
+    """
+    for frame in frames:
+        if _module_name(frame) == "step_trace" and frame.f_code.co_name == "traced_sleep":
+            return STATE_SLEEP, "traced_sleep"
+    for frame in frames:
+        if _module_name(frame).startswith("playwright"):
+            return STATE_PLAYWRIGHT, _frame_label(frame)
+    if frames and frames[-1].f_code.co_name == "sleep" and _module_name(frames[-1]).startswith("asyncio"):
+        return STATE_SLEEP, "asyncio.sleep"
+    return STATE_OTHER, _frame_label(frames[-1]) if frames else ""
+
+
+def _folded_name(label: str) -> str:
+    """折叠栈格式中帧名不能包含分号和换行"""
+    return label.replace(";", ",").replace("\n", " ")
+
+
+@dataclass
+class _TaskRecord:
+    number: int
+    name: str
+    parent: Optional[int]
+    start: float
+    end: Optional[float] = None
+    outcome: str = "pending"
+
+
+class Profiler:
+    """事件循环线程的采样剖析和asyncio任务时间线"""
+
+    def __init__(self, tracer=None, enabled: bool = False, interval: float = None, output_dir: str = None):
+        """
+        Args:
+            tracer: 步骤追踪器（StepTracer），用于把样本归属到当前span并在时间线中显示span
+            enabled: 是否剖析（关闭时所有方法都不做任何事）
+            interval: 采样间隔（秒），默认使用config.PROFILE_SAMPLE_INTERVAL
+            output_dir: 输出目录，默认使用config.PROFILE_OUTPUT_DIR
+        """
+        self.tracer = tracer
+        self.enabled = enabled
+        self.interval = config.PROFILE_SAMPLE_INTERVAL if interval is None else interval
+        self.output_dir = config.PROFILE_OUTPUT_DIR if output_dir is None else output_dir
+        self.folded: Counter = Counter()  # 折叠栈 -> 样本数
+        self.state_counts: Counter = Counter()
+        self.record_states: Dict[str, Counter] = {}  # 记录 -> 各状态的样本数
+        self.hot_functions: Counter = Counter()  # Python执行样本的最内层函数
+        self.sample_count = 0
+        self.output_files: List[str] = []
+        self._events: List[Dict] = []
+        self._tasks: Dict[asyncio.Task, _TaskRecord] = {}
+        self._finished_tasks: List[_TaskRecord] = []
+        self._task_numbers = 0
+        self._record: Optional[str] = None
+        self._segment: Optional[list] = None  # 当前连续状态段 [状态, 等待点, 开始时间, 记录]
+        self._origin = 0.0
+        self._loop = None
+        self._previous_factory = None
+        self._root_task = None
+        self._thread_id = None
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._sampler is not None
+
+    def start(self) -> None:
+        """在事件循环中启动采样线程并安装任务工厂（需要在协程中调用）"""
+        if not self.enabled or self.running:
+            return
+        self._origin = time.perf_counter()
+        self._loop = asyncio.get_running_loop()
+        self._root_task = asyncio.current_task()
+        self._thread_id = threading.get_ident()
+        self._previous_factory = self._loop.get_task_factory()
+        self._loop.set_task_factory(self._task_factory)
+        if self.tracer is not None:
+            self.tracer.listeners.append(self._on_span)
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+        self._sampler.start()
+        logger.info(f"性能剖析已开启: 采样间隔 {self.interval * 1000:.0f}ms")
+
+    def stop(self) -> None:
+        """停止采样，写入火焰图和Chrome trace文件并输出汇总"""
+        if not self.running:
+            return
+        self._stop.set()
+        self._sampler.join(timeout=5)
+        self._sampler = None
+        self._loop.set_task_factory(self._previous_factory)
+        if self.tracer is not None and self._on_span in self.tracer.listeners:
+            self.tracer.listeners.remove(self._on_span)
+        self._close_segment(time.perf_counter())
+        self.write_outputs()
+        self.log_summary()
+
+    @contextmanager
+    def record(self, label):
+        """
+        标记一条报销记录的处理过程，期间的样本归属到该记录
+
+        Args:
+            label: 记录标签（如序号）
+        """
+        if not self.running:
+            yield
+            return
+        self._record = str(label)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add_event(f"序号 {self._record}", "record", start, time.perf_counter(), _TID_RECORDS)
+            self._record = None
+
+    # ---- 采样 ----
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self._sample()
+            except Exception as e:
+                # 目标线程在采样过程中继续运行，个别样本读取失败时跳过
+                logger.debug(f"采样失败: {e}")
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self._thread_id)
+        if frame is None:
+            return
+        now = time.perf_counter()
+        record = self._record
+        stack = _thread_stack(frame)
+        if _is_loop_idle(stack):
+            # 事件循环空闲，等待中的位置由主任务的await链决定
+            stack = _await_chain(self._root_task)
+            state, detail = classify_wait(stack)
+            leaf = [f"[{STATE_LABELS[state]}]"]
+        else:
+            state, detail = STATE_PYTHON, ""
+            leaf = []
+            # 与await链一致，从主任务的协程开始（去掉asyncio.run之外的调用方）
+            root_frame = getattr(self._root_task.get_coro(), "cr_frame", None) if self._root_task else None
+            if root_frame in stack:
+                stack = stack[stack.index(root_frame):]
+        frames = [_frame_label(f) for f in stack if not _is_skipped(f)]
+        if state == STATE_PYTHON and frames:
+            self.hot_functions[frames[-1]] += 1
+
+        names = [f"序号 {record}" if record is not None else "(记录之外)"]
+        names.extend(f"[span] {label}" for label in self._span_chain())
+        names.extend(frames)
+        names.extend(leaf)
+        self.folded[";".join(_folded_name(name) for name in names)] += 1
+        self.sample_count += 1
+        self.state_counts[state] += 1
+        if record is not None:
+            self.record_states.setdefault(record, Counter())[state] += 1
+        self._update_segment(state, detail, record, now)
+
+    def _span_chain(self) -> List[str]:
+        """当前最内层span及其上级span的标签（从外到内）"""
+        if self.tracer is None:
+            return []
+        try:
+            span = self.tracer.innermost_open_span()
+        except IndexError:
+            return []
+        labels = []
+        while span is not None:
+            title = span.fields.get("title")
+            labels.append(f"{span.operation}:{title}" if title else span.operation)
+            span = span.parent
+        labels.reverse()
+        return labels
+
+    def _update_segment(self, state: str, detail: str, record: Optional[str], now: float) -> None:
+        """合并状态和等待点相同的连续样本，作为时间线上的一段"""
+        segment = self._segment
+        if segment is not None and segment[0] == state and segment[1] == detail and segment[3] == record:
+            return
+        self._close_segment(now)
+        self._segment = [state, detail, now, record]
+
+    def _close_segment(self, now: float) -> None:
+        if self._segment is None:
+            return
+        state, detail, start, record = self._segment
+        args = {"wait_point": detail} if detail else {}
+        if record is not None:
+            args["sequence"] = record
+        self._add_event(STATE_LABELS[state], state, start, now, _TID_STATES, args)
+        self._segment = None
+
+    # ---- 时间线 ----
+
+    def _task_factory(self, loop, coro, **kwargs):
+        if self._previous_factory is not None:
+            task = self._previous_factory(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        self._task_numbers += 1
+        parent = self._tasks.get(asyncio.current_task(loop))
+        self._tasks[task] = _TaskRecord(
+            number=self._task_numbers,
+            name=getattr(coro, "__qualname__", type(coro).__name__),
+            parent=parent.number if parent else None,
+            start=time.perf_counter(),
+        )
+        task.add_done_callback(self._on_task_done)
+        return task
+
+    def _on_task_done(self, task) -> None:
+        task_record = self._tasks.pop(task, None)
+        if task_record is None:
+            return
+        task_record.end = time.perf_counter()
+        if task.cancelled():
+            task_record.outcome = "cancelled"
+        else:
+            task_record.outcome = "error" if task.exception() is not None else "ok"
+        self._finished_tasks.append(task_record)
+
+    def _on_span(self, span) -> None:
+        args = {key: value for key, value in span.fields.items() if isinstance(value, (str, int, float))}
+        args.update({"outcome": span.outcome, "wait_time": round(span.wait_time, 4)})
+        title = span.fields.get("title")
+        name = f"{span.operation}:{title}" if title else span.operation
+        self._add_event(name, "span", span.start, span.start + span.duration, _TID_SPANS, args)
+
+    def _add_event(self, name: str, category: str, start: float, end: float, tid: int, args: Dict = None) -> None:
+        self._events.append({
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start - self._origin) * 1e6, 1),
+            "dur": round(max(0.0, end - start) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": tid,
+            "args": args or {},
+        })
+
+    def chrome_trace(self) -> Dict:
+        """Chrome trace格式：记录、等待状态和span各占一行，asyncio任务显示为异步事件"""
+        pid = os.getpid()
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in ((_TID_RECORDS, "报销记录"), (_TID_STATES, "执行/等待状态"), (_TID_SPANS, "步骤span"))
+        ]
+        events.extend(self._events)
+        now = time.perf_counter()
+        for task_record in self._finished_tasks + list(self._tasks.values()):
+            common = {"name": task_record.name, "cat": "asyncio_task", "id": task_record.number, "pid": pid,
+                      "tid": _TID_RECORDS}
+            events.append({**common, "ph": "b", "ts": round((task_record.start - self._origin) * 1e6, 1),
+                           "args": {"parent_task": task_record.parent}})
+            end = task_record.end if task_record.end is not None else now
+            events.append({**common, "ph": "e", "ts": round((end - self._origin) * 1e6, 1),
+                           "args": {"outcome": task_record.outcome}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    # ---- 输出 ----
+
+    def write_outputs(self) -> List[str]:
+        """写入火焰图折叠栈文件（.folded）和Chrome trace文件（.trace.json）"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(self.output_dir, f"profile_{time.strftime('%Y%m%d_%H%M%S')}")
+        folded_file, trace_file = f"{prefix}.folded", f"{prefix}.trace.json"
+        try:
+            with open(folded_file, 'w', encoding='utf-8') as f:
+                for stack, count in sorted(self.folded.items()):
+                    f.write(f"{stack} {count}\n")
+            with open(trace_file, 'w', encoding='utf-8') as f:
+                json.dump(self.chrome_trace(), f, ensure_ascii=False)
+        except OSError as e:
+            logger.warning(f"写入性能剖析文件失败: {e}")
+            return []
+        self.output_files = [folded_file, trace_file]
+        logger.info(f"性能剖析文件: 火焰图 {folded_file}，Chrome trace {trace_file}")
+        return self.output_files
+
+    @staticmethod
+    def _shares(counts: Counter) -> str:
+        total = sum(counts.values())
+        return " / ".join(f"{label} {counts[state] / total:.0%}" for state, label in STATE_LABELS.items())
+
+    def log_summary(self, top_n: int = None) -> None:
+        """输出各状态占比、每条记录的占比和Python热点函数"""
+        if not self.sample_count:
+            return
+        top_n = config.PROFILE_SUMMARY_TOP if top_n is None else top_n
+        logger.info(f"性能剖析: {self.sample_count} 个样本，{self._shares(self.state_counts)}")
+        for record, counts in self.record_states.items():
+            seconds = sum(counts.values()) * self.interval
+            logger.info(f"  序号 {record}: 约 {seconds:.1f}秒，{self._shares(counts)}")
+        if self.hot_functions:
+            logger.info("Python执行样本最多的函数:")
+            for function, count in self.hot_functions.most_common(top_n):
+                logger.info(f"  {function}: {count} 个样本")
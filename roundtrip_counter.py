@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Playwright往返次数统计
+用代理包装page/frame/locator，每次调用异步方法（count、fill、click、wait_for_selector、evaluate等，
+每次都是一次与浏览器之间的往返）时按操作和调用方法计数，并按报销记录汇总
+"""
+
+import sys
+import inspect
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 需要包装的Playwright对象类型（返回这些对象的属性和方法会继续被包装）
+_WRAPPED_TYPES = ("Page", "Frame", "Locator", "FrameLocator", "ElementHandle", "Keyboard", "Mouse")
+
+
+def _is_wrappable(value) -> bool:
+    return type(value).__name__ in _WRAPPED_TYPES and type(value).__module__.startswith("playwright")
+
+
+# 代为发起Playwright调用的辅助模块，往返次数归属到调用这些模块的自动化方法
+_HELPER_MODULES = frozenset({
+    __name__, "negative_cache", "selector_race", "dom_batch", "date_fill", "field_probe",
+    "dropdown_options", "bank_cards", "strategy_memory", "memory_monitor",
+})
+
+
+def _calling_method() -> str:
+    """找到本模块和辅助模块之外的第一个调用方（即发起调用的自动化方法）"""
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals.get("__name__") in _HELPER_MODULES:
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    return frame.f_code.co_name
+
+
+class RoundTripCounter:
+    """按操作、调用方法和报销记录统计往返次数"""
+
+    def __init__(self):
+        self.by_operation: Counter = Counter()
+        self.by_caller: Counter = Counter()
+        self.by_caller_operation: Counter = Counter()
+        # [(记录标签, 该记录的往返次数)]
+        self.records: List[Tuple[str, int]] = []
+        self._record_label: Optional[str] = None
+        self._record_count = 0
+
+    @property
+    def total(self) -> int:
+        return sum(self.by_operation.values())
+
+    def wrap(self, target):
+        """包装Playwright的Page（或Frame/Locator），之后通过返回的对象发起的调用都会计数"""
+        if isinstance(target, _CountingProxy) or not _is_wrappable(target):
+            return target
+        return _CountingProxy(target, self)
+
+    def record_call(self, operation: str, caller: str) -> None:
+        self.by_operation[operation] += 1
+        self.by_caller[caller] += 1
+        self.by_caller_operation[(caller, operation)] += 1
+        if self._record_label is not None:
+            self._record_count += 1
+
+    @contextmanager
+    def record(self, label: str):
+        """
+        统计一条报销记录期间的往返次数
+
+        Args:
+            label: 记录标签（如序号）
+        """
+        self._record_label, self._record_count = str(label), 0
+        try:
+            yield
+        finally:
+            self.records.append((self._record_label, self._record_count))
+            logger.info(f"记录 {self._record_label} 的Playwright往返次数: {self._record_count}")
+            self._record_label = None
+
+    def snapshot(self) -> Dict:
+        """当前统计结果（可写入基准测试结果或在测试中断言）"""
+        per_record = [count for _, count in self.records]
+        return {
+            "total": self.total,
+            "by_operation": dict(self.by_operation),
+            "by_caller": dict(self.by_caller),
+            "per_record": dict(self.records),
+            "per_record_mean": sum(per_record) / len(per_record) if per_record else 0.0,
+        }
+
+    def log_report(self, top_n: int = 10) -> None:
+        """输出按操作统计的往返次数和往返次数最多的调用方法"""
+        if not self.total:
+            return
+        operations = ", ".join(f"{operation}={count}" for operation, count in self.by_operation.most_common())
+        logger.info(f"Playwright往返次数: 共 {self.total} 次 ({operations})")
+        if self.records:
+            per_record = [count for _, count in self.records]
+            logger.info(f"每条记录的往返次数: 平均 {sum(per_record) / len(per_record):.1f}, 最多 {max(per_record)}")
+        logger.info("往返次数最多的调用方法:")
+        for caller, count in self.by_caller.most_common(top_n):
+            detail = ", ".join(f"{operation}={n}" for (name, operation), n in self.by_caller_operation.most_common()
+                               if name == caller)
+            logger.info(f"  {caller}: {count} ({detail})")
+
+
+class _CountingProxy:
+    """Playwright对象的计数代理：异步方法计数，返回的Playwright对象继续包装，其他属性直接转发"""
+
+    __slots__ = ("_target", "_counter")
+
+    def __init__(self, target, counter: RoundTripCounter):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_counter", counter)
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        counter = self._counter
+        if inspect.iscoroutinefunction(value):
+            async def counted(*args, **kwargs):
+                counter.record_call(name, _calling_method())
+                return counter.wrap(await value(*args, **kwargs))
+            return counted
+        if callable(value) and not _is_wrappable(value):
+            def forwarded(*args, **kwargs):
+                result = value(*args, **kwargs)
+                return counter.wrap(result)
+            return forwarded
+        if isinstance(value, list):
+            return [counter.wrap(item) for item in value]
+        return counter.wrap(value)
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    # 与被包装对象视为同一对象（用作字典键、与事件回调中的原始frame比较）
+    def __eq__(self, other):
+        if isinstance(other, _CountingProxy):
+            other = other._target
+        return self._target == other
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __repr__(self):
+        return f"<counted {self._target!r}>"
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+选择器竞速等待
+同时等待多个 (frame, 选择器) 组合，返回最先出现的一个并取消其余等待，整体只有一个超时时间
+"""
+
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SelectorRaceResult:
+    """竞速结果"""
+    target: Any          # 匹配到的Page或Frame
+    target_index: int    # 在传入列表中的序号
+    selector: str        # 匹配到的选择器
+    elapsed: float       # 从开始等待到匹配的耗时（秒）
+
+
+async def race_selectors(targets: Sequence[Any], selectors: Iterable[str], timeout: float,
+                         state: str = "visible") -> Optional[SelectorRaceResult]:
+    """
+    在所有 (frame, 选择器) 组合上并发等待，返回最先匹配的组合
+
+    Args:
+        targets: Page或Frame列表
+        selectors: 选择器列表
+        timeout: 整体超时时间（毫秒）
+        state: 等待的元素状态，同wait_for_selector
+
+    Returns:
+        最先匹配的结果，整体超时或全部失败时返回None
+    """
+    selectors = list(selectors)
+    start_time = time.perf_counter()
+
+    async def wait_one(target_index: int, target: Any, selector: str) -> SelectorRaceResult:
+        await target.wait_for_selector(selector, timeout=timeout, state=state)
+        return SelectorRaceResult(target, target_index, selector, time.perf_counter() - start_time)
+
+    tasks: List[asyncio.Task] = [
+        asyncio.create_task(wait_one(target_index, target, selector))
+        for target_index, target in enumerate(targets)
+        for selector in selectors
+    ]
+    if not tasks:
+        return None
+
+    result = None
+    pending = set(tasks)
+    deadline = start_time + timeout / 1000
+    try:
+        while pending and result is None:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            # 同一批完成的任务都要读取结果或异常，否则失败任务的异常会在回收时报"从未读取"
+            for task in done:
+                if task.cancelled() or task.exception() is not None:
+                    # 单个组合失败（超时、frame已分离等）不影响其他组合
+                    continue
+                if result is None:
+                    result = task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    if result:
+        logger.debug(f"选择器竞速: {result.selector} 在第 {result.target_index} 个frame中出现，耗时 {result.elapsed:.2f}s")
+    else:
+        logger.debug(f"选择器竞速: {len(tasks)} 个组合在 {timeout / 1000:.1f}s 内均未出现")
+    return result
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+步骤计时追踪
+每个操作（单元格、出差人信息块的各阶段等）记录为一个span，包含序号、行、列标题、元素ID、操作类型、
+所在frame、查找策略、尝试次数、等待时间/实际执行时间和结果，由后台线程写入JSONL文件，运行结束时汇总最慢的步骤
+"""
+
+import json
+import time
+import queue
+import asyncio
+import logging
+import threading
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 当前正在执行的span（每个asyncio任务独立）
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+# 追加到之后所有span中的上下文字段（如序号、行号）
+_trace_context: ContextVar[Dict] = ContextVar("trace_context", default={})
+
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """一个操作的计时记录"""
+
+    def __init__(self, operation: str, parent: Optional["Span"], fields: Dict):
+        self.span_id = next(_span_ids)
+        self.operation = operation
+        self.parent = parent
+        self.fields = fields
+        self.attempts = 1
+        self.outcome = "ok"
+        self.wait_time = 0.0
+        self.start_wall = time.time()
+        self.start = time.perf_counter()
+        self.duration = 0.0
+
+    @property
+    def active_time(self) -> float:
+        return max(0.0, self.duration - self.wait_time)
+
+    def to_dict(self) -> Dict:
+        record = {
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "operation": self.operation,
+        }
+        record.update(self.fields)
+        record.update({
+            "attempts": self.attempts,
+            "outcome": self.outcome,
+            "start": round(self.start_wall, 3),
+            "duration": round(self.duration, 4),
+            "wait_time": round(self.wait_time, 4),
+            "active_time": round(self.active_time, 4),
+        })
+        return record
+
+
+def current_span() -> Optional[Span]:
+    """当前正在执行的span"""
+    return _current_span.get()
+
+
+def annotate(**fields) -> None:
+    """
+    为当前span补充字段（如 frame、strategy、element_id、operation、attempts、outcome）
+
+    不在span中时忽略
+    """
+    span = _current_span.get()
+    if span is None:
+        return
+    if "operation" in fields:
+        span.operation = fields.pop("operation")
+    if "attempts" in fields:
+        span.attempts = fields.pop("attempts")
+    if "outcome" in fields:
+        span.outcome = fields.pop("outcome")
+    span.fields.update(fields)
+
+
+def set_trace_context(**fields) -> None:
+    """设置之后创建的span共有的字段（如 sequence、row），值为None时删除"""
+    context = dict(_trace_context.get())
+    for key, value in fields.items():
+        if value is None:
+            context.pop(key, None)
+        else:
+            context[key] = value
+    _trace_context.set(context)
+
+
+def add_wait(seconds: float) -> None:
+    """把一段等待时间计入当前span及其所有上级span"""
+    span = _current_span.get()
+    while span is not None:
+        span.wait_time += seconds
+        span = span.parent
+
+
+async def traced_sleep(seconds: float) -> None:
+    """固定等待，等待时间计入当前span的等待时间"""
+    start = time.perf_counter()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        add_wait(time.perf_counter() - start)
+
+
+class StepTracer:
+    """span的创建、后台写入和汇总"""
+
+    def __init__(self, trace_file: str = None, enabled: bool = None):
+        """
+        Args:
+            trace_file: JSONL追踪文件路径
+            enabled: 是否写入追踪文件（关闭时span仍然计时，但不写入也不汇总）
+        """
+        self.trace_file = trace_file or config.STEP_TRACE_FILE
+        self.enabled = config.STEP_TRACE_ENABLED if enabled is None else enabled
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        # 顶层span的结果，用于运行结束时汇总（子span只写入文件）
+        self.finished: List[Dict] = []
+        self.span_count = 0
+        # 正在执行的span（按开始顺序），用于把浏览器事件等不在任务上下文中的记录归属到当前操作
+        self.open_spans: List[Span] = []
+        # span结束时的回调（如性能剖析的时间线），不受enabled影响
+        self.listeners: List[Callable[[Span], None]] = []
+
+    def start(self) -> None:
+        """启动后台写入线程"""
+        if not self.enabled or self._writer is not None:
+            return
+        self._writer = threading.Thread(target=self._write_loop, name="step-trace-writer", daemon=True)
+        self._writer.start()
+        logger.info(f"步骤追踪写入: {self.trace_file}")
+
+    def _write_loop(self) -> None:
+        try:
+            with open(self.trace_file, 'a', encoding='utf-8') as f:
+                while True:
+                    record = self._queue.get()
+                    if record is None:
+                        break
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    if self._queue.empty():
+                        f.flush()
+        except OSError as e:
+            logger.warning(f"写入步骤追踪文件失败: {e}")
+
+    def close(self) -> None:
+        """写完队列中剩余的记录并停止写入线程"""
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join(timeout=5)
+        self._writer = None
+
+    @contextmanager
+    def span(self, operation: str, **fields):
+        """
+        记录一个操作；span中抛出的异常会记录为error后继续抛出
+
+        Args:
+            operation: 操作类型（进入span后可通过annotate修改）
+            **fields: 其他字段（title、element_id等）
+        """
+        parent = _current_span.get()
+        span = Span(operation, parent, {**_trace_context.get(), **fields})
+        token = _current_span.set(span)
+        self.open_spans.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.outcome = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+            span.fields.setdefault("error", str(e)[:200])
+            raise
+        finally:
+            span.duration = time.perf_counter() - span.start
+            _current_span.reset(token)
+            self.open_spans.remove(span)
+            for listener in self.listeners:
+                listener(span)
+            self._finish(span)
+
+    def innermost_open_span(self) -> Optional[Span]:
+        """最近开始且尚未结束的span"""
+        return self.open_spans[-1] if self.open_spans else None
+
+    def emit(self, record: Dict) -> None:
+        """把其他记录（如网络请求）写入同一个追踪文件"""
+        if self.enabled and self._writer is not None:
+            self._queue.put(record)
+
+    def _finish(self, span: Span) -> None:
+        if not self.enabled:
+            return
+        self.span_count += 1
+        record = span.to_dict()
+        if span.parent is None:
+            self.finished.append(record)
+        if self._writer is not None:
+            self._queue.put(record)
+
+    def slowest(self, top_n: int = None) -> List[Dict]:
+        """耗时最长的顶层步骤"""
+        top_n = config.STEP_TRACE_SUMMARY_TOP if top_n is None else top_n
+        return sorted(self.finished, key=lambda record: record["duration"], reverse=True)[:top_n]
+
+    def log_summary(self, top_n: int = None) -> None:
+        """输出总耗时、等待占比和最慢的步骤"""
+        if not self.finished:
+            return
+        total = sum(record["duration"] for record in self.finished)
+        waited = sum(record["wait_time"] for record in self.finished)
+        wait_ratio = waited / total if total else 0.0
+        logger.info(f"步骤追踪: {len(self.finished)} 个步骤（共 {self.span_count} 个span），"
+                    f"总耗时 {total:.1f}秒，其中固定等待 {waited:.1f}秒 ({wait_ratio:.0%})")
+        for record in self.slowest(top_n):
+            logger.info(f"  {record['duration']:.2f}秒 (等待 {record['wait_time']:.2f}秒) "
+                        f"序号={record.get('sequence')} 行={record.get('row')} {record['operation']} "
+                        f"{record.get('title', '')} {record.get('element_id', '')} -> {record['outcome']}")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+元素查找策略记忆
+按 (页面角色, 目标) 记录上次成功的查找策略，下次优先尝试；连续多次所有策略都失败的目标在本次运行中
+一段时间内标记为不可用，直接返回失败
+"""
+
+import os
+import json
+import time
+import logging
+from typing import Dict, List, Sequence
+from urllib.parse import urlparse
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def frame_name(frame) -> str:
+    """frame地址中的文件名（如 main2.jsp），不含查询参数"""
+    path = urlparse(frame.url).path
+    return path.rsplit('/', 1)[-1] if path else ""
+
+
+def page_role(page) -> str:
+    """
+    根据页面中各frame的地址判断页面角色（如 home.jsp+main2.jsp）
+
+    Args:
+        page: Playwright页面
+    """
+    names = {frame_name(frame) for frame in page.frames} - {""}
+    return "+".join(sorted(names)) or "blank"
+
+
+class StrategyMemory:
+    """按 (页面角色, 目标) 记录成功策略，保存到JSON文件；不可用目标只在本次运行中有效，不保存"""
+
+    def __init__(self, memory_file: str = None, dead_ttl: float = None, dead_after: int = None):
+        """
+        Args:
+            memory_file: 持久化JSON文件路径
+            dead_ttl: 不可用目标的标记时长（秒）
+            dead_after: 连续失败多少次后标记为不可用
+        """
+        self.memory_file = memory_file or config.STRATEGY_MEMORY_FILE
+        self.dead_ttl = config.DEAD_TARGET_TTL if dead_ttl is None else dead_ttl
+        self.dead_after = config.DEAD_TARGET_FAILURES if dead_after is None else dead_after
+        self.entries: Dict[str, dict] = {}
+        # 本次运行中连续失败的次数和不可用标记（不写入文件，页面在两次运行之间可能已恢复）
+        self._failure_streaks: Dict[str, int] = {}
+        self._dead_until: Dict[str, float] = {}
+        self._dirty = False
+        self.load()
+
+    @staticmethod
+    def _key(role: str, target: str) -> str:
+        return f"{role}|{target}"
+
+    def load(self) -> None:
+        """从JSON文件加载（忽略旧版本文件中保存的不可用标记）"""
+        if not os.path.exists(self.memory_file):
+            return
+        try:
+            with open(self.memory_file, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+            logger.info(f"加载查找策略记录: {len(self.entries)} 个目标")
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取查找策略记录失败: {e}")
+            self.entries = {}
+        for entry in self.entries.values():
+            entry.pop("dead_until", None)
+
+    def save(self) -> None:
+        """保存到JSON文件"""
+        try:
+            with open(self.memory_file, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"保存查找策略记录失败: {e}")
+
+    def flush(self) -> None:
+        """保存尚未写入文件的计数（运行结束时调用）"""
+        if self._dirty:
+            self.save()
+
+    def order(self, role: str, target: str, strategies: Sequence[str]) -> List[str]:
+        """
+        返回策略尝试顺序：上次成功的策略在前，其余按成功次数和原顺序排列
+
+        Args:
+            role: 页面角色
+            target: 目标（如导览框的值、按钮的btnName）
+            strategies: 策略名称（原始顺序）
+        """
+        entry = self.entries.get(self._key(role, target))
+        if not entry:
+            return list(strategies)
+        wins = entry.get("wins", {})
+        winner = entry.get("winner")
+        return sorted(
+            strategies,
+            key=lambda name: (name != winner, -wins.get(name, 0), strategies.index(name))
+        )
+
+    def is_dead(self, role: str, target: str) -> bool:
+        """目标是否在不可用标记有效期内"""
+        return self._dead_until.get(self._key(role, target), 0) > time.time()
+
+    def record_success(self, role: str, target: str, strategy: str) -> None:
+        """记录成功的策略，并清除连续失败次数和不可用标记；只有成功策略变化时才立即写入文件"""
+        key = self._key(role, target)
+        self._failure_streaks.pop(key, None)
+        self._dead_until.pop(key, None)
+        entry = self.entries.setdefault(key, {})
+        changed = entry.get("winner") != strategy
+        entry["winner"] = strategy
+        entry.setdefault("wins", {})
+        entry["wins"][strategy] = entry["wins"].get(strategy, 0) + 1
+        self._dirty = True
+        if changed:
+            logger.info(f"记录查找策略: {target} @ {role} -> {strategy}")
+            self.save()
+
+    def record_failure(self, role: str, target: str) -> None:
+        """所有策略都失败时记录一次；连续失败dead_after次后，把目标标记为不可用"""
+        key = self._key(role, target)
+        entry = self.entries.setdefault(key, {})
+        entry["failures"] = entry.get("failures", 0) + 1
+        self._dirty = True
+        streak = self._failure_streaks.get(key, 0) + 1
+        self._failure_streaks[key] = streak
+        if streak >= self.dead_after:
+            self._dead_until[key] = time.time() + self.dead_ttl
+            logger.info(f"标记不可用目标: {target} @ {role}（连续失败 {streak} 次，{self.dead_ttl:.0f}秒内直接跳过）")
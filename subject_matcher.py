@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+科目本地匹配索引
+基于字符n-gram的TF-IDF，对科目名称和含义说明建立索引，在调用LLM之前先做本地匹配
+"""
+
+import math
+import re
+import unicodedata
+import logging
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# 归一化时去掉的字符：空白和常见中英文标点
+_STRIP_PATTERN = re.compile(r"[\s\-_/\\|,，.。;；:：、'\"“”‘’()（）\[\]【】<>《》]+")
+
+
+def normalize_subject_text(text) -> str:
+    """
+    归一化科目文本（全角转半角、去空白和标点、小写）
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        归一化后的文本
+    """
+    if text is None:
+        return ""
+    text = unicodedata.normalize("NFKC", str(text)).lower()
+    if text == "nan":
+        return ""
+    return _STRIP_PATTERN.sub("", text)
+
+
+def char_ngrams(text: str, ngram_sizes: Tuple[int, ...] = (1, 2, 3)) -> List[str]:
+    """
+    生成字符n-gram列表（中文按单字切分，不依赖分词）
+
+    Args:
+        text: 已归一化的文本
+        ngram_sizes: n-gram长度
+
+    Returns:
+        n-gram列表（可重复，用于计算词频）
+    """
+    grams = []
+    for n in ngram_sizes:
+        if len(text) < n:
+            continue
+        grams.extend(text[i:i + n] for i in range(len(text) - n + 1))
+    return grams
+
+
+@dataclass
+class SubjectMatchResult:
+    """本地匹配结果"""
+    name: Optional[str]
+    confidence: float
+    margin: float
+    method: str
+    candidates: List[Tuple[str, float]] = field(default_factory=list)
+    is_confident: bool = False
+
+
+class SubjectMatcher:
+    """科目名称/含义说明的本地匹配索引"""
+
+    def __init__(self, subject_mapping: Dict[str, dict], name_weight: int = 2,
+                 ngram_sizes: Tuple[int, ...] = (1, 2, 3)):
+        """
+        建立匹配索引
+
+        Args:
+            subject_mapping: 科目映射表 {科目名称: {'input_id': ..., 'description': ...}}
+            name_weight: 科目名称相对于含义说明的词频权重
+            ngram_sizes: n-gram长度
+        """
+        self.ngram_sizes = ngram_sizes
+        self.names: List[str] = []
+        self.exact_index: Dict[str, str] = {}
+        self.inverted_index: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        self.idf: Dict[str, float] = {}
+
+        documents = []
+        for subject_name, mapping_info in subject_mapping.items():
+            description = ""
+            if isinstance(mapping_info, dict):
+                description = mapping_info.get("description", "") or ""
+            normalized_name = normalize_subject_text(subject_name)
+            if not normalized_name:
+                continue
+
+            self.names.append(subject_name)
+            # 同名归一化冲突时保留第一个
+            self.exact_index.setdefault(normalized_name, subject_name)
+
+            term_counts = Counter()
+            for gram in char_ngrams(normalized_name, ngram_sizes):
+                term_counts[gram] += name_weight
+            term_counts.update(char_ngrams(normalize_subject_text(description), ngram_sizes))
+            documents.append(term_counts)
+
+        # 计算IDF（平滑）
+        doc_count = len(documents)
+        document_frequency = Counter()
+        for term_counts in documents:
+            document_frequency.update(term_counts.keys())
+        self.idf = {
+            gram: math.log((1 + doc_count) / (1 + df)) + 1.0
+            for gram, df in document_frequency.items()
+        }
+
+        # 建立倒排索引（向量已做L2归一化，点积即为余弦相似度）
+        for doc_idx, term_counts in enumerate(documents):
+            weights = {gram: count * self.idf[gram] for gram, count in term_counts.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for gram, weight in weights.items():
+                self.inverted_index[gram].append((doc_idx, weight / norm))
+
+        logger.info(f"科目本地匹配索引建立完成: {len(self.names)} 个科目, {len(self.inverted_index)} 个n-gram")
+
+    def rank(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """
+        对查询文本进行排序，返回候选科目及相似度
+
+        Args:
+            query: 查询文本（如报销单中的预约科目）
+            top_k: 返回的候选数量
+
+        Returns:
+            [(科目名称, 相似度)]，按相似度降序
+        """
+        normalized_query = normalize_subject_text(query)
+        if not normalized_query or not self.names:
+            return []
+
+        query_counts = Counter(char_ngrams(normalized_query, self.ngram_sizes))
+        query_weights = {
+            gram: count * self.idf[gram]
+            for gram, count in query_counts.items() if gram in self.idf
+        }
+        if not query_weights:
+            return []
+        query_norm = math.sqrt(sum(w * w for w in query_weights.values()))
+
+        scores: Dict[int, float] = defaultdict(float)
+        for gram, query_weight in query_weights.items():
+            for doc_idx, doc_weight in self.inverted_index[gram]:
+                scores[doc_idx] += query_weight * doc_weight
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(self.names[doc_idx], score / query_norm) for doc_idx, score in ranked]
+
+    def resolve(self, query: str, margin: float = None, min_score: float = None,
+                top_k: int = 5) -> SubjectMatchResult:
+        """
+        解析查询文本对应的科目，并判断本地结果是否足够可靠
+
+        Args:
+            query: 查询文本
+            margin: 第一候选与第二候选相似度的最小差值
+            min_score: 第一候选的最低相似度
+            top_k: 候选数量
+
+        Returns:
+            SubjectMatchResult，is_confident为False时应交给LLM判断
+        """
+        margin = config.SUBJECT_MATCH_MARGIN if margin is None else margin
+        min_score = config.SUBJECT_MATCH_MIN_SCORE if min_score is None else min_score
+
+        # 快速路径：归一化后名称完全一致
+        exact_name = self.exact_index.get(normalize_subject_text(query))
+        if exact_name:
+            return SubjectMatchResult(
+                name=exact_name, confidence=1.0, margin=1.0, method="exact",
+                candidates=[(exact_name, 1.0)], is_confident=True
+            )
+
+        candidates = self.rank(query, top_k=top_k)
+        if not candidates:
+            return SubjectMatchResult(name=None, confidence=0.0, margin=0.0, method="tfidf")
+
+        top_name, top_score = candidates[0]
+        second_score = candidates[1][1] if len(candidates) > 1 else 0.0
+        top_margin = top_score - second_score
+        return SubjectMatchResult(
+            name=top_name,
+            confidence=top_score,
+            margin=top_margin,
+            method="tfidf",
+            candidates=candidates,
+            is_confident=top_score >= min_score and top_margin >= margin
+        )
+
+
+class AhoCorasick:
+    """Aho–Corasick多模式匹配自动机，支持分块增量输入（用于流式LLM响应）"""
+
+    def __init__(self, patterns: List[str]):
+        """
+        构建自动机
+
+        Args:
+            patterns: 模式串列表（如已知科目名称）
+        """
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[str]] = [[]]
+        self.state = 0
+
+        for pattern in patterns:
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                next_node = self.goto[node].get(ch)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto[node][ch] = next_node
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                node = next_node
+            if pattern not in self.output[node]:
+                self.output[node].append(pattern)
+
+        # 按层次遍历建立失败指针（第一层节点的失败指针为根节点）
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(ch, 0)
+                self.output[child].extend(self.output[self.fail[child]])
+
+    def reset(self) -> None:
+        """重置匹配状态"""
+        self.state = 0
+
+    def feed(self, text: str) -> List[str]:
+        """
+        输入一段文本（可以是流式响应的一个分块），返回在这段文本中结束的所有匹配
+
+        Args:
+            text: 新到达的文本
+
+        Returns:
+            匹配到的模式串列表（按出现顺序）
+        """
+        matches = []
+        node = self.state
+        for ch in text:
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            if self.output[node]:
+                matches.extend(self.output[node])
+        self.state = node
+        return matches
+
+
+class StreamingSubjectDetector:
+    """在流式LLM响应中检测已知科目名称"""
+
+    def __init__(self, subject_names: List[str]):
+        """
+        Args:
+            subject_names: 已知科目名称列表
+        """
+        names = [name for name in dict.fromkeys(subject_names) if name]
+        self.automaton = AhoCorasick(names)
+        # 被其他科目名称包含的名称（如"差旅费"与"国际差旅费"）匹配到时还不能确定，需要等待后续文本
+        self.ambiguous = {
+            name for name in names
+            if any(name != other and name in other for other in names)
+        }
+        self.best_match: Optional[str] = None
+
+    def feed(self, text: str) -> Optional[str]:
+        """
+        输入新到达的文本
+
+        Args:
+            text: 流式响应分块
+
+        Returns:
+            出现无歧义匹配时返回科目名称，否则返回None
+        """
+        for name in self.automaton.feed(text):
+            if name not in self.ambiguous:
+                self.best_match = name
+                return name
+            if self.best_match is None or len(name) > len(self.best_match):
+                self.best_match = name
+        return None
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能剖析的等待分类和事件循环空闲判断测试
+空闲判断使用构造的帧，不依赖当前平台的事件循环实现
+"""
+
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+import profiler
+from step_trace import traced_sleep
+
+
+def fake_frame(module: str, name: str):
+    """只包含剖析用到的属性的帧"""
+    return SimpleNamespace(f_globals={"__name__": module}, f_code=SimpleNamespace(co_name=name, co_qualname=name))
+
+
+LOOP_STACK = [
+    fake_frame("__main__", "<module>"),
+    fake_frame("asyncio.runners", "run"),
+    fake_frame("asyncio.base_events", "run_until_complete"),
+    fake_frame("asyncio.base_events", "run_forever"),
+    fake_frame("asyncio.base_events", "_run_once"),
+]
+
+
+class LoopIdleTest(unittest.TestCase):
+
+    def test_selector_loop_waiting(self):
+        stack = LOOP_STACK + [fake_frame("selectors", "select")]
+        self.assertTrue(profiler._is_loop_idle(stack))
+
+    def test_proactor_loop_waiting(self):
+        stack = LOOP_STACK + [fake_frame("asyncio.windows_events", "select"),
+                              fake_frame("asyncio.windows_events", "_poll")]
+        self.assertTrue(profiler._is_loop_idle(stack))
+
+    def test_loop_waiting_in_native_code(self):
+        self.assertTrue(profiler._is_loop_idle(LOOP_STACK))
+
+    def test_running_callback(self):
+        stack = LOOP_STACK + [fake_frame("asyncio.events", "_run"),
+                              fake_frame("login_automation", "ReimbursementAutomation.fill_input")]
+        self.assertFalse(profiler._is_loop_idle(stack))
+
+    def test_empty_stack(self):
+        self.assertFalse(profiler._is_loop_idle([]))
+
+
+class ClassifyWaitTest(unittest.TestCase):
+
+    def await_chain_of(self, coro):
+        """运行协程到第一次挂起，返回其await链"""
+        async def main():
+            task = asyncio.ensure_future(coro)
+            await asyncio.sleep(0)
+            try:
+                return profiler._await_chain(task)
+            finally:
+                task.cancel()
+        return asyncio.run(main())
+
+    def test_traced_sleep(self):
+        async def step():
+            await traced_sleep(10)
+
+        state, detail = profiler.classify_wait(self.await_chain_of(step()))
+        self.assertEqual((state, detail), (profiler.STATE_SLEEP, "traced_sleep"))
+
+    def test_asyncio_sleep(self):
+        state, detail = profiler.classify_wait(self.await_chain_of(asyncio.sleep(10)))
+        self.assertEqual((state, detail), (profiler.STATE_SLEEP, "asyncio.sleep"))
+
+    def test_other_wait(self):
+        async def step():
+            await asyncio.Event().wait()
+
+        state, _ = profiler.classify_wait(self.await_chain_of(step()))
+        self.assertEqual(state, profiler.STATE_OTHER)
+
+    def test_playwright_call(self):
+        frames = [fake_frame("login_automation", "ReimbursementAutomation.fill_input"),
+                  fake_frame("playwright.async_api._generated", "Page.fill"),
+                  fake_frame("playwright._impl._connection", "Channel.send")]
+        state, detail = profiler.classify_wait(frames)
+        self.assertEqual(state, profiler.STATE_PLAYWRIGHT)
+        self.assertEqual(detail, "playwright.async_api._generated.Page.fill")
+
+
+if __name__ == "__main__":
+    unittest.main()
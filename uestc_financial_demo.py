@@ -8,7 +8,7 @@
 import asyncio
 import json
 import os
-import requests
+import time
 from datetime import datetime
 from typing import Dict, List, Optional
 from dataclasses import dataclass
@@ -20,12 +20,21 @@ from playwright.async_api import async_playwright, Browser, Page
 # 导入配置
 import config
 import pandas as pd
+from subject_matcher import SubjectMatcher
+from ollama_client import OllamaClient
+from bank_cards import BANK_CARD_DIALOG_SELECTOR, read_bank_card_table, find_bank_card, click_bank_card
+from roundtrip_counter import RoundTripCounter
 CAPTCHA_MODULE = "manual"  # 手动输入验证码
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def estimate_prompt_tokens(text: str) -> int:
+    """估算提示词token数（中文字符按1个token计，其他字符约4个字符1个token）"""
+    cjk_count = sum(1 for ch in text if '\u4e00' <= ch <= '\u9fff' or '\uff00' <= ch <= '\uffef')
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
 @dataclass
 class UserInputData:
     """用户输入数据类"""
@@ -48,13 +57,34 @@ class ExpenseItem:
 class UESTCFinancialAutomation:
     """电子科技大学财务系统自动化"""
     
-    def __init__(self):
+    def __init__(self, system_config: Optional[dict] = None, project_config: Optional[dict] = None):
+        """
+        Args:
+            system_config: 财务系统地址、登录凭据和页面选择器，默认使用config.FINANCIAL_SYSTEM_CONFIG
+            project_config: 项目信息（系统名称、模块列表），默认使用config.PROJECT_CONFIG
+        """
         self.expenses: List[ExpenseItem] = []
         self.browser: Optional[Browser] = None
         self.page: Optional[Page] = None
-        self.config = config.FINANCIAL_SYSTEM_CONFIG
-        self.project_config = config.PROJECT_CONFIG
+        self.config = system_config if system_config is not None else config.FINANCIAL_SYSTEM_CONFIG
+        self.project_config = project_config if project_config is not None else config.PROJECT_CONFIG
         self.is_logged_in = False
+        # 当前正在处理的报销记录（read_excel_expense_data的结果）
+        self.current_expense_data: dict = {}
+        # 科目本地匹配索引（按科目映射表对象缓存）
+        self.subject_matcher: Optional[SubjectMatcher] = None
+        self._subject_matcher_key = None
+        # 已读取的科目映射表（文件修改时间, 映射表），文件不变时每条记录复用同一个对象
+        self._subject_mapping_cache: Optional[tuple] = None
+        # 本地LLM客户端
+        self.llm_client = OllamaClient()
+        # 启动浏览器之前预先完成的科目分类结果 {预约科目: 科目名称}
+        self.subject_classification: Dict[str, str] = {}
+        self.subject_classification_task: Optional[asyncio.Task] = None
+        # 模型预热任务（与浏览器启动、登录并行）
+        self.llm_warmup_task: Optional[asyncio.Task] = None
+        # Playwright往返次数统计
+        self.roundtrip_counter = RoundTripCounter()
         # 验证码处理方式：手动输入
         
     def read_excel_expense_data(self) -> dict:
@@ -201,6 +231,7 @@ class UESTCFinancialAutomation:
                 logger.error("无法读取Excel数据")
                 print("✗ 无法读取Excel数据")
                 return False
+            self.current_expense_data = expense_data
             
             logger.info(f"从Excel读取的数据: {expense_data}")
             print(f"✓ 从Excel读取的数据: {expense_data}")
@@ -271,13 +302,20 @@ class UESTCFinancialAutomation:
             return False
 
     def read_subject_mapping(self) -> dict:
-        """读取科目-输入框ID对应表"""
+        """读取科目-输入框ID对应表（文件没有修改时返回上次读取的映射表）"""
+        mapping_file = '科目-输入框id对应.xlsx'
+        try:
+            mtime = os.path.getmtime(mapping_file)
+        except OSError:
+            mtime = None
+        if mtime is not None and self._subject_mapping_cache and self._subject_mapping_cache[0] == mtime:
+            return self._subject_mapping_cache[1]
         try:
             import pandas as pd
             logger.info("正在读取科目-输入框ID对应表...")
             
             # 读取Excel文件
-            df = pd.read_excel('科目-输入框id对应.xlsx', engine='openpyxl')
+            df = pd.read_excel(mapping_file, engine='openpyxl')
             
             logger.info(f"Excel文件列名: {list(df.columns)}")
             logger.info(f"数据行数: {len(df)}")
@@ -317,6 +355,8 @@ class UESTCFinancialAutomation:
                         logger.info(f"映射: {subject_name} -> {input_id} (说明: {description})")
             
             logger.info(f"总共创建了 {len(subject_mapping)} 个映射关系")
+            if mtime is not None:
+                self._subject_mapping_cache = (mtime, subject_mapping)
             return subject_mapping
             
         except Exception as e:
@@ -542,12 +582,12 @@ class UESTCFinancialAutomation:
             return False
 
     async def handle_bank_card_selection(self) -> bool:
-        """处理银行卡选择对话框"""
+        """处理银行卡选择对话框（一次读取整个银行卡表格，匹配后只点击一次）"""
         try:
             logger.info("=== 处理银行卡选择对话框 ===")
             
-            # 读取Excel数据获取卡号信息
-            expense_data = self.read_excel_expense_data()
+            # 卡号来自当前正在处理的报销记录，未加载记录时才读取Excel
+            expense_data = self.current_expense_data or self.read_excel_expense_data()
             target_card_number = expense_data.get('card_number', '')
             
             if not target_card_number:
@@ -556,64 +596,26 @@ class UESTCFinancialAutomation:
             
             logger.info(f"目标卡号: {target_card_number}")
             
-            # 等待对话框完全加载
-            await asyncio.sleep(2)
+            # 等待对话框中的银行卡表格出现
+            try:
+                await self.page.wait_for_selector(f"{BANK_CARD_DIALOG_SELECTOR} input[type='radio']", timeout=2000)
+            except Exception:
+                logger.debug("等待银行卡单选按钮超时，直接读取对话框")
             
-            # 查找银行卡选择对话框
-            bank_dialog = self.page.locator("#paybankdiv")
-            if await bank_dialog.count() == 0:
+            cards = await read_bank_card_table(self.page)
+            if cards is None:
                 logger.warning("未找到银行卡选择对话框")
                 return True
             
-            # 查找所有银行卡选项
-            bank_rows = self.page.locator("#paybankdiv table tbody tr")
-            row_count = await bank_rows.count()
+            logger.info(f"找到 {len(cards)} 个银行卡选项")
             
-            logger.info(f"找到 {row_count} 个银行卡选项")
-            
-            # 跳过表头行，从第二行开始处理
-            for i in range(1, row_count):
-                try:
-                    row = bank_rows.nth(i)
-                    
-                    # 获取该行的银行卡信息
-                    cells = row.locator("td")
-                    if await cells.count() >= 4:
-                        # 获取姓名、卡号、卡类型、联行号
-                        name = await cells.nth(1).text_content()
-                        card_number = await cells.nth(2).text_content()
-                        card_type = await cells.nth(3).text_content()
-                        bank_info = await cells.nth(4).text_content()
-                        
-                        name = name.strip() if name else ""
-                        card_number = card_number.strip() if card_number else ""
-                        card_type = card_type.strip() if card_type else ""
-                        bank_info = bank_info.strip() if bank_info else ""
-                        
-                        logger.info(f"银行卡选项 {i}: 姓名={name}, 卡号={card_number}, 类型={card_type}, 联行号={bank_info}")
-                        
-                        # 匹配逻辑：检查卡号是否匹配
-                        if self.match_card_number(target_card_number, card_number):
-                            logger.info(f"✓ 找到匹配的银行卡: {card_number}")
-                            
-                            # 点击对应的单选按钮
-                            radio_button = row.locator("input[type='radio']")
-                            if await radio_button.count() > 0:
-                                await radio_button.click()
-                                logger.info("✓ 成功选择银行卡")
-                                print(f"\n✅ 已成功选择银行卡: {card_number}")
-                                
-                                # 等待选择生效
-                                await asyncio.sleep(1)
-                                return True
-                            else:
-                                logger.warning("未找到单选按钮")
-                        else:
-                            logger.debug(f"卡号不匹配: 目标={target_card_number}, 当前={card_number}")
-                
-                except Exception as e:
-                    logger.warning(f"处理银行卡选项 {i} 时出错: {e}")
-                    continue
+            card = find_bank_card(cards, target_card_number, self.match_card_number)
+            if card:
+                logger.info(f"✓ 找到匹配的银行卡: {card.card_number}")
+                await click_bank_card(self.page, card)
+                logger.info("✓ 成功选择银行卡")
+                print(f"\n✅ 已成功选择银行卡: {card.card_number}")
+                return True
             
             logger.warning("未找到匹配的银行卡")
             print(f"\n⚠️ 未找到匹配的银行卡，目标卡号: {target_card_number}")
@@ -817,41 +819,249 @@ class UESTCFinancialAutomation:
             logger.error(f"获取预约科目信息失败: {e}")
             return []
 
-    async def analyze_with_llm(self, appointment_subject: str, amount: float, subjects_info: list, subject_mapping: dict) -> dict:
-        """使用LLM分析并确定最合适的科目"""
-        try:
-            # 构建提示词
-            subjects_text = "\n".join([
-                f"- {subject['name']}: {subject['description']}" 
-                for subject in subjects_info
-            ])
-            
-            # 构建科目映射表信息（包含含义说明）
-            mapping_text = "\n".join([
-                f"- {subject}: {mapping_info['input_id']} (说明: {mapping_info.get('description', '无说明')})" 
-                for subject, mapping_info in subject_mapping.items()
-            ])
-            
-            prompt = f"""
-请根据以下信息，选择最合适的预约科目来填写金额：
+    def get_subject_matcher(self, subject_mapping: dict) -> SubjectMatcher:
+        """
+        获取科目本地匹配索引（同一个映射表对象复用已建立的索引）
+
+        read_subject_mapping在文件未修改时返回同一个映射表对象，文件修改后重新读取并新建映射表；
+        按对象本身（保留引用，避免id被复用）和科目数量判断是否变化，不在每次调用时遍历整个映射表
+        """
+        key = (subject_mapping, len(subject_mapping))
+        cached = self._subject_matcher_key
+        if self.subject_matcher is None or cached is None or cached[0] is not key[0] or cached[1] != key[1]:
+            self.subject_matcher = SubjectMatcher(subject_mapping)
+            self._subject_matcher_key = key
+        return self.subject_matcher
+
+    def build_subject_entry(self, subject_name: str, subjects_info: list, subject_mapping: dict) -> Optional[dict]:
+        """根据科目名称构建科目对象（优先使用页面/映射表中已有的科目信息）"""
+        for subject in subjects_info:
+            if subject["name"] == subject_name:
+                return subject
+        
+        mapping_info = subject_mapping.get(subject_name)
+        if not mapping_info:
+            return None
+        input_id = mapping_info['input_id']
+        return {
+            "id": f"mapped_{subject_name}",
+            "name": subject_name,
+            "description": mapping_info.get('description', f"科目映射表中的科目: {subject_name}"),
+            "input_selector": f"#{input_id}"
+        }
+
+    def build_subject_prompt(self, appointment_subject: str, amount: float, subjects_info: list, subject_mapping: dict) -> str:
+        """构建LLM提示词：先用本地索引筛选top-k候选科目，只发送候选科目的名称和含义说明"""
+        top_k = config.LLM_PROMPT_TOP_K
+        candidates = {}
+        for subject in subjects_info:
+            candidates.setdefault(subject["name"], subject.get("description", ""))
+        for subject_name, mapping_info in subject_mapping.items():
+            candidates.setdefault(subject_name, mapping_info.get("description", ""))
+        
+        # 使用本地索引排序，只保留前top_k个候选；没有任何重合时退回全部科目
+        shortlist = []
+        if candidates:
+            index_source = subject_mapping or {name: {"description": desc} for name, desc in candidates.items()}
+            ranked = self.get_subject_matcher(index_source).rank(appointment_subject, top_k=top_k)
+            shortlist = [name for name, _ in ranked if name in candidates]
+        if not shortlist:
+            shortlist = list(candidates.keys())
+        
+        subjects_text = "\n".join([
+            f"- {name}: {candidates[name]}" if candidates[name] else f"- {name}"
+            for name in shortlist
+        ])
+        
+        prompt = f"""
+请根据以下信息，从候选科目中选择最合适的一个预约科目来填写金额：
 
 **报销信息：**
 - 预约科目: {appointment_subject}
 - 金额: {amount}
 
-**可用的预约科目列表：**
+**候选预约科目：**
 {subjects_text}
 
-**科目-输入框ID对应表：**
-{mapping_text}
-
-请分析预约科目"{appointment_subject}"与上述科目列表的匹配度，选择最合适的一个科目。
-同时考虑科目映射表中的对应关系，确保选择的科目在映射表中存在对应的输入框ID。
+请分析预约科目"{appointment_subject}"与上述候选科目的匹配度，选择最合适的一个科目。
 只返回科目名称，不要其他解释。
 """
+        logger.info(f"LLM提示词: {len(shortlist)}/{len(candidates)} 个候选科目, {len(prompt)} 字符, 估算 {estimate_prompt_tokens(prompt)} tokens")
+        return prompt
+
+    def collect_workbook_subjects(self) -> List[str]:
+        """收集报销信息中所有不重复的预约科目（为空时与read_excel_expense_data一致使用默认值）"""
+        try:
+            df = pd.read_excel('报销信息.xlsx', sheet_name='Sheet_Baoxiao', engine='openpyxl')
+        except Exception as e:
+            logger.error(f"读取Excel文件失败: {e}")
+            return []
+        
+        if '预约科目' not in df.columns:
+            return ["差旅费"] if len(df) else []
+        
+        subjects = []
+        for value in df['预约科目']:
+            subject = str(value).strip() if pd.notna(value) and str(value).strip() != '' else "差旅费"
+            subjects.append(subject)
+        return list(dict.fromkeys(subjects))
+
+    def build_batch_subject_prompt(self, appointment_subjects: List[str], subject_mapping: dict) -> str:
+        """构建批量分类提示词：候选科目为各预约科目本地top-k候选的并集"""
+        matcher = self.get_subject_matcher(subject_mapping)
+        shortlist = []
+        for appointment_subject in appointment_subjects:
+            for name, _ in matcher.rank(appointment_subject, top_k=config.LLM_PROMPT_TOP_K):
+                if name not in shortlist:
+                    shortlist.append(name)
+        if not shortlist:
+            shortlist = list(subject_mapping.keys())
+        
+        subjects_text = "\n".join([
+            f"- {name}: {subject_mapping[name].get('description', '')}" if subject_mapping[name].get('description') else f"- {name}"
+            for name in shortlist
+        ])
+        appointments_text = "\n".join(f"- {subject}" for subject in appointment_subjects)
+        
+        prompt = f"""
+请为下列每个报销单中的预约科目，从候选科目中选择最合适的一个科目：
+
+**报销单中的预约科目：**
+{appointments_text}
+
+**候选预约科目：**
+{subjects_text}
+
+只返回一个JSON对象，键为报销单中的预约科目，值为选择的候选科目名称，不要其他解释。
+"""
+        logger.info(f"批量LLM提示词: {len(appointment_subjects)} 个预约科目, {len(shortlist)}/{len(subject_mapping)} 个候选科目, "
+                    f"{len(prompt)} 字符, 估算 {estimate_prompt_tokens(prompt)} tokens")
+        return prompt
+
+    def parse_batch_subject_response(self, response: str, appointment_subjects: List[str], subject_mapping: dict) -> Dict[str, str]:
+        """解析批量分类的JSON响应，只保留映射表中存在的科目"""
+        start = response.find("{")
+        end = response.rfind("}")
+        if start == -1 or end <= start:
+            logger.warning(f"批量分类响应中没有JSON对象: {response}")
+            return {}
+        try:
+            answers = json.loads(response[start:end + 1])
+        except json.JSONDecodeError as e:
+            logger.warning(f"批量分类响应JSON解析失败: {e}")
+            return {}
+        
+        classification = {}
+        for appointment_subject in appointment_subjects:
+            answer = str(answers.get(appointment_subject, "")).strip()
+            if answer in subject_mapping:
+                classification[appointment_subject] = answer
+            elif answer:
+                # 响应中带有多余文字时，取其中包含的最长科目名称
+                contained = [name for name in subject_mapping if name in answer]
+                if contained:
+                    classification[appointment_subject] = max(contained, key=len)
+        return classification
+
+    async def precompute_subject_classification(self) -> Dict[str, str]:
+        """
+        启动浏览器之前批量完成整个工作簿的科目分类
+        
+        先使用本地匹配，剩余的预约科目按LLM_BATCH_SIZE分块，每块一次LLM调用；
+        浏览器流程中analyze_with_llm直接查表
+        """
+        appointment_subjects = self.collect_workbook_subjects()
+        if not appointment_subjects:
+            return self.subject_classification
+        
+        subject_mapping = self.read_subject_mapping()
+        if not subject_mapping:
+            logger.warning("无法读取科目映射表，跳过批量科目分类")
+            return self.subject_classification
+        
+        start_time = time.perf_counter()
+        matcher = self.get_subject_matcher(subject_mapping)
+        pending = []
+        for appointment_subject in appointment_subjects:
+            match = matcher.resolve(appointment_subject)
+            if match.is_confident:
+                self.subject_classification[appointment_subject] = match.name
+            else:
+                pending.append(appointment_subject)
+        logger.info(f"批量科目分类: {len(appointment_subjects)} 个不重复预约科目, 本地匹配 {len(appointment_subjects) - len(pending)} 个, 待LLM分类 {len(pending)} 个")
+        
+        batch_size = max(1, config.LLM_BATCH_SIZE)
+        for i in range(0, len(pending), batch_size):
+            chunk = pending[i:i + batch_size]
+            prompt = self.build_batch_subject_prompt(chunk, subject_mapping)
+            response = await self.call_ollama_api(prompt)
+            if not response:
+                logger.warning(f"批量分类LLM调用失败，{len(chunk)} 个预约科目将在浏览器流程中逐个分析")
+                continue
+            classification = self.parse_batch_subject_response(response, chunk, subject_mapping)
+            self.subject_classification.update(classification)
+            missing = [subject for subject in chunk if subject not in classification]
+            if missing:
+                logger.warning(f"批量分类未返回以下预约科目的结果，将在浏览器流程中逐个分析: {missing}")
+        
+        logger.info(f"批量科目分类完成，耗时 {time.perf_counter() - start_time:.2f}s: {self.subject_classification}")
+        print(f"✓ 批量科目分类完成: {len(self.subject_classification)}/{len(appointment_subjects)} 个预约科目")
+        return self.subject_classification
+
+    def start_background_llm_tasks(self) -> None:
+        """启动模型预热和批量科目分类后台任务，不阻塞浏览器启动和登录"""
+        if self.llm_warmup_task is None:
+            self.llm_warmup_task = asyncio.create_task(asyncio.to_thread(self.llm_client.warm_up))
+        if self.subject_classification_task is None:
+            self.subject_classification_task = asyncio.create_task(self.precompute_subject_classification())
+
+    async def wait_for_llm_warmup(self) -> None:
+        """等待模型预热完成，避免第一次调用因模型加载超时"""
+        if self.llm_warmup_task and not self.llm_warmup_task.done():
+            logger.info("等待模型预热完成...")
+        if self.llm_warmup_task:
+            try:
+                await self.llm_warmup_task
+            except Exception as e:
+                logger.warning(f"模型预热任务异常: {e}")
+
+    async def wait_for_subject_classification(self) -> None:
+        """等待批量科目分类完成"""
+        if self.subject_classification_task:
+            try:
+                await self.subject_classification_task
+            except Exception as e:
+                logger.warning(f"批量科目分类任务异常: {e}")
+
+    async def analyze_with_llm(self, appointment_subject: str, amount: float, subjects_info: list, subject_mapping: dict) -> dict:
+        """使用LLM分析并确定最合适的科目（本地匹配足够可靠时不调用LLM）"""
+        try:
+            # 优先使用启动浏览器之前批量分类的结果
+            await self.wait_for_subject_classification()
+            classified_name = self.subject_classification.get(appointment_subject)
+            if classified_name:
+                classified_subject = self.build_subject_entry(classified_name, subjects_info, subject_mapping)
+                if classified_subject:
+                    logger.info(f"使用批量分类结果: {appointment_subject} -> {classified_name}，跳过LLM调用")
+                    return classified_subject
+            
+            # 先使用本地匹配索引，第一候选领先足够多时直接返回
+            if subject_mapping:
+                match = self.get_subject_matcher(subject_mapping).resolve(appointment_subject)
+                logger.info(f"本地匹配候选: {match.candidates} (方式: {match.method}, 置信度: {match.confidence:.3f}, 差值: {match.margin:.3f})")
+                if match.is_confident:
+                    local_subject = self.build_subject_entry(match.name, subjects_info, subject_mapping)
+                    if local_subject:
+                        logger.info(f"本地匹配到科目: {match.name}，跳过LLM调用")
+                        return local_subject
+                logger.info("本地匹配置信度不足，交给LLM判断")
+            
+            # 构建提示词（只包含本地索引筛选出的候选科目）
+            prompt = self.build_subject_prompt(appointment_subject, amount, subjects_info, subject_mapping)
             
             # 调用Ollama API
-            response = await self.call_ollama_api(prompt)
+            known_subjects = [subject["name"] for subject in subjects_info] + list(subject_mapping.keys())
+            response = await self.call_ollama_api(prompt, known_subjects)
             if not response:
                 logger.error("LLM API调用失败")
                 return None
@@ -911,23 +1121,17 @@ class UESTCFinancialAutomation:
             logger.error(f"LLM分析失败: {e}")
             return None
 
-    async def call_ollama_api(self, prompt: str) -> str:
-        """调用Ollama API"""
+    async def call_ollama_api(self, prompt: str, subject_names: Optional[List[str]] = None) -> str:
+        """
+        调用Ollama API
+        
+        传入已知科目名称且启用了流式提前结束时，使用流式调用，响应中出现科目名称后立即取消生成
+        """
         try:
-            url = "http://localhost:11434/api/generate"
-            data = {
-                "model": "llama2",
-                "prompt": prompt,
-                "stream": False
-            }
-            
-            response = requests.post(url, json=data, timeout=30)
-            if response.status_code == 200:
-                result = response.json()
-                return result.get("response", "").strip()
-            else:
-                logger.error(f"Ollama API调用失败: {response.status_code}")
-                return ""
+            await self.wait_for_llm_warmup()
+            if subject_names and config.LLM_STREAM_EARLY_STOP:
+                return await asyncio.to_thread(self.llm_client.generate_until_subject, prompt, subject_names)
+            return await asyncio.to_thread(self.llm_client.generate, prompt)
                 
         except Exception as e:
             logger.error(f"调用Ollama API失败: {e}")
@@ -1625,6 +1829,8 @@ class UESTCFinancialAutomation:
             logger.info("默认浏览器启动成功")
         
         self.page = await self.browser.new_page()
+        if config.ROUNDTRIP_COUNTER_ENABLED:
+            self.page = self.roundtrip_counter.wrap(self.page)
         
         # 设置用户代理
         await self.page.set_extra_http_headers({
@@ -2023,7 +2229,8 @@ class UESTCFinancialAutomation:
                             else:
                                 # 成功点击"已阅读并同意"按钮后，填写报销表单
                                 logger.info("✓ 成功点击'已阅读并同意'按钮，开始填写报销表单...")
-                                await self.fill_expense_form()
+                                with self.roundtrip_counter.record("fill_expense_form"):
+                                    await self.fill_expense_form()
                             
                         except Exception as e:
                             logger.warning(f"点击'已阅读并同意'按钮失败: {e}")
@@ -2198,6 +2405,9 @@ async def main():
     print("跳过用户输入，直接进入自动化演示...")
     
     try:
+        # 启动浏览器之前开始模型预热和批量科目分类（后台进行，与浏览器启动、登录并行）
+        automation.start_background_llm_tasks()
+        
         # 启动浏览器
         await automation.start_browser()
         
@@ -2231,6 +2441,8 @@ async def main():
     finally:
         # 关闭浏览器
         await automation.close_browser()
+        automation.llm_client.log_latency_summary()
+        automation.roundtrip_counter.log_report()
     
     print("\n=== 演示完成 ===")
     print("这个演示展示了如何自动化登录和操作电子科技大学财务综合信息门户")
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成报销信息生成器
+按种子生成与process_subsequences处理逻辑一致的报销信息.xlsx和对应的标题-ID.xlsx（模拟系统的元素ID）：
+出差人信息子序列（标记1，最多6个出差人，行程信息在第一个出差人行）、#科目/金额配对列、
+$按钮、$$校区radio、@导览框、*卡号尾号、等待列，下拉框的值取自config.DROPDOWN_FIELDS，日期在指定范围内。
+相同的种子和形状参数生成完全相同的文件，用于复现规模测试和正确性测试
+
+每条记录的行结构：
+- 第一行：（第一条记录的登录和导览框操作）申请报销单、基本信息；有出差人时为第一个出差人和行程信息
+- 其余出差人行：只有出差人字段，最后一个出差人行标记子序列结束
+- 操作行：下一步、科目/金额、转卡信息（每个收款人一行），最后一行为预约日期、校区、预约和返回
+  没有出差人时操作直接写在第一行之后（第一行同时包含第一个收款人）
+
+用法: python workload_generator.py --records 100 --seed 1 [--max-travelers 6] [--subject-pairs 3]
+"""
+
+import os
+import re
+import sys
+import random
+import logging
+import argparse
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import config
+from mock_portal import MAX_TRAVELERS, load_subject_grid, title_id_rows, mock_person_for, mock_cards_for
+
+logger = logging.getLogger(__name__)
+
+# 登录页使用的工号和密码（模拟系统不校验密码）
+LOGIN_UID = "5130008"
+LOGIN_PASSWORD = "Uestc418"
+
+# 默认输出文件（放在基准测试目录中，不覆盖真实的报销信息.xlsx和标题-ID.xlsx）
+DEFAULT_EXCEL_FILE = os.path.join(config.BENCHMARK_WORK_DIR, "synthetic_报销信息.xlsx")
+DEFAULT_MAPPING_FILE = os.path.join(config.BENCHMARK_WORK_DIR, "synthetic_标题-ID.xlsx")
+
+_REMARKS = ["参加学术会议", "项目调研", "实验材料采购", "设备维修", "课题组日常开支", "合作单位交流"]
+_SPECIAL_NOTES = ["", "", "无", "发票已核对", "含补开发票"]
+_DESTINATIONS = ["北京", "上海", "深圳", "西安", "武汉", "杭州", "南京", "重庆", "昆明", "长沙"]
+_PROJECT_GROUPS = ["ZHCG", "KYXM", "JXGG", "YJSY"]
+
+# 同名列在pandas读取时自动重命名为"列名.1"，生成时用后缀区分，写入Excel时去掉
+_DUPLICATE_SUFFIX = re.compile(r"\.\d+$")
+
+
+@dataclass
+class WorkloadShape:
+    """合成报销信息的形状参数"""
+    records: int = 10
+    travel_ratio: float = 0.5      # 含出差人信息子序列的记录比例
+    max_travelers: int = 3         # 每条出差记录的出差人数量上限（1~6）
+    subject_pairs: int = 2         # 科目/金额配对列的数量（每条记录使用1~subject_pairs对）
+    transfer_ratio: float = 0.5    # 支付方式为个人转卡（含转卡信息）的记录比例，其余记录从其他支付方式中选择
+    max_payees: int = 2            # 个人转卡记录的收款人数量上限
+    wait_seconds: float = 0        # 等待列的秒数，0时等待列留空
+    date_start: str = "2025-08-01"  # 出差日期范围
+    date_end: str = "2025-12-31"
+    max_trip_days: int = 5
+    include_login: bool = True     # 第一条记录是否包含登录和导览框操作
+    include_print: bool = False    # 预约后是否打印确认单（会弹出打印对话框）
+
+
+def workbook_columns(shape: WorkloadShape) -> List[str]:
+    """报销信息的列（同名列带.N后缀，与pandas读取后的列名一致）"""
+    columns = ["处理进度", config.SEQUENCE_COL, "登录界面工号", "登录界面密码", "登录按钮", "网上预约报账按钮", "等待",
+               "申请报销单按钮", "已阅读并同意按钮", "报销项目号", "附件张数", "支付方式", "备注", "特殊事项说明",
+               config.SUBSEQUENCE_START_COL, *config.TRAVELER_FIELDS.keys(),
+               "省份", "出差地点", "起", "迄", "飞机票", "住宿费", "是否安排伙食", "是否安排交通",
+               config.SUBSEQUENCE_END_COL, "下一步按钮1", "等待.1"]
+    for index in range(shape.subject_pairs):
+        suffix = f".{index}" if index else ""
+        columns += [f"科目{suffix}", f"金额{suffix}"]
+    columns += ["下一步按钮2", "转卡信息工号", "卡号尾号", "个人金额", "提交按钮",
+                "下一步按钮3", "日期", "校区", "预约按钮"]
+    if shape.include_print:
+        columns.append("打印确认单按钮")
+    columns.append("返回按钮")
+    return columns
+
+
+def display_columns(columns: List[str]) -> List[str]:
+    """写入Excel的表头（去掉同名列的.N后缀）"""
+    return [_DUPLICATE_SUFFIX.sub("", column) for column in columns]
+
+
+class WorkloadGenerator:
+    """按种子生成合成报销记录"""
+
+    def __init__(self, shape: WorkloadShape = None, seed: int = 0,
+                 subjects: Optional[List[Tuple[str, str]]] = None):
+        """
+        Args:
+            shape: 形状参数
+            seed: 随机种子
+            subjects: [(科目名称, 行ID)]，默认读取报销科目.txt（与模拟系统一致）
+        """
+        self.shape = shape or WorkloadShape()
+        if not 1 <= self.shape.max_travelers <= MAX_TRAVELERS:
+            raise ValueError(f"出差人数量上限应在1~{MAX_TRAVELERS}之间: {self.shape.max_travelers}")
+        self.seed = seed
+        self.subjects = subjects if subjects is not None else load_subject_grid()[1]
+        if len(self.subjects) < self.shape.subject_pairs:
+            raise ValueError(f"科目数量 {len(self.subjects)} 少于科目/金额配对列数 {self.shape.subject_pairs}")
+        self.columns = workbook_columns(self.shape)
+        self._random = random.Random(seed)
+        self._date_start = date.fromisoformat(self.shape.date_start)
+        self._date_span = (date.fromisoformat(self.shape.date_end) - self._date_start).days
+        # 出差人和收款人的工号池（包含报销信息示例中的工号）
+        self._employee_pool = ["5130008", "202422090507"] + [
+            f"{self._random.choice(['2019', '2020', '2021'])}{self._random.randrange(10 ** 6):06d}" for _ in range(40)]
+
+    def _pick(self, options) -> str:
+        return self._random.choice(list(options))
+
+    def _wait_value(self) -> str:
+        return f"{self.shape.wait_seconds:g}" if self.shape.wait_seconds else ""
+
+    def _amount(self, low: float, high: float) -> float:
+        return round(self._random.uniform(low, high), 2)
+
+    def _split_amount(self, total: float, parts: int) -> List[float]:
+        """把金额拆成parts份（两位小数，合计等于total）"""
+        cents = round(total * 100)
+        cuts = sorted(self._random.sample(range(1, cents), parts - 1)) if parts > 1 and cents > parts else []
+        bounds = [0] + cuts + [cents]
+        shares = [(bounds[i + 1] - bounds[i]) / 100 for i in range(len(bounds) - 1)]
+        return shares + [0.0] * (parts - len(shares))
+
+    def generate_record(self, sequence: int) -> List[Dict]:
+        """
+        生成一条报销记录（同一序号的多行）
+
+        Returns:
+            行的列表，每行为 {列名: 值}（同名列带.N后缀）
+        """
+        shape = self.shape
+        first = {config.SEQUENCE_COL: sequence}
+        if shape.include_login and sequence == 1:
+            first.update({
+                "登录界面工号": LOGIN_UID,
+                "登录界面密码": LOGIN_PASSWORD,
+                "登录按钮": f"{config.BUTTON_PREFIX}点击",
+                "网上预约报账按钮": f"{config.NAVIGATION_PREFIX}WF_YB6",
+                "等待": self._wait_value(),
+            })
+        if self._random.random() < shape.transfer_ratio:
+            payment_method = "个人转卡"
+        else:
+            payment_method = self._pick(m for m in config.DROPDOWN_FIELDS["支付方式"] if m != "个人转卡")
+        first.update({
+            "申请报销单按钮": f"{config.BUTTON_PREFIX}点击",
+            "已阅读并同意按钮": f"{config.BUTTON_PREFIX}点击",
+            "报销项目号": f"M11{self._random.randint(2019, 2025)}{self._pick(_PROJECT_GROUPS)}{self._random.randrange(10000):04d}",
+            "附件张数": self._random.randint(1, 10),
+            "支付方式": payment_method,
+            "备注": self._pick(_REMARKS),
+            "特殊事项说明": self._pick(_SPECIAL_NOTES),
+        })
+        rows = [first]
+
+        # 出差人信息子序列
+        trip_end = None
+        if self._random.random() < shape.travel_ratio:
+            traveler_count = self._random.randint(1, shape.max_travelers)
+            travelers = self._random.sample(self._employee_pool, traveler_count)
+            trip_start = self._date_start + timedelta(days=self._random.randint(0, self._date_span))
+            trip_end = trip_start + timedelta(days=self._random.randint(0, shape.max_trip_days))
+            for index, sno in enumerate(travelers):
+                person = mock_person_for(sno)
+                row = first if index == 0 else {config.SEQUENCE_COL: sequence}
+                row.update({
+                    "姓名": person["name"],
+                    "工号": sno,
+                    "人员类型": self._pick(config.DROPDOWN_FIELDS["人员类型"]),
+                    "单位": person["dept"],
+                    "职称": person["title"],
+                })
+                if index == 0:
+                    row.update({
+                        config.SUBSEQUENCE_START_COL: config.TRAVELER_SUBSEQUENCE_MARKER,
+                        "省份": self._pick(config.DROPDOWN_FIELDS["省份地区"]),
+                        "出差地点": self._pick(_DESTINATIONS),
+                        "起": trip_start.isoformat(),
+                        "迄": trip_end.isoformat(),
+                        "飞机票": self._amount(500, 3000),
+                        "住宿费": self._amount(200, 2000),
+                        "是否安排伙食": self._pick(config.DROPDOWN_FIELDS["安排状态"]),
+                        "是否安排交通": self._pick(config.DROPDOWN_FIELDS["交通费"]),
+                    })
+                if index == traveler_count - 1:
+                    row[config.SUBSEQUENCE_END_COL] = config.TRAVELER_SUBSEQUENCE_MARKER
+                if index > 0:
+                    rows.append(row)
+            # 出差人子序列之后的操作另起一行（登录记录的第一行在子序列处结束）
+            ops = {config.SEQUENCE_COL: sequence}
+            rows.append(ops)
+        else:
+            ops = first
+
+        # 科目/金额配对
+        ops["下一步按钮1"] = f"{config.BUTTON_PREFIX}点击"
+        ops["等待.1"] = self._wait_value()
+        pair_count = self._random.randint(1, shape.subject_pairs)
+        total = 0.0
+        for index, (name, _) in enumerate(self._random.sample(self.subjects, pair_count)):
+            suffix = f".{index}" if index else ""
+            amount = self._amount(10, 2000)
+            total += amount
+            ops[f"科目{suffix}"] = f"#{name}"
+            ops[f"金额{suffix}"] = amount
+        ops["下一步按钮2"] = f"{config.BUTTON_PREFIX}点击"
+
+        # 个人转卡：每个收款人一行
+        last = ops
+        if payment_method == "个人转卡":
+            payee_count = self._random.randint(1, shape.max_payees)
+            payees = self._random.sample(self._employee_pool, payee_count)
+            for index, (sno, share) in enumerate(zip(payees, self._split_amount(round(total, 2), payee_count))):
+                row = ops if index == 0 else {config.SEQUENCE_COL: sequence}
+                card = self._random.choice(mock_cards_for(sno))
+                row.update({
+                    "转卡信息工号": sno,
+                    "卡号尾号": f"{config.CARD_NUMBER_PREFIX}{card['card_number'][-4:]}",
+                    "个人金额": share,
+                    "提交按钮": f"{config.BUTTON_PREFIX}点击",
+                })
+                if index > 0:
+                    rows.append(row)
+                last = row
+
+        # 预约
+        reference = trip_end or (self._date_start + timedelta(days=self._random.randint(0, self._date_span)))
+        last.update({
+            "下一步按钮3": f"{config.BUTTON_PREFIX}点击",
+            "日期": (reference + timedelta(days=self._random.randint(1, 7))).isoformat(),
+            "校区": f"{config.RADIO_BUTTON_PREFIX}{self._pick(['清水河校区', '沙河校区'])}",
+            "预约按钮": f"{config.BUTTON_PREFIX}预约",
+        })
+        if shape.include_print:
+            last["打印确认单按钮"] = f"{config.BUTTON_PREFIX}点击"
+        last["返回按钮"] = f"{config.BUTTON_PREFIX}点击"
+        return rows
+
+    def generate(self) -> List[Dict]:
+        """生成所有记录的行"""
+        rows = []
+        for sequence in range(1, self.shape.records + 1):
+            rows.extend(self.generate_record(sequence))
+        return rows
+
+    def write(self, excel_file: str = None, mapping_file: str = None, sheet_name: str = None,
+              overwrite: bool = False) -> List[Dict]:
+        """
+        生成并写入报销信息和标题-ID映射
+
+        Args:
+            excel_file: 报销信息文件，默认DEFAULT_EXCEL_FILE
+            mapping_file: 标题-ID映射文件，默认DEFAULT_MAPPING_FILE
+            sheet_name: 报销信息的sheet名称，默认config.SHEET_NAME
+            overwrite: 是否覆盖已存在的文件
+
+        Returns:
+            生成的行
+
+        Raises:
+            FileExistsError: 文件已存在且overwrite为False
+        """
+        import pandas as pd
+
+        excel_file = excel_file or DEFAULT_EXCEL_FILE
+        mapping_file = mapping_file or DEFAULT_MAPPING_FILE
+        sheet_name = sheet_name or config.SHEET_NAME
+        if not overwrite:
+            existing = [path for path in (excel_file, mapping_file) if os.path.exists(path)]
+            if existing:
+                raise FileExistsError(f"文件已存在，不覆盖: {existing}")
+        for path in (excel_file, mapping_file):
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+        rows = self.generate()
+        table = [[row.get(column, "") for column in self.columns] for row in rows]
+        with pd.ExcelWriter(excel_file, engine='openpyxl') as writer:
+            pd.DataFrame(table, columns=display_columns(self.columns)).to_excel(
+                writer, sheet_name=sheet_name, index=False)
+        pd.DataFrame(title_id_rows(self.subjects), columns=["标题", "ID"]).to_excel(mapping_file, index=False)
+        logger.info(f"已生成 {self.shape.records} 条报销记录（{len(rows)} 行，种子 {self.seed}）: "
+                    f"{excel_file} [{sheet_name}]，标题-ID映射: {mapping_file}")
+        return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="按种子生成合成报销信息和标题-ID映射")
+    defaults = WorkloadShape()
+    parser.add_argument("--records", type=int, default=defaults.records, help="报销记录数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--travel-ratio", type=float, default=defaults.travel_ratio, help="含出差人信息的记录比例")
+    parser.add_argument("--max-travelers", type=int, default=defaults.max_travelers,
+                        help=f"每条记录的出差人数量上限（1~{MAX_TRAVELERS}）")
+    parser.add_argument("--subject-pairs", type=int, default=defaults.subject_pairs, help="科目/金额配对列数")
+    parser.add_argument("--transfer-ratio", type=float, default=defaults.transfer_ratio,
+                        help="支付方式为个人转卡的记录比例")
+    parser.add_argument("--max-payees", type=int, default=defaults.max_payees, help="个人转卡的收款人数量上限")
+    parser.add_argument("--wait", type=float, default=defaults.wait_seconds, help="等待列的秒数（0为留空）")
+    parser.add_argument("--date-start", default=defaults.date_start, help="出差日期范围起始")
+    parser.add_argument("--date-end", default=defaults.date_end, help="出差日期范围结束")
+    parser.add_argument("--no-login", action="store_true", help="第一条记录不包含登录操作")
+    parser.add_argument("--print", dest="include_print", action="store_true", help="预约后打印确认单")
+    parser.add_argument("--output", default=DEFAULT_EXCEL_FILE, help="报销信息文件")
+    parser.add_argument("--mapping", default=DEFAULT_MAPPING_FILE, help="标题-ID映射文件")
+    parser.add_argument("--force", action="store_true", help="覆盖已存在的文件")
+    parser.add_argument("--sheet", default=config.SHEET_NAME, help="sheet名称")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format=config.LOG_FORMAT)
+    shape = WorkloadShape(
+        records=args.records,
+        travel_ratio=args.travel_ratio,
+        max_travelers=args.max_travelers,
+        subject_pairs=args.subject_pairs,
+        transfer_ratio=args.transfer_ratio,
+        max_payees=args.max_payees,
+        wait_seconds=args.wait,
+        date_start=args.date_start,
+        date_end=args.date_end,
+        include_login=not args.no_login,
+        include_print=args.include_print,
+    )
+    try:
+        WorkloadGenerator(shape, seed=args.seed).write(args.output, args.mapping, args.sheet, overwrite=args.force)
+    except FileExistsError as e:
+        logger.error(f"{e}（使用 --force 覆盖）")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())